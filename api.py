@@ -0,0 +1,239 @@
+"""研精豆 | Yanjingdou 无界面验证API（ASGI）：直接调用研精流程，返回结构化JSON，可选SSE推送阶段进度，
+不经过Gradio界面渲染与WebSocket。鉴权与Web界面共用用户库：注册用户使用 HTTP Basic（用户名/密码），
+游客携带 X-Guest-Id 请求头并消耗免费次数；游客编号须由平台分配（Web界面游客模式），未分配的编号一律拒绝。
+
+接口：
+    POST /v1/verify   {"question": "...", "refresh": false, "stream": false}
+    GET  /healthz
+
+监控指标不在本接口上提供（无鉴权），见主程序在本机 METRICS_PORT 上的 /metrics。
+
+用法示例：
+    python api.py --port 8000
+    curl -u alice:secret -d '{"question": "1+1=?"}' http://localhost:8000/v1/verify
+    curl -N -u alice:secret -H 'Accept: text/event-stream' -d '{"question": "1+1=?"}' http://localhost:8000/v1/verify
+"""
+import argparse
+import asyncio
+import base64
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import app as core
+
+MAX_BODY_BYTES = 64 * 1024
+# 研精流程（含排队等待准入）专用线程池，容量覆盖全部获准运行与排队中的请求；
+# 鉴权、游客次数等短操作仍走默认线程池，排队中的请求不会挡住新请求进入准入判断
+VERIFY_EXECUTOR = ThreadPoolExecutor(
+    max_workers=core.ADMISSION_MAX_RUNNING + core.ADMISSION_MAX_QUEUE, thread_name_prefix="api-verify"
+)
+
+# ===================== 结果序列化 =====================
+def record_json(question, record, from_cache):
+    """研精记录 -> API响应：原始作答、各路裁判结论、可信度、直接回答与各阶段耗时"""
+    return {
+        "question": question,
+        "from_cache": from_cache,
+        "answers": {k: record.get(k) for k in core.ANSWERERS},
+        "verdicts": {k: record.get(k) for k in core.JUDGE_LABELS},
+        "credibility": record.get("credibility"),
+        "direct_answer": record.get("direct_answer"),
+        "consistency": record.get("consistency", {}),
+        "route": record.get("route", "full"),
+        "degraded": record.get("degraded", []),
+        "skipped": record.get("skipped", []),
+        "unavailable": record.get("unavailable", []),
+        "timings": record.get("timings", {}),
+        "prompt_tokens_saved": record.get("prompt_tokens_saved", 0),
+    }
+
+def stage_event(key, val):
+    """流水线事件 -> SSE阶段进度；链路对象等内部事件返回 None"""
+    if key in core.ANSWERERS:
+        return {"stage": "answer", "key": key, "model": core.ANSWERERS[key][3], "text": val}
+    if key in core.JUDGE_LABELS:
+        return {"stage": "verdict", "key": key, "label": core.JUDGE_LABELS[key], "text": val}
+    if key in ("route", "degraded", "skipped", "timings"):
+        return {"stage": key, "value": val}
+    return None
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+# ===================== 鉴权 =====================
+def authenticate(headers):
+    """返回 (身份, 错误提示)；身份为 {"username", "is_guest", "guest_id"}"""
+    auth = headers.get("authorization", "")
+    if auth.lower().startswith("basic "):
+        try:
+            username, _, password = base64.b64decode(auth[6:]).decode("utf-8").partition(":")
+        except (ValueError, UnicodeDecodeError):
+            return None, "鉴权信息格式错误"
+        error = core.verify_credentials(username, password)
+        if error:
+            return None, error.replace("❌ ", "")
+        return {"username": username, "is_guest": False, "guest_id": None}, None
+    guest_id = headers.get("x-guest-id", "").strip()
+    if guest_id:
+        # 只接受平台分配过的编号，否则每换一个新编号都能再得到一轮免费次数
+        if not core.USER_STORE.guest_exists(guest_id):
+            return None, "游客编号无效：请使用平台分配的游客编号（Web界面游客模式）"
+        return {"username": f"游客{guest_id}", "is_guest": True, "guest_id": guest_id}, None
+    return None, "缺少鉴权信息：请使用 HTTP Basic（注册用户）或 X-Guest-Id 请求头（游客）"
+
+# ===================== ASGI应用 =====================
+async def send_body(send, status, body, content_type):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode("latin-1")), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send_body(send, status, body, "application/json; charset=utf-8")
+
+async def read_body(receive):
+    """读取请求体，超过 MAX_BODY_BYTES 返回 None"""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            return None
+        if not message.get("more_body"):
+            return body
+
+async def stream_verification(send, question, refresh, identity, ticket):
+    """SSE：排队期间推送 queue 事件，每个答案/裁判结论到达时推送 stage 事件，最后推送 result（或 error）事件"""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def on_event(key, val):
+        data = stage_event(key, val)
+        if data is not None:
+            loop.call_soon_threadsafe(events.put_nowait, ("stage", data))
+
+    def run():
+        try:
+            for position, eta in core.ADMISSION.queued(ticket):
+                loop.call_soon_threadsafe(events.put_nowait, ("queue", {"position": position, "eta_seconds": round(eta, 1)}))
+            record, from_cache = core.run_verification(question, refresh=refresh, on_event=on_event, user=identity["username"])
+            if record is None:
+                item = ("error", {"error": "答题模型调用失败，未生成研精结果"})
+            else:
+                item = ("result", record_json(question, record, from_cache))
+        except core.AdmissionBusyError as e:
+            if identity["is_guest"]:
+                core.USER_STORE.refund_guest_quota(identity["guest_id"])
+            item = ("error", {"error": str(e)})
+        except Exception as e:
+            item = ("error", {"error": str(e)})
+        finally:
+            core.ADMISSION.release(ticket)
+        loop.call_soon_threadsafe(events.put_nowait, item)
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-cache")],
+    })
+    loop.run_in_executor(VERIFY_EXECUTOR, run)
+    while True:
+        event, data = await events.get()
+        await send({"type": "http.response.body", "body": sse(event, data), "more_body": True})
+        if event in ("result", "error"):
+            break
+    await send({"type": "http.response.body", "body": b""})
+
+def run_admitted(ticket, question, refresh, user):
+    """排队直到获准后执行研精流程，结束时释放准入凭证"""
+    try:
+        for _ in core.ADMISSION.queued(ticket):
+            pass
+        return core.run_verification(question, refresh, None, user)
+    finally:
+        core.ADMISSION.release(ticket)
+
+async def handle_verify(scope, receive, send):
+    headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+    identity, error = await asyncio.to_thread(authenticate, headers)
+    if identity is None:
+        return await send_json(send, 401, {"error": error})
+    body = await read_body(receive)
+    if body is None:
+        return await send_json(send, 413, {"error": f"请求体超过 {MAX_BODY_BYTES} 字节"})
+    try:
+        payload = json.loads(body or b"{}")
+    except json.JSONDecodeError:
+        return await send_json(send, 400, {"error": "请求体不是合法JSON"})
+    question = str(payload.get("question", "")).strip() if isinstance(payload, dict) else ""
+    if not question:
+        return await send_json(send, 400, {"error": "请输入有效的问题"})
+    refresh = bool(payload.get("refresh", False))
+    stream = bool(payload.get("stream", False)) or "text/event-stream" in headers.get("accept", "")
+
+    if identity["is_guest"]:
+        used = await asyncio.to_thread(core.USER_STORE.consume_guest_quota, identity["guest_id"], core.FREE_USE_LIMIT)
+        if used is None:
+            return await send_json(send, 429, {"error": f"免费使用次数已用尽（共{core.FREE_USE_LIMIT}次），请注册账号后继续使用"})
+
+    # 准入调度：与Web界面共用运行数上限与排队，排队已满返回503，单用户在途已满返回429
+    try:
+        ticket = core.ADMISSION.enter(identity["username"], identity["is_guest"])
+    except core.AdmissionBusyError as e:
+        if identity["is_guest"]:
+            await asyncio.to_thread(core.USER_STORE.refund_guest_quota, identity["guest_id"])
+        return await send_json(send, 503 if e.reason == "busy" else 429, {"error": str(e)})
+    if stream:
+        return await stream_verification(send, question, refresh, identity, ticket)
+    try:
+        record, from_cache = await asyncio.get_running_loop().run_in_executor(
+            VERIFY_EXECUTOR, run_admitted, ticket, question, refresh, identity["username"]
+        )
+    except core.AdmissionBusyError as e:
+        if identity["is_guest"]:
+            await asyncio.to_thread(core.USER_STORE.refund_guest_quota, identity["guest_id"])
+        return await send_json(send, 503, {"error": str(e)})
+    if record is None:
+        return await send_json(send, 502, {"error": "答题模型调用失败，未生成研精结果"})
+    await send_json(send, 200, record_json(question, record, from_cache))
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                core.init_user_data()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+    path, method = scope["path"], scope["method"]
+    if path == "/healthz":
+        return await send_json(send, 200, {"status": "ok", "version": core.CURRENT_VERSION})
+    if path != "/v1/verify":
+        return await send_json(send, 404, {"error": "接口不存在"})
+    if method != "POST":
+        return await send_json(send, 405, {"error": "仅支持 POST"})
+    await handle_verify(scope, receive, send)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"{core.PLATFORM_NAME_CN} 无界面验证API（JSON/SSE）")
+    # 默认只监听本机，对外提供服务时显式指定（如 0.0.0.0，建议置于反向代理/HTTPS之后）
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ 未安装 uvicorn，请先执行 pip install uvicorn，或用任意ASGI服务器加载 api:app")
+        raise SystemExit(1)
+    print(f"🚀 {core.PLATFORM_NAME_CN} API 启动：http://{args.host}:{args.port}/v1/verify")
+    uvicorn.run(app, host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
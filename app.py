@@ -1,12 +1,44 @@
-import gradio as gr
+import time
+_MODULE_START = time.perf_counter()  # 模块开始导入的时刻，用于统计冷启动耗时
 import os
 import json
+import gzip
 import hashlib
+import importlib
 import warnings
 import threading
+import types
 import queue
+import random
 from datetime import datetime
 import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import re
+import argparse
+import atexit
+import asyncio
+import subprocess
+import sys
+import zlib
+import sqlite3
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache, partial
+
+class _LazyModule:
+    """延迟导入：首次访问属性时才真正 import，批量任务/API 等不建界面的场景无需加载 gradio"""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+gr = _LazyModule("gradio")
 
 # 屏蔽无关警告
 warnings.filterwarnings("ignore")
@@ -15,40 +47,291 @@ warnings.filterwarnings("ignore")
 PLATFORM_NAME_CN = "研精豆"
 PLATFORM_NAME_EN = "Yanjingdou"
 CONCLUSION_BG_COLOR = "#f0f8ff"
-CONFIG_PATH = "/Users/weiwei.yao/Desktop/zhibian-verify/config.txt"
-USER_DATA_PATH = "/Users/weiwei.yao/Desktop/zhibian-verify/user_data.json"
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# 历史部署路径：存在时沿用，否则默认使用程序所在目录（均可被 --config / YJD_CONFIG / USER_DATA_PATH 覆盖）
+LEGACY_DATA_DIR = "/Users/weiwei.yao/Desktop/zhibian-verify"
+DATA_DIR = LEGACY_DATA_DIR if os.path.isdir(LEGACY_DATA_DIR) else APP_DIR
+CONFIG_PATH = os.path.join(DATA_DIR, "config.txt")
+USER_DATA_PATH = os.path.join(DATA_DIR, "user_data.json")
 FREE_USE_LIMIT = 3
-THREAD_TIMEOUT = 30
 CURRENT_VERSION = "v1.4"  # 当前版本号
+TONGYI_ANSWER_MODEL = "qwen-turbo"  # 研精千问答题模型
+ZHIPU_ANSWER_MODEL = "glm-4-flash"  # 研精清言答题模型
+TONGYI_JUDGE_MODEL = "qwen-plus"  # 千问裁判模型
+ZHIPU_JUDGE_MODEL = "glm-4"  # 清言裁判模型
 
-# ===================== 1. 用户数据管理 =====================
-def init_user_data():
-    """初始化用户数据文件"""
-    if not os.path.exists(USER_DATA_PATH):
-        init_data = {"users": {}, "guest_usage": {}}
-        with open(USER_DATA_PATH, "w", encoding="utf-8") as f:
-            json.dump(init_data, f, ensure_ascii=False, indent=2)
-    print(f"✅ {PLATFORM_NAME_CN} 用户数据文件初始化完成")
-
-def load_user_data():
-    """加载用户数据"""
-    init_user_data()
-    try:
-        with open(USER_DATA_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"❌ 读取用户数据失败：{e}")
-        return {"users": {}, "guest_usage": {}}
+# ===================== 1. 用户数据管理（SQLite WAL，按行增量更新） =====================
+
+class UserStore:
+    """用户数据存储：users / guest_usage 两张主键索引表，每次操作只读写相关行，计数器原子更新"""
+    def __init__(self, path, legacy_json_path=None):
+        self.path = path
+        self.legacy_json_path = legacy_json_path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._ready = False
+    
+    def _conn(self):
+        # 每个线程一个连接，WAL模式下读写互不阻塞
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._ready:
+            self._init_schema(conn)
+        return conn
+    
+    def _init_schema(self, conn):
+        with self._init_lock:
+            if self._ready:
+                return
+            with conn:
+                conn.execute(
+                    """CREATE TABLE IF NOT EXISTS users (
+                        username TEXT PRIMARY KEY,
+                        password TEXT NOT NULL,
+                        create_time TEXT NOT NULL,
+                        usage_count INTEGER NOT NULL DEFAULT 0
+                    )"""
+                )
+                conn.execute(
+                    """CREATE TABLE IF NOT EXISTS guest_usage (
+                        guest_id TEXT PRIMARY KEY,
+                        usage_count INTEGER NOT NULL DEFAULT 0,
+                        create_time TEXT NOT NULL
+                    )"""
+                )
+                conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._ready = True
+            if self.legacy_json_path:
+                self.migrate_from_json(self.legacy_json_path)
+    
+    def migrate_from_json(self, json_path):
+        """一次性迁移旧版 user_data.json（已迁移过则跳过，已存在的行不覆盖）"""
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return 0
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"❌ 读取旧版用户数据失败：{e}")
+            return 0
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        users = data.get("users", {})
+        guests = data.get("guest_usage", {})
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO users VALUES (?, ?, ?, ?)",
+                [
+                    (name, info["password"], info.get("create_time", now), info.get("usage_count", 0))
+                    for name, info in users.items()
+                ]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO guest_usage VALUES (?, ?, ?)",
+                [(gid, info.get("usage_count", 0), info.get("create_time", now)) for gid, info in guests.items()]
+            )
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('json_migrated', ?)", (now,))
+        print(f"✅ {PLATFORM_NAME_CN} 已迁移旧版用户数据：{len(users)} 个用户，{len(guests)} 个游客")
+        return len(users) + len(guests)
+    
+    def get_user(self, username):
+        with span("user_store", op="get_user"):
+            row = self._conn().execute(
+                "SELECT password, create_time, usage_count FROM users WHERE username = ?", (username,)
+            ).fetchone()
+            if row is None:
+                return None
+            return {"password": row[0], "create_time": row[1], "usage_count": row[2]}
+    
+    def create_user(self, username, password_hash):
+        """新建用户，用户名已存在返回 False"""
+        with span("user_store", op="create_user"):
+            try:
+                with self._conn() as conn:
+                    conn.execute(
+                        "INSERT INTO users VALUES (?, ?, ?, 0)",
+                        (username, password_hash, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                    )
+                return True
+            except sqlite3.IntegrityError:
+                return False
+    
+    def ensure_guest(self, guest_id):
+        with span("user_store", op="ensure_guest"):
+            with self._conn() as conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO guest_usage VALUES (?, 0, ?)",
+                    (guest_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                )
+    
+    def guest_exists(self, guest_id):
+        """游客编号是否由本平台分配过"""
+        with span("user_store", op="guest_exists"):
+            return self._conn().execute("SELECT 1 FROM guest_usage WHERE guest_id = ?", (guest_id,)).fetchone() is not None
+    
+    def guest_used(self, guest_id):
+        with span("user_store", op="guest_used"):
+            row = self._conn().execute("SELECT usage_count FROM guest_usage WHERE guest_id = ?", (guest_id,)).fetchone()
+            return row[0] if row else 0
+    
+    def consume_guest_quota(self, guest_id, limit):
+        """原子扣减游客次数：成功返回扣减后的已用次数，次数已用尽或游客编号未分配返回 None"""
+        with span("user_store", op="consume_guest_quota"):
+            with self._conn() as conn:
+                cur = conn.execute(
+                    "UPDATE guest_usage SET usage_count = usage_count + 1 WHERE guest_id = ? AND usage_count < ?",
+                    (guest_id, limit)
+                )
+                if cur.rowcount == 0:
+                    return None
+                return conn.execute("SELECT usage_count FROM guest_usage WHERE guest_id = ?", (guest_id,)).fetchone()[0]
+    
+    def refund_guest_quota(self, guest_id):
+        """退还一次游客次数（请求因平台繁忙被拒绝时调用）"""
+        with span("user_store", op="refund_guest_quota"):
+            with self._conn() as conn:
+                conn.execute(
+                    "UPDATE guest_usage SET usage_count = usage_count - 1 WHERE guest_id = ? AND usage_count > 0",
+                    (guest_id,)
+                )
 
-def save_user_data(data):
-    """保存用户数据"""
+class RedisUserStore:
+    """用户数据存储的Redis实现（多进程/多机共享），接口与 UserStore 一致；兼容任意Redis协议客户端"""
+    def __init__(self, client, legacy_json_path=None, prefix="yjd"):
+        self.client = client
+        self.legacy_json_path = legacy_json_path
+        self.prefix = prefix
+        self._init_lock = threading.Lock()
+        self._ready = False
+    
+    def _redis(self):
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    self._ready = True
+                    if self.legacy_json_path:
+                        self.migrate_from_json(self.legacy_json_path)
+        return self.client
+    
+    def _user_key(self, username):
+        return f"{self.prefix}:user:{username}"
+    
+    def _guest_key(self, guest_id):
+        return f"{self.prefix}:guest:{guest_id}"
+    
+    def migrate_from_json(self, json_path):
+        """一次性迁移旧版 user_data.json（已迁移过则跳过，已存在的用户/游客不覆盖）"""
+        migrated_key = f"{self.prefix}:meta:json_migrated"
+        if self.client.exists(migrated_key) or not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"❌ 读取旧版用户数据失败：{e}")
+            return 0
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        users = data.get("users", {})
+        guests = data.get("guest_usage", {})
+        for name, info in users.items():
+            if self.client.hsetnx(self._user_key(name), "password", info["password"]):
+                self.client.hset(self._user_key(name), mapping={
+                    "create_time": info.get("create_time", now), "usage_count": info.get("usage_count", 0)
+                })
+        for gid, info in guests.items():
+            self.client.hsetnx(self._guest_key(gid), "usage_count", info.get("usage_count", 0))
+            self.client.hsetnx(self._guest_key(gid), "create_time", info.get("create_time", now))
+        self.client.set(migrated_key, now)
+        print(f"✅ {PLATFORM_NAME_CN} 已迁移旧版用户数据：{len(users)} 个用户，{len(guests)} 个游客")
+        return len(users) + len(guests)
+    
+    def get_user(self, username):
+        with span("user_store", op="get_user"):
+            info = self._redis().hgetall(self._user_key(username))
+            if not info:
+                return None
+            return {
+                "password": info["password"], "create_time": info.get("create_time", ""),
+                "usage_count": int(info.get("usage_count", 0)),
+            }
+    
+    def create_user(self, username, password_hash):
+        """新建用户，用户名已存在返回 False"""
+        with span("user_store", op="create_user"):
+            client = self._redis()
+            if not client.hsetnx(self._user_key(username), "password", password_hash):
+                return False
+            client.hset(self._user_key(username), mapping={
+                "create_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "usage_count": 0
+            })
+            return True
+    
+    def ensure_guest(self, guest_id):
+        with span("user_store", op="ensure_guest"):
+            client = self._redis()
+            client.hsetnx(self._guest_key(guest_id), "usage_count", 0)
+            client.hsetnx(self._guest_key(guest_id), "create_time", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    
+    def guest_exists(self, guest_id):
+        """游客编号是否由本平台分配过"""
+        with span("user_store", op="guest_exists"):
+            return bool(self._redis().exists(self._guest_key(guest_id)))
+    
+    def guest_used(self, guest_id):
+        with span("user_store", op="guest_used"):
+            return int(self._redis().hget(self._guest_key(guest_id), "usage_count") or 0)
+    
+    def consume_guest_quota(self, guest_id, limit):
+        """原子扣减游客次数：HINCRBY 后超出上限则回退，成功返回扣减后的已用次数，次数已用尽或游客编号未分配返回 None"""
+        with span("user_store", op="consume_guest_quota"):
+            client = self._redis()
+            if not client.exists(self._guest_key(guest_id)):
+                return None
+            used = client.hincrby(self._guest_key(guest_id), "usage_count", 1)
+            if used > limit:
+                client.hincrby(self._guest_key(guest_id), "usage_count", -1)
+                return None
+            return used
+    
+    def refund_guest_quota(self, guest_id):
+        """退还一次游客次数（请求因平台繁忙被拒绝时调用）"""
+        with span("user_store", op="refund_guest_quota"):
+            client = self._redis()
+            if client.hincrby(self._guest_key(guest_id), "usage_count", -1) < 0:
+                client.hincrby(self._guest_key(guest_id), "usage_count", 1)
+
+_redis_client = None
+
+def redis_client():
+    """按 REDIS_URL 创建共享的Redis客户端（仅在 STATE_BACKEND=redis 时导入 redis 包）"""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    return _redis_client
+
+def make_user_store():
+    """按 STATE_BACKEND 创建用户数据存储：sqlite（默认，同机多进程共享数据库文件）或 redis（多机共享）"""
+    if STATE_BACKEND == "redis":
+        try:
+            return RedisUserStore(redis_client(), legacy_json_path=USER_DATA_PATH, prefix=REDIS_PREFIX)
+        except Exception as e:
+            print(f"❌ {PLATFORM_NAME_CN} Redis状态后端初始化失败，改用SQLite：{e}")
+    return UserStore(USER_DB_PATH, legacy_json_path=USER_DATA_PATH)
+
+def init_user_data():
+    """初始化用户数据库（首次启动时自动迁移旧版JSON文件）"""
     try:
-        with open(USER_DATA_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
+        USER_STORE.get_user("")
+        print(f"✅ {PLATFORM_NAME_CN} 用户数据库初始化完成")
     except Exception as e:
-        print(f"❌ 保存用户数据失败：{e}")
-        return False
+        print(f"❌ {PLATFORM_NAME_CN} 用户数据库初始化失败：{e}")
 
 def encrypt_password(password):
     """密码加密（MD5）"""
@@ -64,32 +347,35 @@ def user_register(username, password, confirm_pwd):
     if len(password) < 6:
         return "❌ 密码长度不能少于6位！", gr.update(value=""), gr.update(value="")
     
-    user_data = load_user_data()
-    if username in user_data["users"]:
+    try:
+        created = USER_STORE.create_user(username, encrypt_password(password))
+    except Exception as e:
+        print(f"❌ 保存用户数据失败：{e}")
+        created = None
+    if created is False:
         return "❌ 用户名已存在！", gr.update(value=""), gr.update(value="")
     
-    user_data["users"][username] = {
-        "password": encrypt_password(password),
-        "create_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "usage_count": 0
-    }
-    
-    if save_user_data(user_data):
+    if created:
         return "✅ 注册成功！请登录使用", gr.update(value=""), gr.update(value="")
     else:
         return "❌ 注册失败，请重试！", gr.update(value=""), gr.update(value="")
 
+def verify_credentials(username, password):
+    """校验用户名密码：通过返回 None，否则返回错误提示（Web登录与API鉴权共用）"""
+    if not username or not password:
+        return "❌ 用户名/密码不能为空！"
+    user = USER_STORE.get_user(username)
+    if user is None:
+        return "❌ 用户名不存在！"
+    if user["password"] != encrypt_password(password):
+        return "❌ 密码错误！"
+    return None
+
 def user_login(username, password, user_state, guest_id_state):
     """用户登录"""
-    if not username or not password:
-        return "❌ 用户名/密码不能为空！", user_state, guest_id_state
-    
-    user_data = load_user_data()
-    if username not in user_data["users"]:
-        return "❌ 用户名不存在！", user_state, guest_id_state
-    
-    if user_data["users"][username]["password"] != encrypt_password(password):
-        return "❌ 密码错误！", user_state, guest_id_state
+    error = verify_credentials(username, password)
+    if error:
+        return error, user_state, guest_id_state
     
     user_state = {"is_login": True, "username": username, "is_guest": False}
     return f"✅ 欢迎回来，{username}！", user_state, guest_id_state
@@ -99,20 +385,10 @@ def guest_mode(user_state, guest_id_state):
     if not guest_id_state:
         guest_id = str(uuid.uuid4())[:8]
         guest_id_state = guest_id
-        
-        user_data = load_user_data()
-        if guest_id not in user_data["guest_usage"]:
-            user_data["guest_usage"][guest_id] = {
-                "usage_count": 0,
-                "create_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            save_user_data(user_data)
+        USER_STORE.ensure_guest(guest_id)
     
     user_state = {"is_login": True, "username": f"游客{guest_id_state}", "is_guest": True}
-    
-    user_data = load_user_data()
-    used_count = user_data["guest_usage"][guest_id_state]["usage_count"]
-    remain_count = FREE_USE_LIMIT - used_count
+    remain_count = FREE_USE_LIMIT - USER_STORE.guest_used(guest_id_state)
     
     return f"✅ 游客模式已开启！剩余免费次数：{remain_count}次", user_state, guest_id_state
 
@@ -122,14 +398,21 @@ def logout(user_state, guest_id_state):
     guest_id_state = ""
     return "✅ 已退出登录！", user_state, guest_id_state
 
-# ===================== 3. 配置文件读取 =====================
-def load_config():
+# ===================== 3. 配置读取（命令行 > 环境变量 > 配置文件） =====================
+ENV_PREFIX = "YJD_"  # 环境变量覆盖：YJD_<配置项>，如 YJD_TONGYI_API_KEY
+
+def config_sources(argv):
+    """从命令行预解析 --config 与 --set KEY=VALUE（其余参数留给子命令解析）"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--config")
+    parser.add_argument("--set", action="append", default=[])
+    args, _ = parser.parse_known_args(argv)
+    return args.config, args.set
+
+def read_config_file(path):
     config = {}
-    if not os.path.exists(CONFIG_PATH):
-        print(f"❌ {PLATFORM_NAME_CN} 配置文件不存在：{CONFIG_PATH}")
-        return config
     try:
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             lines = f.readlines()
         for line in lines:
             line = line.strip()
@@ -138,36 +421,147 @@ def load_config():
             if "=" in line:
                 key, value = line.split("=", 1)
                 config[key.strip()] = value.strip()
-        print(f"✅ {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 配置加载成功")
+        print(f"✅ {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 配置加载成功：{path}")
     except Exception as e:
         print(f"❌ {PLATFORM_NAME_CN} 配置文件读取失败：{str(e)}")
     return config
 
-config = load_config()
+def load_config(argv=()):
+    """配置优先级：命令行 --set > 环境变量 YJD_<KEY> > 配置文件（--config > YJD_CONFIG > 默认路径）"""
+    config_path, overrides = config_sources(argv)
+    path = config_path or os.environ.get(f"{ENV_PREFIX}CONFIG") or CONFIG_PATH
+    env = {k[len(ENV_PREFIX):]: v for k, v in os.environ.items() if k.startswith(ENV_PREFIX) and k != f"{ENV_PREFIX}CONFIG"}
+    cli = dict(item.split("=", 1) for item in overrides if "=" in item)
+    config = {}
+    if os.path.exists(path):
+        config.update(read_config_file(path))
+    elif not env and not cli:
+        print(f"❌ {PLATFORM_NAME_CN} 配置文件不存在：{path}")
+    config.update(env)
+    config.update({k.strip(): v.strip() for k, v in cli.items()})
+    return config
+
+config = load_config(sys.argv[1:] if __name__ == "__main__" else ())
+USER_DATA_PATH = config.get("USER_DATA_PATH", USER_DATA_PATH)
+USER_DB_PATH = config.get("USER_DB_PATH", os.path.join(os.path.dirname(USER_DATA_PATH), "user_data.db"))
+# 状态后端：用户、游客次数与研精缓存的存放位置。sqlite=本机数据库文件（同机多进程共享），redis=Redis服务（多机共享）
+STATE_BACKEND = config.get("STATE_BACKEND", "sqlite")
+REDIS_URL = config.get("REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = config.get("REDIS_PREFIX", "yjd")
+USER_STORE = make_user_store()
 TONGYI_API_KEY = config.get("TONGYI_API_KEY", "")
 ZHIPU_API_KEY = config.get("ZHIPU_API_KEY", "")
+STREAM_MODE = config.get("STREAM_MODE", "1") == "1"  # 流式输出：边生成边推送到结果区
+STREAM_PUSH_INTERVAL = float(config.get("STREAM_PUSH_INTERVAL", 0.2))  # 流式片段推送节流间隔（秒）
+# 快速通道：双模型最终结果一致时的裁判策略。off=始终四路交叉研判；single=仅单裁判复核；none=不调用裁判
+# single/none 需等双答案到齐才能决定其余裁判，会推迟首个答案的裁判，默认关闭
+FAST_PATH_POLICY = config.get("FAST_PATH_POLICY", "off")
+# 批量裁判：每个裁判模型一次请求同时研判两份答案（4次裁判调用合并为2次，需等双答案到齐）
+JUDGE_BATCH_MODE = config.get("JUDGE_BATCH_MODE", "0") == "1"
+# 端到端时限：单次请求总预算（秒），答题阶段最多占用其中的 ANSWER_STAGE_SHARE，其余留给裁判阶段
+REQUEST_DEADLINE = float(config.get("REQUEST_DEADLINE", 60))
+ANSWER_STAGE_SHARE = float(config.get("ANSWER_STAGE_SHARE", 0.5))
+# 裁判法定数：每份答案已有该数量的裁判结论一致即结束研判并撤销其余裁判；0 表示等待全部裁判
+JUDGE_QUORUM = int(config.get("JUDGE_QUORUM", 0))
+
+# ===================== 4. 模型初始化（首次调用时创建客户端） =====================
+# None 表示尚未初始化；压测等场景可预先注入 Generation / zhipu_client 并把标记置为 True
+Generation = None
+zhipu_client = None
+TONGYI_INIT_OK = None
+ZHIPU_INIT_OK = None
+_provider_init_lock = threading.Lock()
+
+def init_tongyi():
+    """通义千问初始化（仅执行一次）"""
+    global Generation, TONGYI_INIT_OK
+    with _provider_init_lock:
+        if TONGYI_INIT_OK is None:
+            try:
+                if PROVIDER_MODE == "replay":
+                    Generation = CassetteGeneration()
+                else:
+                    import dashscope
+                    dashscope.api_key = TONGYI_API_KEY
+                    Generation = dashscope.Generation
+                    if PROVIDER_MODE == "record":
+                        Generation = CassetteGeneration(Generation)
+                TONGYI_INIT_OK = True
+            except Exception as e:
+                print(f"❌ {PLATFORM_NAME_CN} 通义千问初始化失败：{str(e)}")
+                TONGYI_INIT_OK = False
+    return TONGYI_INIT_OK
+
+def init_zhipu():
+    """智谱清言初始化（仅执行一次）"""
+    global zhipu_client, ZHIPU_INIT_OK
+    with _provider_init_lock:
+        if ZHIPU_INIT_OK is None:
+            try:
+                if PROVIDER_MODE == "replay":
+                    zhipu_client = CassetteZhipuClient()
+                else:
+                    from zhipuai import ZhipuAI
+                    zhipu_client = ZhipuAI(api_key=ZHIPU_API_KEY)
+                    if PROVIDER_MODE == "record":
+                        zhipu_client = CassetteZhipuClient(zhipu_client)
+                ZHIPU_INIT_OK = True
+            except Exception as e:
+                print(f"❌ {PLATFORM_NAME_CN} 智谱清言初始化失败：{str(e)}")
+                ZHIPU_INIT_OK = False
+    return ZHIPU_INIT_OK
+
+# 模型注册表：新增答题/裁判模型只需在配置中声明，无需复制调用函数
+# 答题模型：结果键 -> (代号, 服务商, 模型, 展示名称)；裁判模型：代号 -> (服务商, 模型, 展示名称)
+PROVIDERS = ("dashscope", "zhipu")
+ANSWERERS = {
+    "tongyi_ans": ("t", "dashscope", TONGYI_ANSWER_MODEL, "研精千问"),
+    "zhipu_ans": ("z", "zhipu", ZHIPU_ANSWER_MODEL, "研精清言"),
+}
+JUDGES = {
+    "t": ("dashscope", TONGYI_JUDGE_MODEL, "千问"),
+    "z": ("zhipu", ZHIPU_JUDGE_MODEL, "清言"),
+}
+
+def parse_model_specs(value):
+    """解析扩展模型配置：服务商:模型[:展示名称]，多个以分号分隔"""
+    specs = []
+    for item in value.split(";"):
+        if not item.strip():
+            continue
+        parts = [part.strip() for part in item.split(":")]
+        if len(parts) < 2 or parts[0] not in PROVIDERS or not parts[1]:
+            print(f"❌ {PLATFORM_NAME_CN} 扩展模型配置无效，已忽略：{item}")
+            continue
+        specs.append((parts[0], parts[1], parts[2] if len(parts) > 2 and parts[2] else parts[1]))
+    return specs
+
+for i, (provider, model, name) in enumerate(parse_model_specs(config.get("EXTRA_ANSWER_MODELS", "")), len(ANSWERERS) + 1):
+    ANSWERERS[f"m{i}_ans"] = (f"m{i}", provider, model, name)
+for i, (provider, model, name) in enumerate(parse_model_specs(config.get("EXTRA_JUDGE_MODELS", "")), len(JUDGES) + 1):
+    JUDGES[f"k{i}"] = (provider, model, name)
+
+def verdict_key(ans_key, judge_code):
+    """裁判结果键：j + 答案代号 + _ + 裁判代号（如 jt_z = 清言裁判研判千问作答）"""
+    return f"j{ANSWERERS[ans_key][0]}_{judge_code}"
+
+# 答题结果键 -> 该答案的全部裁判结果键
+ANSWER_VERDICT_KEYS = {ans_key: [verdict_key(ans_key, code) for code in JUDGES] for ans_key in ANSWERERS}
+RESULT_KEYS = (*ANSWERERS, *(key for keys in ANSWER_VERDICT_KEYS.values() for key in keys))
+# 默认的双模型 × 双裁判矩阵沿用原有共识规则，扩展模型后使用法定数共识
+LEGACY_MATRIX = len(ANSWERERS) == 2 and len(JUDGES) == 2
+
+def provider_ready(provider):
+    return init_tongyi() if provider == "dashscope" else init_zhipu()
+
+def judge_quorum():
+    """生效的裁判法定数（未配置或超过裁判数时为全部裁判）"""
+    return min(JUDGE_QUORUM, len(JUDGES)) if JUDGE_QUORUM > 0 else len(JUDGES)
+
+# ===================== 5. Prompt构建（静态system前缀 + token预算） =====================
+# 固定指令统一放在 system 消息中、变量（问题/答案）放在 user 消息中，前缀逐字稳定，便于服务商侧前缀缓存复用
+ANSWER_SYSTEM_PROMPT = "针对用户给出的问题，给出准确、简洁的答案，涉及计算/推理必须分步列出过程，不要多余文字。"
 
-# ===================== 4. 模型初始化 =====================
-# 通义千问初始化
-try:
-    import dashscope
-    from dashscope import Generation
-    dashscope.api_key = TONGYI_API_KEY
-    TONGYI_INIT_OK = True
-except Exception as e:
-    print(f"❌ {PLATFORM_NAME_CN} 通义千问初始化失败：{str(e)}")
-    TONGYI_INIT_OK = False
-
-# 智谱清言初始化
-try:
-    from zhipuai import ZhipuAI
-    zhipu_client = ZhipuAI(api_key=ZHIPU_API_KEY)
-    ZHIPU_INIT_OK = True
-except Exception as e:
-    print(f"❌ {PLATFORM_NAME_CN} 智谱清言初始化失败：{str(e)}")
-    ZHIPU_INIT_OK = False
-
-# ===================== 5. 裁判Prompt =====================
 NEUTRAL_JUDGE_PROMPT = """请作为**无立场的中立学术裁判**，对答案进行研精析微式精准研判，严格遵守以下规则：
 1. 判错唯一标准：答案存在**计算错误/知识点错误/逻辑漏洞/遗漏问题要求/结论与正确结果相悖**，无上述问题则标注「无明显错误」；
 2. 严禁编造/虚构错误，严禁过度挑剔，判定需基于问题要求与客观事实；
@@ -177,103 +571,674 @@ NEUTRAL_JUDGE_PROMPT = """请作为**无立场的中立学术裁判**，对答
 错误标注：xxx
 核心结论：xxx"""
 
+# JSON裁判格式：要求裁判只输出JSON对象，解析失败时仍按「错误标注：/核心结论：」文本格式兜底
+JUDGE_JSON_MODE = config.get("JUDGE_JSON_MODE", "0") == "1"
+JUDGE_JSON_FORMAT = '{"错误标注": "xxx", "核心结论": "xxx"}'
+JUDGE_PROMPT = (
+    NEUTRAL_JUDGE_PROMPT.split("5. 输出")[0] + f"5. 仅输出一个JSON对象，无多余文字、无代码块标记：\n{JUDGE_JSON_FORMAT}"
+    if JUDGE_JSON_MODE else NEUTRAL_JUDGE_PROMPT
+)
+
+# 批量裁判Prompt：沿用中立裁判规则1-4，一次研判答案A、答案B……多份答案
+BATCH_ANSWER_LABELS = "ABCDEFGH"
+
+def batch_judge_prompt(count):
+    labels = BATCH_ANSWER_LABELS[:count]
+    answer_names = "、".join(f"答案{label}" for label in labels)
+    if JUDGE_JSON_MODE:
+        output_format = "{" + ", ".join(f'"{label}": {JUDGE_JSON_FORMAT}' for label in labels) + "}"
+        rule = f"5. 对{answer_names}分别独立研判，互不参照，仅输出一个以答案字母为键的JSON对象，无多余文字、无代码块标记：\n{output_format}"
+    else:
+        output_format = "\n".join(f"【答案{label}】\n错误标注：xxx\n核心结论：xxx" for label in labels)
+        rule = f"5. 对{answer_names}分别独立研判，互不参照，输出严格按以下格式，无多余文字、无注释、无补充说明：\n{output_format}"
+    return NEUTRAL_JUDGE_PROMPT.split("5. 输出")[0] + rule
+
+# 裁判输入中单份答案的token预算（本地估算），超出时保留开头推理与最终结果、省略中间部分；0 表示不压缩
+JUDGE_ANSWER_TOKEN_BUDGET = int(config.get("JUDGE_ANSWER_TOKEN_BUDGET", 1500))
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|\S")
+# 按换行与中英文句末标点切分（英文句点须后跟空白或位于结尾，不切开小数）
+SEGMENT_PATTERN = re.compile(r"(?:[^\n。；;！？!?.]|\.(?!\s|$))*(?:[\n。；;！？!?]+|\.(?:\s+|$)|$)")
+
+def estimate_tokens(text):
+    """本地估算token数：汉字/符号各计1个，英文单词与连续数字约每4个字符计1个"""
+    count = 0
+    for piece in TOKEN_PATTERN.findall(text):
+        count += (len(piece) + 3) // 4 if piece.isascii() and piece.isalnum() else 1
+    return count
+
+def token_tail(text, budget):
+    """取文本末尾估算不超过 budget 个token的部分"""
+    start, used = len(text), 0
+    for piece in reversed(list(TOKEN_PATTERN.finditer(text))):
+        used += (len(piece.group()) + 3) // 4 if piece.group().isascii() and piece.group().isalnum() else 1
+        if used > budget:
+            break
+        start = piece.start()
+    return text[start:]
+
+def condense_answer(answer, budget=None):
+    """答案超出token预算时按句/行压缩：保留最终结果所在行、结尾与开头的推理，中间以省略标记代替。
+    返回 (压缩后文本, 节省token数)"""
+    budget = JUDGE_ANSWER_TOKEN_BUDGET if budget is None else budget
+    total = estimate_tokens(answer)
+    if budget <= 0 or total <= budget:
+        return answer, 0
+    segments = [seg for seg in SEGMENT_PATTERN.findall(answer) if seg]
+    costs = [estimate_tokens(seg) for seg in segments]
+    # 最终结果行覆盖到的片段优先保留（该行过长时至少保留其末尾片段）
+    final_line = final_result_line(answer)
+    final_start = answer.rfind(final_line) if final_line else -1
+    final_segments = []
+    offset = 0
+    for i, seg in enumerate(segments):
+        if final_start >= 0 and offset < final_start + len(final_line) and offset + len(seg) > final_start:
+            final_segments.append(i)
+        offset += len(seg)
+    tail_budget = max(budget // 3, 1)
+    if final_segments and costs[final_segments[-1]] > tail_budget:
+        # 最终结果所在片段本身超出结尾预算（如不分句的长段落）：截取其末尾，保证总预算有效
+        last = final_segments[-1]
+        segments[last] = "……" + token_tail(segments[last], max(tail_budget - 2, 1))
+        costs[last] = estimate_tokens(segments[last])
+    keep = set()
+    used = 0
+    for i in reversed(final_segments):
+        if keep and used + costs[i] > budget // 3:
+            break
+        keep.add(i)
+        used += costs[i]
+    # 结尾最多占预算的三分之一，其余留给开头的推理步骤
+    for i in range(len(segments) - 1, -1, -1):
+        if i in keep:
+            continue
+        if used + costs[i] > budget // 3:
+            break
+        keep.add(i)
+        used += costs[i]
+    for i in range(len(segments)):
+        if i in keep:
+            continue
+        if used + costs[i] > budget:
+            break
+        keep.add(i)
+        used += costs[i]
+    parts = []
+    skipped = 0
+    for i, seg in enumerate(segments):
+        if i in keep:
+            if skipped:
+                parts.append(f"\n……（中间推理已省略约{skipped}个token）……\n")
+                skipped = 0
+            parts.append(seg)
+        else:
+            skipped += costs[i]
+    if skipped:
+        parts.append(f"\n……（其余内容已省略约{skipped}个token）……")
+    text = "".join(parts)
+    return text, max(total - estimate_tokens(text), 0)
+
+def build_messages(system_prompt, question, answers=()):
+    """组装请求消息：system 为静态指令前缀，user 为问题及各份答案（逐份按预算压缩）；
+    answers 为 (标签, 答案) 序列。估算的prompt规模与节省的token数计入当前请求链路"""
+    lines = [f"问题：{question}"]
+    saved = 0
+    for label, answer in answers:
+        answer, answer_saved = condense_answer(answer)
+        saved += answer_saved
+        lines.append(f"{label}：{answer}")
+    user_content = "\n".join(lines)
+    note_prompt_tokens(estimate_tokens(system_prompt) + estimate_tokens(user_content), saved)
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content},
+    ]
+
 # ===================== 6. 模型调用 =====================
-def call_tongyi_answer(question, result_queue):
-    if not TONGYI_INIT_OK:
-        result_queue.put(("tongyi_ans", "研精千问初始化失败，无法答题"))
-        return
-    try:
-        prompt = f"针对问题【{question}】，给出准确、简洁的答案，涉及计算/推理必须分步列出过程，不要多余文字。"
-        response = Generation.call(
-            model="qwen-turbo",
-            prompt=prompt,
+def _stream_kwargs(provider):
+    """流式模式下各服务商的增量输出参数"""
+    if not STREAM_MODE:
+        return {}
+    if provider == "dashscope":
+        return {"stream": True, "incremental_output": True}
+    return {"stream": True}
+
+# 服务商容错：错误分类、请求时限内的抖动退避重试、按服务商熔断
+RETRY_MAX_ATTEMPTS = int(config.get("RETRY_MAX_ATTEMPTS", 3))  # 单次调用最多尝试次数（含首次）
+RETRY_BASE_DELAY = float(config.get("RETRY_BASE_DELAY", 0.5))  # 退避基准（秒），第n次重试在 [0, 基准×2^(n-1)] 内随机
+RETRY_MAX_DELAY = float(config.get("RETRY_MAX_DELAY", 8))
+BREAKER_FAILURE_THRESHOLD = int(config.get("BREAKER_FAILURE_THRESHOLD", 5))  # 连续失败达到该次数即熔断
+BREAKER_OPEN_SECONDS = float(config.get("BREAKER_OPEN_SECONDS", 30))  # 熔断持续时间，之后放行一次探测调用
+PROVIDER_NAMES = {"dashscope": "通义千问", "zhipu": "智谱清言"}
+ERROR_KIND_LABELS = {
+    "rate_limit": "限流", "timeout": "超时", "auth": "鉴权失败", "server": "服务异常",
+    "bad_request": "请求无效", "circuit_open": "熔断中", "unknown": "未知错误",
+}
+RETRYABLE_ERRORS = ("rate_limit", "timeout", "server")  # 可重试的瞬时错误
+BREAKER_ERRORS = ("rate_limit", "timeout", "server", "auth")  # 计入熔断的错误
+RATE_LIMIT_WORDS = ("rate limit", "ratelimit", "throttl", "too many requests", "reachlimit", "flowexceed", "限流", "频率")
+AUTH_WORDS = ("invalidapikey", "api key", "apikey", "api_key", "api-key", "unauthorized", "authentication", "permission", "鉴权")
+HTTP_STATUS_PATTERN = re.compile(r"\b([45]\d\d)\b")
+SERVER_WORDS = ("connection", "internal", "unavailable", "bad gateway", "server", "overload", "服务繁忙", "服务不可用", "系统繁忙")
+
+class ProviderError(RuntimeError):
+    """服务商调用错误，kind 为 ERROR_KIND_LABELS 中的类别"""
+    def __init__(self, provider, kind, message):
+        super().__init__(f"{PROVIDER_NAMES.get(provider, provider)}{ERROR_KIND_LABELS[kind]}：{message}")
+        self.provider = provider
+        self.kind = kind
+
+class CallCancelled(Exception):
+    """所属请求已被放弃：调用中止，结果既不写入队列也不写入裁判记忆"""
+
+def classify_status(status, text):
+    """按HTTP状态码与错误文本归类：rate_limit / auth / timeout / server / bad_request / unknown"""
+    text = text.lower()
+    if status == 429 or any(word in text for word in RATE_LIMIT_WORDS):
+        return "rate_limit"
+    if status in (401, 403) or any(word in text for word in AUTH_WORDS):
+        return "auth"
+    if status in (408, 504) or "timeout" in text or "timed out" in text:
+        return "timeout"
+    if (status or 0) >= 500 or any(word in text for word in SERVER_WORDS):
+        return "server"
+    if (status or 0) >= 400:
+        return "bad_request"
+    return "unknown"
+
+def classify_error(exc):
+    """服务商SDK异常归类（兼容 requests / httpx / 各SDK自定义异常）"""
+    if isinstance(exc, ProviderError):
+        return exc.kind
+    if isinstance(exc, TimeoutError):
+        return "timeout"
+    status = None
+    for obj in (exc, getattr(exc, "response", None)):
+        code = getattr(obj, "status_code", None) or getattr(obj, "http_status", None)
+        if isinstance(code, int):
+            status = code
+            break
+    text = f"{type(exc).__name__} {exc}"
+    if status is None:
+        # 部分SDK只把状态码写在异常信息里
+        match = HTTP_STATUS_PATTERN.search(str(exc))
+        status = int(match.group(1)) if match else None
+    return classify_status(status, text)
+
+def check_dashscope_response(response):
+    """DashScope 出错时不抛异常而是返回非200状态码，这里统一转为 ProviderError"""
+    status = getattr(response, "status_code", 200)
+    if status == 200:
+        return response
+    detail = f"{getattr(response, 'code', '')} {getattr(response, 'message', '')}".strip()
+    raise ProviderError("dashscope", classify_status(status, detail), f"HTTP {status} {detail}")
+
+class CircuitBreaker:
+    """单个服务商的熔断器：连续失败达到阈值即打开，打开期间直接跳过该服务商；冷却后放行一次探测调用，成功即恢复"""
+    def __init__(self, provider, threshold, open_seconds):
+        self.provider = provider
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+    
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state, self._probing = "half_open", False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return self.state == "closed"
+    
+    def remaining(self):
+        """距离放行探测调用的剩余秒数"""
+        with self._lock:
+            return max(self._opened_at + self.open_seconds - time.monotonic(), 0.0) if self.state == "open" else 0.0
+    
+    def release(self):
+        """调用因请求被放弃而中止：不计成败，仅释放探测名额"""
+        with self._lock:
+            self._probing = False
+    
+    def record(self, kind=None):
+        """记录一次调用结果：kind 为 None 表示成功；请求无效属于调用方问题，视同服务可用；
+        无法归类的错误不能证明服务已恢复：探测调用遇到时按失败处理，其余情况不改变连续失败计数"""
+        with self._lock:
+            self._probing = False
+            if kind is None or kind == "bad_request":
+                self.state, self.failures = "closed", 0
+                return
+            if kind in BREAKER_ERRORS:
+                self.failures += 1
+            elif self.state != "half_open":
+                return
+            if self.state == "half_open" or self.failures >= self.threshold:
+                if self.state != "open":
+                    self.trips += 1
+                    print(f"❌ {PLATFORM_NAME_CN} {PROVIDER_NAMES.get(self.provider, self.provider)}连续失败{self.failures}次，熔断{self.open_seconds:.0f}秒")
+                self.state, self._opened_at = "open", time.monotonic()
+
+BREAKER_STATE_VALUES = {"closed": 0, "half_open": 0.5, "open": 1}  # 熔断状态 -> 指标取值
+BREAKERS = {provider: CircuitBreaker(provider, BREAKER_FAILURE_THRESHOLD, BREAKER_OPEN_SECONDS) for provider in PROVIDERS}
+
+def resilient_call(provider, call, result_queue=None):
+    """带熔断与重试的服务商调用：熔断中直接失败；瞬时错误按全抖动指数退避重试，
+    不超过 RETRY_MAX_ATTEMPTS 次且不越过本次请求的时限；请求被放弃后抛出 CallCancelled，不再重试"""
+    breaker = BREAKERS[provider]
+    cancelled = getattr(result_queue, "cancelled", None)
+    deadline = getattr(_trace_local, "deadline", None)
+    for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+        if not breaker.allow():
+            PROVIDER_ERRORS.inc(provider=provider, kind="circuit_open")
+            raise ProviderError(provider, "circuit_open", f"已跳过，约{breaker.remaining():.0f}秒后恢复探测")
+        try:
+            result = call()
+        except CallCancelled:
+            breaker.release()
+            raise
+        except Exception as e:
+            kind = classify_error(e)
+            breaker.record(kind)
+            PROVIDER_ERRORS.inc(provider=provider, kind=kind)
+            delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+            retry = (
+                kind in RETRYABLE_ERRORS and attempt < RETRY_MAX_ATTEMPTS
+                and (deadline is None or time.monotonic() + delay < deadline)
+                and not (cancelled is not None and cancelled.wait(delay))
+            )
+            if cancelled is not None and cancelled.is_set():
+                raise CallCancelled() from e
+            if not retry:
+                if isinstance(e, ProviderError):
+                    raise
+                raise ProviderError(provider, kind, str(e)) from e
+            if cancelled is None:
+                time.sleep(delay)
+            PROVIDER_RETRIES.inc(provider=provider, kind=kind)
+            continue
+        breaker.record()
+        # 非流式调用无法中途停止：返回时请求已被放弃则丢弃结果
+        if cancelled is not None and cancelled.is_set():
+            raise CallCancelled()
+        return result
+
+def _dashscope_call(**kwargs):
+    """通义千问调用入口（统一记录链路与指标）"""
+    return traced_provider_call(
+        "dashscope", kwargs["model"], lambda: Generation.call(**kwargs), kwargs.get("stream", False)
+    )
+
+def _zhipu_create(**kwargs):
+    """智谱清言调用入口（统一记录链路与指标）"""
+    return traced_provider_call(
+        "zhipu", kwargs["model"], lambda: zhipu_client.chat.completions.create(**kwargs), kwargs.get("stream", False)
+    )
+
+def _collect_stream(chunks, get_delta, result_queue, key, prefix=""):
+    """累积流式增量，按节流间隔推送 (key:partial, 当前全文)，key 为 None 时只累积不推送；
+    所属请求被放弃时停止读取并抛出 CallCancelled"""
+    cancelled = getattr(result_queue, "cancelled", None)
+    text = ""
+    last_push = 0.0
+    for chunk in chunks:
+        if cancelled is not None and cancelled.is_set():
+            if hasattr(chunks, "close"):
+                chunks.close()
+            raise CallCancelled()
+        text += get_delta(chunk) or ""
+        now = time.monotonic()
+        if key is not None and now - last_push >= STREAM_PUSH_INTERVAL:
+            result_queue.put((f"{key}:partial", f"{prefix}{text}"))
+            last_push = now
+    return text
+
+def _dashscope_text(response, result_queue, key, prefix=""):
+    if STREAM_MODE:
+        return _collect_stream(response, lambda r: check_dashscope_response(r).output.text, result_queue, key, prefix)
+    return check_dashscope_response(response).output.text
+
+def _zhipu_text(response, result_queue, key, prefix=""):
+    if STREAM_MODE:
+        return _collect_stream(response, lambda c: c.choices[0].delta.content, result_queue, key, prefix)
+    return response.choices[0].message.content
+
+def chat_completion(provider, model, messages, temperature, result_queue, key, prefix=""):
+    """向指定服务商发起一次对话调用（含熔断与重试），返回完整文本；流式模式下按节流推送 (key:partial, 片段)，key 为 None 时不推送"""
+    return resilient_call(
+        provider, lambda: _chat_once(provider, model, messages, temperature, result_queue, key, prefix), result_queue
+    )
+
+def _chat_once(provider, model, messages, temperature, result_queue, key, prefix=""):
+    if provider == "dashscope":
+        response = _dashscope_call(
+            model=model,
+            messages=messages,
             result_format="text",
-            temperature=0.1
+            temperature=temperature,
+            **_stream_kwargs("dashscope")
         )
-        result_queue.put(("tongyi_ans", f"研精千问作答：\n{response.output.text.strip()}"))
-    except Exception as e:
-        result_queue.put(("tongyi_ans", f"研精千问调用失败：{str(e)}"))
+        return _dashscope_text(response, result_queue, key, prefix)
+    response = _zhipu_create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        **_stream_kwargs("zhipu")
+    )
+    return _zhipu_text(response, result_queue, key, prefix)
+
+# 调用失败占位文本的固定前缀：按前缀而非关键词判断，正常作答/裁判内容中出现「调用失败」等字样不受影响
+# （作答总以「模型名作答：」开头，裁判输出的开头符号在入队前剔除）
+CALL_FAILURE_MARK = "❌ "
+
+def call_failure(text):
+    """生成调用失败占位文本"""
+    return CALL_FAILURE_MARK + text
+
+def is_call_failure(text):
+    """判断作答/裁判内容是否为调用失败的占位文本（不可缓存）"""
+    return not text or text.startswith(CALL_FAILURE_MARK)
 
-def call_zhipu_answer(question, result_queue):
-    if not ZHIPU_INIT_OK:
-        result_queue.put(("zhipu_ans", "研精清言初始化失败，无法答题"))
+def model_output(text):
+    """模型输出去除首尾空白及开头的失败标记符号，避免被误判为调用失败"""
+    text = text.strip()
+    while text.startswith(CALL_FAILURE_MARK.strip()):
+        text = text[len(CALL_FAILURE_MARK.strip()):].lstrip()
+    return text
+
+def call_answer(ans_key, question, result_queue):
+    """注册表中任一答题模型作答"""
+    _, provider, model, name = ANSWERERS[ans_key]
+    if not provider_ready(provider):
+        result_queue.put((ans_key, call_failure(f"{name}初始化失败，无法答题")))
         return
     try:
-        prompt = f"针对问题【{question}】，给出准确、简洁的答案，涉及计算/推理必须分步列出过程，不要多余文字。"
-        messages = [{"role": "user", "content": prompt}]
-        response = zhipu_client.chat.completions.create(
-            model="glm-4-flash",
-            messages=messages,
-            temperature=0.1
-        )
-        result_queue.put(("zhipu_ans", f"研精清言作答：\n{response.choices[0].message.content.strip()}"))
+        messages = build_messages(ANSWER_SYSTEM_PROMPT, question)
+        text = chat_completion(provider, model, messages, 0.1, result_queue, ans_key, f"{name}作答：\n")
+        result_queue.put((ans_key, f"{name}作答：\n{text.strip()}"))
+    except CallCancelled:
+        return
     except Exception as e:
-        result_queue.put(("zhipu_ans", f"研精清言调用失败：{str(e)}"))
+        result_queue.put((ans_key, call_failure(f"{name}调用失败：{str(e)}")))
 
-def neutral_judge_tongyi(question, answer, result_queue, judge_name):
-    if not TONGYI_INIT_OK:
-        result_queue.put((judge_name, "研精裁判初始化失败"))
+def neutral_judge(judge_code, question, answer, result_queue, judge_name):
+    """注册表中任一裁判模型研判一份答案"""
+    provider, model, _ = JUDGES[judge_code]
+    if not provider_ready(provider):
+        result_queue.put((judge_name, call_failure("研精裁判初始化失败")))
         return
     try:
-        prompt = f"{NEUTRAL_JUDGE_PROMPT}\n问题：{question}\n答案：{answer}"
-        response = Generation.call(
-            model="qwen-plus",
-            prompt=prompt,
-            result_format="text",
-            temperature=0.0
-        )
-        result_queue.put((judge_name, response.output.text.strip()))
+        cached = lookup_judge_verdict(question, answer, model)
+        if cached is not None:
+            result_queue.put((judge_name, cached))
+            return
+        messages = build_messages(JUDGE_PROMPT, question, [("答案", answer)])
+        verdict = normalize_verdict(model_output(chat_completion(provider, model, messages, 0.0, result_queue, judge_name)))
+        remember_judge_verdict(question, answer, model, verdict)
+        result_queue.put((judge_name, verdict))
+    except CallCancelled:
+        return
     except Exception as e:
-        result_queue.put((judge_name, f"研精裁判调用失败：{str(e)}"))
+        result_queue.put((judge_name, call_failure(f"研精裁判调用失败：{str(e)}")))
+
+# 分段标记须独占一行（容忍 Markdown 标题/加粗符号），正文中提到「答案A」不会被当作新分段
+BATCH_SECTION_PATTERN = re.compile(r"(?m)^[\s#*>]*[【\[]?\s*答案\s*([A-H])\s*[】\]]?[\s*]*[:：]?[\s*]*$")
+
+def split_batch_verdicts(text, count=2):
+    """把批量裁判输出按答案A、答案B……拆回 count 份裁判结论；无法拆分时返回 None"""
+    labels = BATCH_ANSWER_LABELS[:count]
+    payload = verdict_json(text)
+    if payload is not None:
+        items = [payload.get(label) for label in labels]
+        if all(isinstance(item, dict) for item in items):
+            return [normalize_verdict(json.dumps(item, ensure_ascii=False)) for item in items]
+    sections = {}
+    matches = list(BATCH_SECTION_PATTERN.finditer(text))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = text[match.end():end].strip()
+        if "错误标注：" in body or "核心结论：" in body:
+            sections.setdefault(match.group(1), body)
+    if all(label in sections for label in labels):
+        return [sections[label] for label in labels]
+    # 兜底：缺少分段标记但恰好有 count 组「错误标注」
+    blocks = re.split(r"\n(?=错误标注：)", text.strip())
+    if len(blocks) == count and all(block.startswith("错误标注：") for block in blocks):
+        return [block.strip() for block in blocks]
+    return None
 
-def neutral_judge_zhipu(question, answer, result_queue, judge_name):
-    if not ZHIPU_INIT_OK:
-        result_queue.put((judge_name, "研精裁判初始化失败"))
+def batch_judge(judge_code, question, answers, result_queue, judge_names):
+    """批量裁判：一次请求研判全部答案，拆分后按各裁判结果键分别写入队列"""
+    provider, model, _ = JUDGES[judge_code]
+    if not provider_ready(provider):
+        for judge_name in judge_names:
+            result_queue.put((judge_name, call_failure("研精裁判初始化失败")))
         return
     try:
-        prompt = f"{NEUTRAL_JUDGE_PROMPT}\n问题：{question}\n答案：{answer}"
-        messages = [{"role": "user", "content": prompt}]
-        response = zhipu_client.chat.completions.create(
-            model="glm-4",
-            messages=messages,
-            temperature=0.0
-        )
-        result_queue.put((judge_name, response.choices[0].message.content.strip()))
+        cached = [lookup_judge_verdict(question, answer, model) for answer in answers]
+        if all(verdict is not None for verdict in cached):
+            for judge_name, verdict in zip(judge_names, cached):
+                result_queue.put((judge_name, verdict))
+            return
+        labeled = [(f"答案{label}", answer) for label, answer in zip(BATCH_ANSWER_LABELS, answers)]
+        messages = build_messages(batch_judge_prompt(len(answers)), question, labeled)
+        # 合并输出包含全部答案的结论，不能作为某一路裁判的流式片段展示，拆分后再分别写入
+        text = chat_completion(provider, model, messages, 0.0, result_queue, None)
+        verdicts = split_batch_verdicts(model_output(text), len(answers))
+        if verdicts is None:
+            for judge_name in judge_names:
+                result_queue.put((judge_name, call_failure("研精裁判调用失败：批量研判结果无法解析")))
+            return
+        for judge_name, answer, verdict in zip(judge_names, answers, verdicts):
+            # 拆分出的结论为空时不写入裁判记忆，以免拆分异常的结果被长期复用
+            if parse_verdict(verdict).conclusion != NO_CONCLUSION:
+                remember_judge_verdict(question, answer, model, verdict)
+            result_queue.put((judge_name, verdict))
+    except CallCancelled:
+        return
     except Exception as e:
-        result_queue.put((judge_name, f"研精裁判调用失败：{str(e)}"))
+        for judge_name in judge_names:
+            result_queue.put((judge_name, call_failure(f"研精裁判调用失败：{str(e)}")))
 
 # ===================== 7. 工具函数 =====================
-def get_error(judgment):
-    lines = judgment.split("\n")
-    for line in lines:
-        if line.startswith("错误标注："):
-            return line.replace("错误标注：", "").strip()
-    return "无明显错误"
-
-def get_conclusion(judgment):
-    lines = judgment.split("\n")
-    for line in lines:
-        if line.startswith("核心结论："):
-            return line.replace("核心结论：", "").strip()
-    return "无有效结论"
-
-def is_judge_consistent(j1, j2):
-    err1, err2 = get_error(j1), get_error(j2)
-    con1 = get_conclusion(j1).replace(" ", "").replace("\n", "").strip()[:100]
-    con2 = get_conclusion(j2).replace(" ", "").replace("\n", "").strip()[:100]
-    return err1 == err2 and con1 == con2
+NO_ERROR = "无明显错误"
+NO_CONCLUSION = "无有效结论"
+JUDGE_ERROR_TYPES = ("计算错误", "知识点错误", "逻辑错误", "遗漏条件", "结论错误")
+# 裁判输出字段：文本标签 / JSON键 -> 字段名
+VERDICT_FIELDS = {"错误标注": "error", "核心结论": "conclusion", "error": "error", "conclusion": "conclusion"}
+# 容忍 Markdown 加粗/列表符号、半角冒号与行首空白
+VERDICT_LINE_PATTERN = re.compile(r"^[\s>*#\-]*(错误标注|核心结论)[\s*]*[:：][\s*]*(.*?)[\s*]*$")
+
+class Verdict:
+    """一份裁判输出的解析结果：错误标注、核心结论、计票归类与一致性比较键"""
+    __slots__ = ("text", "error", "conclusion", "structured", "failed", "category", "key")
+    
+    def __init__(self, text, error=NO_ERROR, conclusion=NO_CONCLUSION, structured=False):
+        self.text = text
+        self.structured = structured  # 是否由JSON格式解析得到
+        self.error = error
+        self.conclusion = conclusion
+        self.failed = is_call_failure(text)
+        self.category = error if error == NO_ERROR else next((t for t in JUDGE_ERROR_TYPES if t in error), "其他错误")
+        self.key = (error, conclusion.replace(" ", "").replace("\n", "").strip()[:100])
+    
+    @property
+    def clean(self):
+        return self.error == NO_ERROR
+    
+    def consistent_with(self, other):
+        return self.key == other.key
+    
+    def to_text(self):
+        return f"错误标注：{self.error}\n核心结论：{self.conclusion}"
+
+def verdict_json(text):
+    """取裁判输出中的JSON对象（容忍代码块标记与前后多余文字）；不是JSON对象返回 None"""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        payload = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+@lru_cache(maxsize=4096)
+def parse_verdict(text):
+    """单次遍历解析裁判输出：优先JSON格式，回退到「错误标注：/核心结论：」文本格式；同一文本只解析一次"""
+    fields = {}
+    payload = verdict_json(text) if "{" in text else None
+    for key, value in (payload or {}).items():
+        field = VERDICT_FIELDS.get(str(key).strip().lower())
+        if field and value is not None and str(value).strip():
+            fields.setdefault(field, str(value).strip())
+    structured = bool(fields)
+    if not structured:
+        for line in text.split("\n"):
+            match = VERDICT_LINE_PATTERN.match(line)
+            if match:
+                fields.setdefault(VERDICT_FIELDS[match.group(1)], match.group(2))
+                if len(fields) == 2:
+                    break
+    return Verdict(text, fields.get("error") or NO_ERROR, fields.get("conclusion") or NO_CONCLUSION, structured)
+
+def normalize_verdict(text):
+    """JSON格式的裁判输出统一转为文本格式，供缓存、展示与记录使用；其他输出原样返回"""
+    verdict = parse_verdict(text)
+    return verdict.to_text() if verdict.structured else text
+
+def judges_consistent(judgments):
+    """同一答案的全部裁判结论是否一致（错误标注相同且核心结论前100字相同）"""
+    verdicts = [parse_verdict(j) for j in judgments]
+    return all(verdicts[0].consistent_with(v) for v in verdicts[1:])
+
+def settled_verdict(verdicts):
+    """多裁判计票：返回得票最多的裁判结论及与其同类的裁判数 (结论, 票数)；调用失败的结论不计票"""
+    valid = [v for v in map(parse_verdict, verdicts) if not v.failed]
+    votes = {}
+    for verdict in valid:
+        votes[verdict.category] = votes.get(verdict.category, 0) + 1
+    best, best_count = None, 0
+    for verdict in valid:
+        if votes[verdict.category] > best_count:
+            best, best_count = verdict.text, votes[verdict.category]
+    return best, best_count
+
+# 最终结果所在行的关键词 / 可识别的单位
+FINAL_LINE_PATTERN = re.compile(r"最终|答案|结果|结论|因此|所以|故|答：|=")
+FINAL_UNITS = (
+    "平方米", "立方米", "千克", "公斤", "千米", "公里", "厘米", "毫米", "小时", "分钟",
+    "元", "米", "克", "吨", "个", "人", "天", "秒", "度", "%", "km", "kg", "cm", "mm",
+)
+FINAL_UNIT_ALIASES = {
+    "公斤": "千克", "公里": "千米", "kg": "千克", "km": "千米", "cm": "厘米", "mm": "毫米",
+    "m": "米", "g": "克", "s": "秒", "h": "小时",
+}
+# 结果行中结论标签之后的部分才是结果表达式
+FINAL_LABEL_PATTERN = re.compile(r"(?:最终结果|最终答案|答案|结果|结论|答|因此|所以|故|综上)(?:是|为)?\s*[：:，,]?")
+# 结果表达式的全部可识别成分：数值（含科学计数）、单位（单字母单位后不能紧跟字母，以免把 min/mol 识别为米）、
+# 单字母变量、运算符与并列连接词；出现其他任何内容即视为无法识别
+FINAL_TOKEN_PATTERN = re.compile(
+    r"\s*(?:(?P<num>(?:\d{1,3}(?:,\d{3})+(?!\d)|\d+)(?:\.\d+)?(?:[eE][+-]?\d+)?)"
+    r"|(?P<unit>" + "|".join(re.escape(u) for u in FINAL_UNITS) + r"|[mgsh](?![A-Za-z]))"
+    r"|(?P<var>[A-Za-z](?![A-Za-z]))"
+    r"|(?P<op>[-+*/^=()<>≤≥×÷·])"
+    r"|(?P<sep>或|和|及|、|,|，|;|；))"
+)
+FINAL_CHOICE_PATTERN = re.compile(r"(?:选|答案[是为：:]?\s*)\s*([A-H](?:\s*[、,，和]?\s*[A-H])*)(?![A-Za-z])")
+
+def final_result_line(answer):
+    """取答案中给出最终结果的那一行（含结论关键词的最后一行，否则取最后一行）"""
+    lines = [line.strip() for line in answer.splitlines() if line.strip()]
+    if not lines:
+        return ""
+    keyed = [line for line in lines if FINAL_LINE_PATTERN.search(line)]
+    return (keyed or lines)[-1]
+
+def extract_final_result(answer):
+    """廉价抽取并归一化最终结果：选项字母 / 完整结果表达式（全部数值、运算符、分数、科学计数、变量与单位，
+    并列的多个解按序归一）；表达式中有任何无法识别的内容返回 None，交由完整研判"""
+    line = unicodedata.normalize("NFKC", final_result_line(answer))
+    choice = FINAL_CHOICE_PATTERN.search(line)
+    if choice:
+        return "choice:" + "".join(sorted(set(re.findall(r"[A-H]", choice.group(1)))))
+    labels = list(FINAL_LABEL_PATTERN.finditer(line))
+    expression = line[labels[-1].end():] if labels else line
+    expression = expression.strip().rstrip("。.!！")
+    alternatives, current, pos = [], [], 0
+    while pos < len(expression):
+        token = FINAL_TOKEN_PATTERN.match(expression, pos)
+        if token is None or token.end() == pos:
+            return None
+        pos = token.end()
+        kind, text = token.lastgroup, token.group(token.lastgroup)
+        if kind == "sep":
+            alternatives.append("".join(current))
+            current = []
+        elif kind == "num":
+            text = text.replace(",", "")
+            if "." in text and "e" not in text.lower():
+                text = text.rstrip("0").rstrip(".")
+            current.append(text)
+        elif kind == "unit":
+            current.append(FINAL_UNIT_ALIASES.get(text, text))
+        elif kind == "op":
+            current.append({"×": "*", "·": "*", "÷": "/"}.get(text, text))
+        else:
+            current.append(text)
+    alternatives.append("".join(current))
+    if not all(alternatives) or not re.search(r"[0-9A-Za-z]", "".join(alternatives)):
+        return None
+    return "expr:" + "|".join(sorted(alternatives))
+
+def answers_agree(ans1, ans2):
+    """双模型最终结果是否一致（任一无法识别或调用失败均视为不一致）"""
+    if is_call_failure(ans1) or is_call_failure(ans2):
+        return False
+    result1 = extract_final_result(ans1)
+    return result1 is not None and result1 == extract_final_result(ans2)
+
+def all_answers_agree(answers):
+    """全部答题模型的最终结果是否一致"""
+    first, *others = answers
+    return all(answers_agree(first, other) for other in others)
 
 # ===================== 8. 共识融合（新增直接回答问题功能） =====================
-def fuse_consensus(question, tongyi_ans, zhipu_ans, jt_t, jt_z, jz_t, jz_z):
-    # 提取错误标注和核心结论
-    tongyi_error1, tongyi_error2 = get_error(jt_t), get_error(jt_z)
-    zhipu_error1, zhipu_error2 = get_error(jz_t), get_error(jz_z)
-    tongyi_con = get_conclusion(jt_t)
-    zhipu_con = get_conclusion(jz_t)
+# 融合规则修订号：融合逻辑改变结论输出时递增，计入缓存版本指纹使旧记录失效（2：修正千问答案的清言裁判结论取错槽位）
+FUSION_REVISION = 2
+# 快速通道在可信度评级后追加的说明
+ROUTE_LABELS = {
+    "fast_single": "（快速通道：双模型结果一致，单裁判复核）",
+    "fast_none": "（快速通道：双模型结果一致，未调用裁判）",
+}
+
+def annotate_credibility(credibility, route="full", degraded=(), unavailable=()):
+    """可信度评级追加快速通道说明；超出请求时限或调用失败的降级结果缺少部分作答/裁判结论，可信度最高评为中"""
+    credibility += ROUTE_LABELS.get(route, "")
+    reasons = []
+    if degraded:
+        reasons.append(f"{len(degraded)}项研判超出时限")
+    if unavailable:
+        reasons.append(f"{len(unavailable)}项调用失败或服务商熔断")
+    if reasons:
+        credibility = credibility.replace("高可信度", "中可信度") + f"（降级结果：{'，'.join(reasons)}）"
+    return credibility
+
+def summarize_consensus(question, tongyi_ans, zhipu_ans, jt_t, jt_z, jz_t, jz_z, route="full", degraded=(), consistency=None, unavailable=()):
+    """共识研判：返回可信度评级、直接回答与深度分析（结构化结果，不含样式）；consistency 为预先算好的各答案裁判一致性"""
+    # 每份裁判输出只解析一次
+    vt_t, vt_z, vz_t, vz_z = map(parse_verdict, (jt_t, jt_z, jz_t, jz_z))
+    if consistency is None:
+        consistency = {"tongyi_ans": vt_t.consistent_with(vt_z), "zhipu_ans": vz_t.consistent_with(vz_z)}
+    tongyi_con = vt_t.conclusion
+    zhipu_con = vz_t.conclusion
     
     # 判定最终错误类型和可信度等级
-    tongyi_final_error = tongyi_error1 if is_judge_consistent(jt_t, jt_z) else "无明显错误"
-    zhipu_final_error = zhipu_error1 if is_judge_consistent(jz_t, jz_z) else "无明显错误"
+    tongyi_final_error = vt_t.error if consistency["tongyi_ans"] else NO_ERROR
+    zhipu_final_error = vz_t.error if consistency["zhipu_ans"] else NO_ERROR
     
     if tongyi_final_error == "无明显错误" and zhipu_final_error == "无明显错误":
         credibility = "高可信度"
@@ -283,7 +1248,7 @@ def fuse_consensus(question, tongyi_ans, zhipu_ans, jt_t, jt_z, jz_t, jz_z):
     elif tongyi_final_error != "无明显错误" and zhipu_final_error != "无明显错误":
         credibility = "低可信度"
         # 双模型均有错误，基于裁判修正后给出回答
-        direct_answer = f"根据裁判修正结果，问题的合理答案为：{get_conclusion(jt_t) if tongyi_con else get_conclusion(jz_t)}"
+        direct_answer = f"根据裁判修正结果，问题的合理答案为：{tongyi_con or zhipu_con}"
         model_analysis = "双模型均存在错误，结合裁判修正结论如下："
     else:
         credibility = "中可信度"
@@ -292,205 +1257,1556 @@ def fuse_consensus(question, tongyi_ans, zhipu_ans, jt_t, jt_z, jz_t, jz_z):
         direct_answer = reliable_con
         model_analysis = f"{'研精千问' if tongyi_final_error == '无明显错误' else '研精清言'}答案无错误，核心结论如下："
     
+    credibility = annotate_credibility(credibility, route, degraded, unavailable)
+    
     # 深度研精分析（保留原逻辑）
-    if credibility == "高可信度":
+    if credibility.startswith("高可信度"):
         analysis = f"双模型答案一致且均无错误，最终结果：{direct_answer}"
     else:
         analysis = f"研精千问结论：{tongyi_con}；研精清言结论：{zhipu_con}；建议优先参考{model_analysis[:4]}的结论。"
+    return {"credibility": credibility, "direct_answer": direct_answer, "analysis": analysis}
+
+def summarize_quorum_consensus(question, answers, verdicts, route="full", degraded=(), unavailable=()):
+    """N个答题模型 × M个裁判的共识研判：每份答案取得票达到法定数的裁判结论，未达法定数按无明显错误处理"""
+    quorum = judge_quorum()
+    findings = {}  # 答题结果键 -> (错误标注, 核心结论)
+    for ans_key in answers:
+        group = [verdicts[k] for k in ANSWER_VERDICT_KEYS[ans_key] if k in verdicts]
+        verdict, votes = settled_verdict(group)
+        reference = parse_verdict(verdict or (group[0] if group else ""))
+        error = reference.error if verdict is not None and votes >= quorum else NO_ERROR
+        findings[ans_key] = (error, reference.conclusion)
+    names = {ans_key: ANSWERERS[ans_key][3] for ans_key in answers}
+    clean = [ans_key for ans_key, (error, _) in findings.items() if error == "无明显错误"]
+    first_con = next(iter(findings.values()))[1]
     
-    # 终审结论样式（新增「直接回应问题」模块，放在最顶部）
-    styled_judgment = f"""
-<div style="background-color: {CONCLUSION_BG_COLOR}; padding: 20px; border-radius: 8px; margin: 10px 0; border: 1px solid #d0e8ff; color: #333; word-wrap: break-word; word-break: break-all;">
-  <h3 style="margin: 0 0 15px 0; color: #0056b3; font-weight: 600; font-size: 16px; display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap; gap: 8px;">
-    {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 终审结论 
-    <span style="font-size: 12px; color: #666; font-weight: normal;">(AI生成内容，基于双模型研精析微)</span>
-    <span style="font-family: 'SimHei', '黑体', sans-serif; font-weight: bold; color: #d9534f; font-size: 15px;">可信度评级：{credibility}</span>
+    if len(clean) == len(findings):
+        credibility = "高可信度"
+        direct_answer = first_con
+    elif not clean:
+        credibility = "低可信度"
+        direct_answer = f"根据裁判修正结果，问题的合理答案为：{first_con}"
+    else:
+        credibility = "中可信度"
+        direct_answer = findings[clean[0]][1]
+    credibility = annotate_credibility(credibility, route, degraded, unavailable)
+    
+    if credibility.startswith("高可信度"):
+        analysis = f"{len(findings)}个模型答案一致且均无错误，最终结果：{direct_answer}"
+    else:
+        preferred = names[clean[0]] if clean else "裁判修正"
+        analysis = "；".join(f"{names[k]}结论：{con}" for k, (_, con) in findings.items()) + f"；建议优先参考{preferred}的结论。"
+    return {"credibility": credibility, "direct_answer": direct_answer, "analysis": analysis}
+
+def render_consensus(summary):
+    """终审结论卡片（新增「直接回应问题」模块，放在最顶部）；样式见界面的 RESULT_CSS"""
+    credibility, direct_answer, analysis = summary["credibility"], summary["direct_answer"], summary["analysis"]
+    return f"""<div class="conclusion-card">
+  <h3 class="conclusion-title">
+    {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 终审结论
+    <span class="conclusion-note">(AI生成内容，基于双模型研精析微)</span>
+    <span class="conclusion-credibility">可信度评级：{credibility}</span>
   </h3>
-  <!-- 新增：直接回应问题的答案（放在最前面，优先展示） -->
-  <div style="margin: 0 0 15px 0; padding: 15px; background-color: #ffffff; border-radius: 6px; border: 1px solid #e8f4f8;">
-    <h4 style="margin: 0 0 8px 0; color: #007bff; font-size: 14px;">🎯 直接回应问题</h4>
-    <p style="margin: 0; line-height: 1.8; font-size: 14px; color: #222; font-weight: 500;">{direct_answer}</p>
+  <div class="conclusion-answer">
+    <h4>🎯 直接回应问题</h4>
+    <p>{direct_answer}</p>
   </div>
-  <!-- 原有：深度研精分析 -->
-  <p style="margin: 0; line-height: 1.8; font-size: 14px; color: #333;"><strong>📊 深度研精分析：</strong>{analysis}</p>
-</div>
-"""
-    return styled_judgment
+  <p class="conclusion-analysis"><strong>📊 深度研精分析：</strong>{analysis}</p>
+</div>"""
+
+# ===================== 9. 研精结果缓存（SQLite持久化） =====================
+VERIFY_CACHE_ENABLED = config.get("VERIFY_CACHE_ENABLED", "1") == "1"
+VERIFY_CACHE_PATH = config.get(
+    "VERIFY_CACHE_PATH", os.path.join(os.path.dirname(USER_DATA_PATH), "verify_cache.db")
+)
+VERIFY_CACHE_MAX_ENTRIES = int(config.get("VERIFY_CACHE_MAX_ENTRIES", 5000))
+VERIFY_CACHE_TTL = int(config.get("VERIFY_CACHE_TTL", 7 * 24 * 3600))  # 秒
+# 缓存记录字段：原始作答、各路裁判结果、终审结论
+CACHE_FIELDS = (*RESULT_KEYS, "final_judgment")
+
+def normalize_question(question):
+    """问题归一化：全半角统一、折叠空白、英文小写"""
+    return " ".join(unicodedata.normalize("NFKC", question).split()).lower()
+
+def pipeline_version():
+    """模型/Prompt版本指纹：版本号、融合规则修订号、全部答题/裁判模型、Prompt摘要、快速通道策略、答案token预算、裁判法定数，任一变化即缓存失效"""
+    models = [spec[2] for spec in ANSWERERS.values()] + [spec[1] for spec in JUDGES.values()]
+    quorum = [f"quorum{judge_quorum()}"] if judge_quorum() < len(JUDGES) else []
+    return "|".join([
+        CURRENT_VERSION, f"fusion{FUSION_REVISION}", *models, prompt_digest(), FAST_PATH_POLICY, str(JUDGE_ANSWER_TOKEN_BUDGET), *quorum
+    ])
+
+def prompt_digest():
+    """答题/裁判Prompt的摘要"""
+    return hashlib.sha256(f"{ANSWER_SYSTEM_PROMPT}\n{JUDGE_PROMPT}".encode("utf-8")).hexdigest()[:12]
+
+def verify_cache_key(question):
+    return hashlib.sha256(f"{pipeline_version()}\n{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+class VerifyCache:
+    """研精结果缓存：SQLite持久化，按最近访问时间做LRU淘汰，支持TTL过期与条数上限"""
+    def __init__(self, path, max_entries, ttl, table="verify_cache"):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+    
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_access ON {self.table}(last_access)")
+            self._conn.commit()
+        return self._conn
+    
+    def get(self, key):
+        """命中返回缓存记录（dict），未命中或已过期返回 None"""
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(f"SELECT payload, created_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] > self.ttl:
+                    conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    conn.commit()
+                    row = None
+                if row is None:
+                    self.misses += 1
+                    return None
+                conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self.hits += 1
+            return json.loads(row[0])
+        except Exception as e:
+            print(f"❌ {PLATFORM_NAME_CN} 读取研精缓存失败：{e}")
+            return None
+    
+    def prune_stale(self, version):
+        """清理模型/Prompt版本与当前不一致的记录，返回清理条数"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                deleted = conn.execute(f"DELETE FROM {self.table} WHERE version != ?", (version,)).rowcount
+                conn.commit()
+            return deleted
+        except Exception as e:
+            print(f"❌ {PLATFORM_NAME_CN} 清理研精缓存失败：{e}")
+            return 0
+    
+    def put(self, key, question, record):
+        """写入缓存记录，超过条数上限时淘汰最久未访问的记录"""
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, question, pipeline_version(), json.dumps(record, ensure_ascii=False), now, now)
+                )
+                conn.execute(
+                    f"""DELETE FROM {self.table} WHERE key IN (
+                        SELECT key FROM {self.table} ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                    )""",
+                    (self.max_entries,)
+                )
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"❌ {PLATFORM_NAME_CN} 写入研精缓存失败：{e}")
+            return False
+
+class RedisCache:
+    """研精结果缓存的Redis实现，接口与 VerifyCache 一致：多进程/多机共享，TTL交给Redis过期，有序集合记录最近访问做LRU淘汰"""
+    def __init__(self, client, max_entries, ttl, table="verify_cache", prefix="yjd"):
+        self.client = client
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._ns = f"{prefix}:{table}"
+        self._lru = f"{self._ns}:lru"
+    
+    def _key(self, key):
+        return f"{self._ns}:{key}"
+    
+    def get(self, key):
+        """命中返回缓存记录（dict），未命中或已过期返回 None"""
+        try:
+            payload = self.client.hget(self._key(key), "payload")
+            if payload is None:
+                self.client.zrem(self._lru, key)
+                with self._lock:
+                    self.misses += 1
+                return None
+            self.client.zadd(self._lru, {key: time.time()})
+            with self._lock:
+                self.hits += 1
+            return json.loads(payload)
+        except Exception as e:
+            print(f"❌ {PLATFORM_NAME_CN} 读取研精缓存失败：{e}")
+            return None
+    
+    def prune_stale(self, version):
+        """清理模型/Prompt版本与当前不一致的记录，返回清理条数"""
+        deleted = 0
+        try:
+            for key in self.client.zrange(self._lru, 0, -1):
+                stored = self.client.hget(self._key(key), "version")
+                if stored != version:
+                    self.client.delete(self._key(key))
+                    self.client.zrem(self._lru, key)
+                    deleted += stored is not None
+            return deleted
+        except Exception as e:
+            print(f"❌ {PLATFORM_NAME_CN} 清理研精缓存失败：{e}")
+            return deleted
+    
+    def put(self, key, question, record):
+        """写入缓存记录，超过条数上限时淘汰最久未访问的记录"""
+        now = time.time()
+        try:
+            self.client.hset(self._key(key), mapping={
+                "question": question, "version": pipeline_version(),
+                "payload": json.dumps(record, ensure_ascii=False), "created_at": now,
+            })
+            self.client.expire(self._key(key), int(self.ttl))
+            self.client.zadd(self._lru, {key: now})
+            overflow = self.client.zcard(self._lru) - self.max_entries
+            if overflow > 0:
+                stale = self.client.zrange(self._lru, 0, overflow - 1)
+                self.client.delete(*[self._key(k) for k in stale])
+                self.client.zrem(self._lru, *stale)
+            return True
+        except Exception as e:
+            print(f"❌ {PLATFORM_NAME_CN} 写入研精缓存失败：{e}")
+            return False
+
+def make_cache(max_entries, table):
+    """按 STATE_BACKEND 创建缓存（Redis不可用时退回SQLite）"""
+    if STATE_BACKEND == "redis":
+        try:
+            return RedisCache(redis_client(), max_entries, VERIFY_CACHE_TTL, table=table, prefix=REDIS_PREFIX)
+        except Exception as e:
+            print(f"❌ {PLATFORM_NAME_CN} Redis缓存初始化失败，改用SQLite：{e}")
+    return VerifyCache(VERIFY_CACHE_PATH, max_entries, VERIFY_CACHE_TTL, table=table)
+
+VERIFY_CACHE = make_cache(VERIFY_CACHE_MAX_ENTRIES, "verify_cache")
+
+# 裁判结论记忆：同一问题+同一答案+同一裁判模型（temperature=0.0）结论确定，无需重复研判
+JUDGE_CACHE_ENABLED = config.get("JUDGE_CACHE_ENABLED", "1") == "1"
+JUDGE_CACHE_MAX_ENTRIES = int(config.get("JUDGE_CACHE_MAX_ENTRIES", 20000))
+JUDGE_VERDICT_CACHE = make_cache(JUDGE_CACHE_MAX_ENTRIES, "judge_verdicts")
+
+def judge_cache_key(question, answer, judge_model):
+    raw = (
+        f"{CURRENT_VERSION}|{judge_model}|{prompt_digest()}|{JUDGE_ANSWER_TOKEN_BUDGET}"
+        f"\n{normalize_question(question)}\n{answer.strip()}"
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def lookup_judge_verdict(question, answer, judge_model):
+    """裁判调用前查询结论记忆，命中返回裁判原文，否则返回 None"""
+    if not JUDGE_CACHE_ENABLED:
+        return None
+    cached = JUDGE_VERDICT_CACHE.get(judge_cache_key(question, answer, judge_model))
+    return cached["verdict"] if cached else None
+
+def remember_judge_verdict(question, answer, judge_model, verdict):
+    if JUDGE_CACHE_ENABLED and not is_call_failure(verdict):
+        JUDGE_VERDICT_CACHE.put(judge_cache_key(question, answer, judge_model), question, {"verdict": verdict})
+
+# ===================== 10. 执行引擎与流水线调度 =====================
+class EngineBusyError(RuntimeError):
+    """在途调用已达上限，拒绝新的调用"""
+
+class ExecutionEngine:
+    """长驻执行引擎：每个服务商一个有界线程池，叠加全局在途调用上限"""
+    def __init__(self, provider_limits, max_in_flight):
+        self.provider_limits = dict(provider_limits)
+        self.max_in_flight = max_in_flight
+        self._pools = {
+            provider: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"yjd-{provider}")
+            for provider, limit in self.provider_limits.items()
+        }
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {"submitted": 0, "completed": 0, "cancelled": 0, "rejected": 0}
+    
+    def submit(self, provider, fn, *args):
+        """提交一次服务商调用；在途数已满时抛出 EngineBusyError，而不是无限排队"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._counters["rejected"] += 1
+            raise EngineBusyError(f"在途调用已达上限（{self.max_in_flight}）")
+        with self._lock:
+            self._in_flight += 1
+            self._counters["submitted"] += 1
+        future = self._pools[provider].submit(fn, *args)
+        future.add_done_callback(self._on_done)
+        return future
+    
+    def _on_done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            self._counters["cancelled" if future.cancelled() else "completed"] += 1
+        self._slots.release()
+    
+    def stats(self):
+        """引擎运行指标：在途调用数、上限、各类计数与进程线程数"""
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "provider_limits": dict(self.provider_limits),
+                "threads": threading.active_count(),
+                **self._counters,
+            }
+
+ENGINE = ExecutionEngine(
+    {
+        "dashscope": int(config.get("DASHSCOPE_MAX_CONCURRENCY", 8)),
+        "zhipu": int(config.get("ZHIPU_MAX_CONCURRENCY", 8)),
+    },
+    max_in_flight=int(config.get("ENGINE_MAX_IN_FLIGHT", 64)),
+)
+
+class ScopeQueue(queue.Queue):
+    """请求结果队列，附带所属请求的撤销标记，供流式读取及时停止"""
+    def __init__(self, cancelled):
+        super().__init__()
+        self.cancelled = cancelled
+
+class CallChannel:
+    """单次调用的结果出口：写入所属请求的结果队列，附带该调用自己的撤销标记"""
+    def __init__(self, result_queue):
+        self.result_queue = result_queue
+        self.cancelled = threading.Event()
+    
+    def put(self, item):
+        self.result_queue.put(item)
+
+class RequestScope:
+    """单次请求的调用范围：汇总结果队列，请求结束或被放弃时撤销尚未完成的调用，也可按结果键单独撤销"""
+    def __init__(self, engine=None, trace=None):
+        self.engine = engine or ENGINE
+        self.trace = trace
+        self.deadline = None  # 本次请求的时限（monotonic），服务商重试不越过该时刻
+        self.cancelled = threading.Event()
+        self.result_queue = ScopeQueue(self.cancelled)
+        self._calls = {}  # 结果键 -> (调用出口, future)
+    
+    def submit(self, keys, provider, fn, *args, **kwargs):
+        """提交产出 keys 的一次调用，fn 经 result_queue 参数拿到专属出口，结果写入本范围的队列；引擎繁忙时返回 False"""
+        channel = CallChannel(self.result_queue)
+        try:
+            future = self.engine.submit(provider, self._guarded, provider, time.monotonic(), channel, fn, args, kwargs)
+        except EngineBusyError as e:
+            print(f"❌ {PLATFORM_NAME_CN} 执行引擎繁忙：{e}")
+            return False
+        for key in keys:
+            self._calls[key] = (channel, future)
+        return True
+    
+    def _guarded(self, provider, submitted_at, channel, fn, args, kwargs):
+        # 排队期间请求或该调用已被放弃则不再发起调用
+        if channel.cancelled.is_set():
+            record_span("queue_wait", submitted_at, "cancelled", {"provider": provider}, trace=self.trace)
+            return
+        record_span("queue_wait", submitted_at, "ok", {"provider": provider}, trace=self.trace)
+        _trace_local.trace = self.trace
+        _trace_local.deadline = self.deadline
+        try:
+            fn(*args, result_queue=channel, **kwargs)
+        finally:
+            _trace_local.trace = None
+            _trace_local.deadline = None
+    
+    def cancel_keys(self, keys):
+        """撤销产出这些结果键的调用：排队中的直接取消，运行中的停止读取流式输出、结果被丢弃，尽早让出引擎名额"""
+        for key in keys:
+            channel, future = self._calls.get(key, (None, None))
+            if channel is not None:
+                channel.cancelled.set()
+                future.cancel()
+    
+    def cancel(self):
+        """撤销本次请求的全部调用"""
+        self.cancelled.set()
+        self.cancel_keys(list(self._calls))
+
+# 由模型注册表生成调度计划
+# 答题结果键 -> (服务商, 答题函数, 答案前缀, [(服务商, 裁判函数, 裁判结果键), ...])
+ANSWER_JUDGE_PLAN = {
+    ans_key: (provider, partial(call_answer, ans_key), f"{name}作答：\n", [
+        (JUDGES[code][0], partial(neutral_judge, code), verdict_key(ans_key, code)) for code in JUDGES
+    ])
+    for ans_key, (_, provider, _, name) in ANSWERERS.items()
+}
+
+# 批量裁判：(服务商, 批量裁判函数, 按答案顺序（答案A、答案B……）排列的裁判结果键)
+BATCH_JUDGE_PLAN = [
+    (provider, partial(batch_judge, code), tuple(verdict_key(ans_key, code) for ans_key in ANSWERERS))
+    for code, (provider, _, _) in JUDGES.items()
+]
+
+# 流水线产出的非结果类事件键
+PIPELINE_META_KEYS = ("route", "degraded", "skipped", "rejected", "timings", "trace")
+
+# 裁判结果键 -> 进度区展示名称
+JUDGE_LABELS = {
+    verdict_key(ans_key, code): f"研精裁判（{judge_name}）→ {ans_name}作答"
+    for ans_key, (_, _, _, ans_name) in ANSWERERS.items()
+    for code, (_, _, judge_name) in JUDGES.items()
+}
+
+# 单个问题最多同时占用的引擎调用数（全部作答 + 全部裁判），批量/预热/压测的问题并发按此折算
+CALLS_PER_QUESTION = len(ANSWER_JUDGE_PLAN) + len(JUDGE_LABELS)
+
+def question_capacity():
+    """执行引擎可同时容纳的问题数（在途调用上限 ÷ 单题调用数）"""
+    return max(ENGINE.max_in_flight // CALLS_PER_QUESTION, 1)
+
+def clamp_question_concurrency(concurrency):
+    """同时处理的问题数不超过执行引擎容量，避免调用被引擎拒绝"""
+    limit = question_capacity()
+    if concurrency > limit:
+        print(f"❌ {PLATFORM_NAME_CN} 并发 {concurrency} 超出执行引擎容量（在途调用上限 {ENGINE.max_in_flight}，每题 {CALLS_PER_QUESTION} 个调用），按 {limit} 执行")
+    return min(concurrency, limit)
+
+def verify_pipeline(question, fast_path_policy=None):
+    """依赖驱动调度：某个答案一到达就启动它的裁判，按完成顺序逐个产出 (结果键, 内容)；
+    流式模式下还会产出 (结果键:partial, 当前已生成文本)；快速通道决策产出 ("route", 路径)；
+    超出 REQUEST_DEADLINE 时撤销未完成调用并产出 ("degraded", 超时结果键列表)；调用被执行引擎拒绝时产出 ("rejected", 结果键列表)；
+    最后产出 ("timings", 各结果到达耗时)。
+    首个事件为 ("trace", 本次请求链路)，各服务商调用、排队等待均记入其中；
+    配置了裁判法定数时，每份答案的一致裁判数达标即产出 ("skipped", 被撤销的裁判结果键列表) 并提前结束"""
+    policy = fast_path_policy or FAST_PATH_POLICY
+    trace = Trace(question)
+    scope = RequestScope(trace=trace)
+    pending = set()
+    answers = {}
+    verdicts = {}
+    started = set()
+    route = "full"
+    quorum = judge_quorum()
+    rejected = []  # 因执行引擎繁忙未能提交的结果键
+    
+    def reject(key, text):
+        rejected.append(key)
+        scope.result_queue.put((key, call_failure(text)))
+    
+    def start_judges(ans_key, limit=None):
+        _, _, prefix, judges = ANSWER_JUDGE_PLAN[ans_key]
+        pure_ans = answers[ans_key].replace(prefix, "")
+        for provider, judge_fn, judge_name in judges[:limit]:
+            if judge_name in started:
+                continue
+            started.add(judge_name)
+            if is_call_failure(answers[ans_key]):
+                # 答案不可用（调用失败或服务商熔断）时不再为它调用裁判
+                scope.result_queue.put((judge_name, call_failure("研精裁判调用失败：答案不可用，跳过研判")))
+            elif not scope.submit((judge_name,), provider, judge_fn, question, pure_ans, judge_name=judge_name):
+                reject(judge_name, "研精裁判调用失败：平台繁忙")
+            pending.add(judge_name)
+    
+    def start_full():
+        # 批量模式下双答案到齐且尚未启动任何裁判时，合并为每个裁判模型一次调用
+        if (
+            JUDGE_BATCH_MODE and not started and len(answers) == len(ANSWER_JUDGE_PLAN)
+            and not any(map(is_call_failure, answers.values()))
+        ):
+            pure = [answers[k].replace(ANSWER_JUDGE_PLAN[k][2], "") for k in ANSWER_JUDGE_PLAN]
+            for provider, batch_fn, judge_names in BATCH_JUDGE_PLAN:
+                started.update(judge_names)
+                if not scope.submit(judge_names, provider, batch_fn, question, pure, judge_names=judge_names):
+                    for judge_name in judge_names:
+                        reject(judge_name, "研精裁判调用失败：平台繁忙")
+                pending.update(judge_names)
+            return
+        for ans_key in answers:
+            start_judges(ans_key)
+    
+    def flagged(verdict):
+        parsed = parse_verdict(verdict)
+        return parsed.failed or not parsed.clean
+    
+    def quorum_reached():
+        # 全部答案到齐、完整研判中，且每份答案的一致裁判数都已达到法定数
+        if quorum >= len(JUDGES) or route != "full" or len(answers) < len(ANSWER_JUDGE_PLAN):
+            return False
+        return all(
+            settled_verdict([verdicts[k] for k in ANSWER_VERDICT_KEYS[ans_key] if k in verdicts])[1] >= quorum
+            for ans_key in ANSWER_JUDGE_PLAN
+        )
+    
+    start = time.monotonic()
+    answer_deadline = start + REQUEST_DEADLINE * ANSWER_STAGE_SHARE
+    final_deadline = start + REQUEST_DEADLINE
+    scope.deadline = final_deadline
+    timed_out = []
+    timings = {}  # 结果键 -> 自请求开始到该结果到达的秒数
+    yield "trace", trace
+    try:
+        for ans_key, (provider, answer_fn, _, _) in ANSWER_JUDGE_PLAN.items():
+            if not scope.submit((ans_key,), provider, answer_fn, question):
+                reject(ans_key, "研精模型调用失败：平台繁忙，请稍后重试")
+            pending.add(ans_key)
+        
+        while pending:
+            answers_pending = sorted(pending & set(ANSWER_JUDGE_PLAN))
+            deadline = answer_deadline if answers_pending else final_deadline
+            try:
+                key, val = scope.result_queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                if not answers_pending:
+                    # 总时限耗尽：撤销未完成的裁判，带着已有结论降级输出
+                    timed_out += sorted(pending)
+                    print(f"❌ {PLATFORM_NAME_CN} 超出请求时限，未返回：{timed_out}")
+                    yield "degraded", timed_out
+                    if rejected:
+                        yield "rejected", rejected
+                    timings["total"] = round(time.monotonic() - start, 4)
+                    yield "timings", timings
+                    return
+                # 答题阶段超时：撤销未到达的答案（释放其引擎名额），已到达的答案直接进入完整研判
+                scope.cancel_keys(answers_pending)
+                for ans_key in answers_pending:
+                    pending.discard(ans_key)
+                    timed_out.append(ans_key)
+                    name = ANSWER_JUDGE_PLAN[ans_key][2].replace("作答：\n", "")
+                    yield ans_key, call_failure(f"{name}调用失败：超出请求时限")
+                if answers:
+                    route = "full"
+                    start_full()
+                    yield "route", route
+                continue
+            if key.split(":")[0] not in pending:
+                continue  # 已按超时放弃的调用迟到的结果
+            if key.endswith(":partial"):
+                yield key, val
+                continue
+            pending.discard(key)
+            timings[key] = round(time.monotonic() - start, 4)
+            yield key, val
+            
+            if key not in ANSWER_JUDGE_PLAN:
+                verdicts[key] = val
+                # 单裁判复核发现问题（或调用失败）时升级为完整交叉研判
+                if route == "fast_single" and flagged(val):
+                    route = "full"
+                    start_full()
+                    yield "route", route
+                elif pending and quorum_reached():
+                    # 已达法定数：其余裁判不再等待，结束时统一撤销
+                    yield "skipped", sorted(pending)
+                    pending.clear()
+                continue
+            
+            answers[key] = val
+            if policy == "off":
+                if not JUDGE_BATCH_MODE:
+                    start_judges(key)
+                elif len(answers) == len(ANSWER_JUDGE_PLAN):
+                    start_full()
+            elif len(answers) < len(ANSWER_JUDGE_PLAN):
+                # 快速通道：首个到达的答案只启动一个裁判（none策略或批量模式不启动），等其余答案到达再决定
+                if policy == "single" and not JUDGE_BATCH_MODE and not started:
+                    start_judges(key, limit=1)
+            else:
+                if all_answers_agree([answers[k] for k in ANSWER_JUDGE_PLAN]):
+                    route = f"fast_{policy}"
+                    if policy == "single" and any(flagged(v) for v in verdicts.values()):
+                        route = "full"
+                    elif policy == "single" and not started:
+                        start_judges(next(iter(ANSWER_JUDGE_PLAN)), limit=1)
+                else:
+                    route = "full"
+                if route == "full":
+                    start_full()
+                yield "route", route
+        if timed_out:
+            yield "degraded", timed_out
+        if rejected:
+            yield "rejected", rejected
+        timings["total"] = round(time.monotonic() - start, 4)
+        yield "timings", timings
+    finally:
+        # 正常结束、超时或调用方放弃（生成器被关闭）时统一撤销未完成调用
+        scope.cancel()
+        outcome = "degraded" if timed_out else ("ok" if not pending else "cancelled")
+        record_span("request", start, outcome, {"route": route}, trace=trace)
+        RECENT_TRACES.append(trace)
+
+# 答案不可用时代入共识融合的裁判结论
+UNAVAILABLE_VERDICT = "错误标注：其他错误：答案不可用\n核心结论：无有效结论"
+
+def degraded_verdicts(answers, verdicts):
+    """共识融合用的裁判结论：失败的裁判以同一答案其余裁判的多数结论代填；
+    该答案全部裁判失败时取答案最终结果行（未经研判）；答案本身不可用时按有错误处理"""
+    fused = dict(verdicts)
+    for ans_key, keys in ANSWER_VERDICT_KEYS.items():
+        failed = [k for k in keys if parse_verdict(verdicts[k]).failed]
+        if not failed:
+            continue
+        if is_call_failure(answers[ans_key]):
+            substitute = UNAVAILABLE_VERDICT
+        else:
+            substitute, _ = settled_verdict([verdicts[k] for k in keys])
+            if substitute is None:
+                pure_ans = answers[ans_key].replace(ANSWER_JUDGE_PLAN[ans_key][2], "")
+                substitute = f"错误标注：无明显错误\n核心结论：{final_result_line(pure_ans)}"
+        fused.update(dict.fromkeys(failed, substitute))
+    return fused
+
+def build_record(question, results):
+    """由流水线结果融合终审结论，返回展示/缓存用记录；答题结果缺失或全部答题模型均调用失败返回 None"""
+    answers = {ans_key: results.get(ans_key, "") for ans_key in ANSWER_JUDGE_PLAN}
+    if not all(answers.values()):
+        return None
+    if all(is_call_failure(answer) for answer in answers.values()):
+        return None
+    degraded = results.get("degraded", [])
+    skipped = results.get("skipped", [])
+    route = results.get("route", "full")
+    if route == "fast_single":
+        # 各模型结果一致，唯一一份裁判结论同时代表全部答案
+        single = next((results[k] for k in JUDGE_LABELS if k in results), call_failure("研精裁判调用失败"))
+        verdicts = {k: single for k in JUDGE_LABELS}
+    elif route == "fast_none":
+        first_key = next(iter(ANSWER_JUDGE_PLAN))
+        pure_ans = answers[first_key].replace(ANSWER_JUDGE_PLAN[first_key][2], "")
+        verdicts = {k: f"错误标注：无明显错误\n核心结论：{final_result_line(pure_ans)}" for k in JUDGE_LABELS}
+    else:
+        verdicts = {k: results.get(k, call_failure("研精裁判调用失败")) for k in JUDGE_LABELS}
+        # 达到法定数后被撤销的裁判，以该答案得票最多的结论代填
+        for ans_key, keys in ANSWER_VERDICT_KEYS.items():
+            settled, _ = settled_verdict([results[k] for k in keys if k in results])
+            for k in keys:
+                if k in skipped and settled is not None:
+                    verdicts[k] = settled
+    # 调用失败或服务商熔断的作答/裁判（超时与法定数撤销已单独记录）
+    unavailable = [
+        k for k in (*answers, *verdicts)
+        if is_call_failure((answers if k in answers else verdicts)[k]) and k not in degraded and k not in skipped
+    ]
+    fused = degraded_verdicts(answers, verdicts)
+    fuse_start = time.monotonic()
+    with span("fuse", trace=results.get("trace")):
+        # 各答案的裁判一致性只计算一次，共识融合与结果展示共用
+        consistency = {ans_key: judges_consistent([fused[k] for k in ANSWER_VERDICT_KEYS[ans_key]]) for ans_key in answers}
+        if LEGACY_MATRIX:
+            summary = summarize_consensus(
+                question, answers["tongyi_ans"], answers["zhipu_ans"],
+                fused["jt_t"], fused["jt_z"], fused["jz_t"], fused["jz_z"],
+                route=route, degraded=degraded, consistency=consistency, unavailable=unavailable
+            )
+        else:
+            summary = summarize_quorum_consensus(
+                question, answers, fused, route=route, degraded=degraded, unavailable=unavailable
+            )
+        final_judgment = render_consensus(summary)
+    timings = dict(results.get("timings", {}))
+    timings["fuse"] = round(time.monotonic() - fuse_start, 4)
+    trace = results.get("trace")
+    return {
+        **answers,
+        **verdicts,
+        "final_judgment": final_judgment,
+        "credibility": summary["credibility"],
+        "direct_answer": summary["direct_answer"],
+        "consistency": consistency,
+        "route": route,
+        "degraded": degraded,
+        "skipped": skipped,
+        "unavailable": unavailable,
+        "timings": timings,
+        "prompt_tokens_saved": trace.prompt_tokens["saved"] if trace else 0,
+    }
+
+class InFlightRun:
+    """一次进行中的研精流程：按顺序保存已产出的事件，任意订阅者可从头回放并持续跟随"""
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self.abandoned = threading.Event()
+        self.subscribers = 0
+        self._cond = threading.Condition()
+        self._last_partial = {}  # 结果键 -> 最近一条流式片段在 events 中的位置
+    
+    def publish(self, key, val):
+        with self._cond:
+            base_key = key.split(":")[0]
+            # 同一结果的旧流式片段已被新片段覆盖，置空以免晚到的订阅者回放整段累积文本
+            old_pos = self._last_partial.pop(base_key, None)
+            if old_pos is not None:
+                self.events[old_pos] = None
+            if key.endswith(":partial"):
+                self._last_partial[base_key] = len(self.events)
+            self.events.append((key, val))
+            self._cond.notify_all()
+    
+    def finish(self):
+        with self._cond:
+            self.done = True
+            self._cond.notify_all()
+    
+    def subscribe(self):
+        pos = 0
+        while True:
+            with self._cond:
+                while pos >= len(self.events) and not self.done:
+                    self._cond.wait()
+                batch = self.events[pos:]
+                pos = len(self.events)
+                finished = self.done
+            for event in batch:
+                if event is not None:
+                    yield event
+            if finished and pos >= len(self.events):
+                return
+
+class SingleFlight:
+    """同题合并：归一化后相同的问题同时只跑一条流水线，并发的重复提交挂到同一次运行上共享进度与结果"""
+    def __init__(self, max_active):
+        self._runs = {}
+        self._lock = threading.Lock()
+        self._drivers = ThreadPoolExecutor(max_workers=max_active, thread_name_prefix="yjd-flight")
+        self.coalesced = 0
+    
+    def events(self, question):
+        key = verify_cache_key(question)
+        with self._lock:
+            run = self._runs.get(key)
+            # 已被放弃的运行仍可能在收尾，不能再挂靠，重新发起一次
+            leader = run is None or run.abandoned.is_set()
+            if leader:
+                run = self._runs[key] = InFlightRun()
+            else:
+                self.coalesced += 1
+            run.subscribers += 1
+        if leader:
+            self._drivers.submit(self._drive, key, question, run)
+        try:
+            yield from run.subscribe()
+        finally:
+            with self._lock:
+                run.subscribers -= 1
+                if run.subscribers == 0 and not run.done:
+                    # 所有订阅者都已离开，不再为这道题继续调用模型；同时摘除，之后的同题提交另起运行
+                    run.abandoned.set()
+                    if self._runs.get(key) is run:
+                        del self._runs[key]
+    
+    def _drive(self, key, question, run):
+        pipeline = verify_pipeline(question)
+        try:
+            for event_key, val in pipeline:
+                run.publish(event_key, val)
+                if run.abandoned.is_set():
+                    break
+        except Exception as e:
+            print(f"❌ {PLATFORM_NAME_CN} 研精流程异常：{e}")
+        finally:
+            pipeline.close()
+            with self._lock:
+                if self._runs.get(key) is run:
+                    del self._runs[key]
+            run.finish()
+    
+    def active(self):
+        with self._lock:
+            return len(self._runs)
+
+SINGLE_FLIGHT = SingleFlight(int(config.get("MAX_ACTIVE_QUESTIONS", 32)))
+
+# 请求准入：同时运行的研精请求数上限、单用户在途（运行+排队）上限、排队深度上限（超过即返回繁忙）与最长排队时间
+ADMISSION_MAX_RUNNING = int(config.get("ADMISSION_MAX_RUNNING", 16))
+ADMISSION_PER_USER = int(config.get("ADMISSION_PER_USER", 2))
+ADMISSION_MAX_QUEUE = int(config.get("ADMISSION_MAX_QUEUE", 64))
+ADMISSION_MAX_WAIT = float(config.get("ADMISSION_MAX_WAIT", REQUEST_DEADLINE))
+PRIORITY_REGISTERED, PRIORITY_GUEST = 0, 1
+
+class AdmissionBusyError(RuntimeError):
+    """请求未获准入：reason 为 busy（排队已满/排队超时）或 user_limit（该用户在途请求已达上限）"""
+    def __init__(self, message, reason="busy"):
+        super().__init__(message)
+        self.reason = reason
+
+class AdmissionTicket:
+    """一次请求的准入凭证"""
+    __slots__ = ("user", "priority", "seq", "enqueued_at", "granted_at")
+    
+    def __init__(self, user, priority, seq):
+        self.user = user
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted_at = None
+    
+    def sort_key(self):
+        return (self.priority, self.seq)
+
+class AdmissionController:
+    """请求准入调度：全局运行数上限内直接放行，超出时排队；排队按注册用户优先、同级先到先服务，
+    单用户在途请求数有上限，排队深度超过阈值或排队超时即快速返回繁忙，保证高峰期尾延迟有界"""
+    def __init__(self, max_running, per_user_limit, max_queue, max_wait):
+        self.max_running = max_running
+        self.per_user_limit = per_user_limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = []  # 按 (优先级, 序号) 排序的排队凭证
+        self._per_user = {}  # 用户 -> 在途请求数（运行+排队）
+        self._seq = 0
+        self._service_times = deque(maxlen=50)  # 最近完成请求的运行耗时，用于估算等待时间
+        self._counters = {"admitted": 0, "queued": 0, "rejected_busy": 0, "rejected_user": 0, "timed_out": 0}
+    
+    def enter(self, user, is_guest=False):
+        """申请准入：空闲时立即获准，否则进入排队；超出单用户上限或排队已满时抛出 AdmissionBusyError"""
+        with self._cond:
+            if self._per_user.get(user, 0) >= self.per_user_limit:
+                self._counters["rejected_user"] += 1
+                raise AdmissionBusyError(f"你已有 {self.per_user_limit} 个研精请求在处理中，请等待完成后再提交", "user_limit")
+            if self._running >= self.max_running and len(self._waiting) >= self.max_queue:
+                self._counters["rejected_busy"] += 1
+                raise AdmissionBusyError("平台繁忙，排队人数已满，请稍后再试")
+            self._seq += 1
+            ticket = AdmissionTicket(user, PRIORITY_GUEST if is_guest else PRIORITY_REGISTERED, self._seq)
+            self._per_user[user] = self._per_user.get(user, 0) + 1
+            if self._running < self.max_running and not self._waiting:
+                self._grant(ticket)
+            else:
+                self._waiting.append(ticket)
+                self._waiting.sort(key=AdmissionTicket.sort_key)
+                self._counters["queued"] += 1
+            return ticket
+    
+    def _grant(self, ticket):
+        ticket.granted_at = time.monotonic()
+        self._running += 1
+        self._counters["admitted"] += 1
+    
+    def _grant_next(self):
+        while self._waiting and self._running < self.max_running:
+            self._grant(self._waiting.pop(0))
+        self._cond.notify_all()
+    
+    def position(self, ticket):
+        """排队位置（1 表示下一个获准）与预计等待秒数；已获准返回 (0, 0)"""
+        with self._cond:
+            if ticket.granted_at is not None:
+                return 0, 0.0
+            position = next((i for i, t in enumerate(self._waiting, 1) if t is ticket), len(self._waiting))
+            return position, self._estimate_wait(position)
+    
+    def _estimate_wait(self, position):
+        # 每批 max_running 个请求并行运行，按最近请求的平均耗时估算；尚无样本时按请求时限的一半估算
+        avg = sum(self._service_times) / len(self._service_times) if self._service_times else REQUEST_DEADLINE / 2
+        return -(-position // self.max_running) * avg
+    
+    def queued(self, ticket, poll=1.0):
+        """排队期间每隔 poll 秒产出一次 (排队位置, 预计等待秒数)，获准后结束；排队超过 max_wait 抛出 AdmissionBusyError"""
+        while True:
+            position, eta = self.position(ticket)
+            if ticket.granted_at is not None:
+                return
+            if time.monotonic() - ticket.enqueued_at >= self.max_wait:
+                with self._cond:
+                    if ticket.granted_at is None:
+                        self._counters["timed_out"] += 1
+                        raise AdmissionBusyError("平台繁忙，排队超时，请稍后再试")
+                return
+            yield position, eta
+            with self._cond:
+                if ticket.granted_at is None:
+                    self._cond.wait(poll)
+    
+    def release(self, ticket):
+        """请求结束（完成、失败或排队中途放弃）时释放凭证"""
+        with self._cond:
+            if ticket.granted_at is not None:
+                self._running -= 1
+                self._service_times.append(time.monotonic() - ticket.granted_at)
+            elif ticket in self._waiting:
+                self._waiting.remove(ticket)
+            remaining = self._per_user.get(ticket.user, 0) - 1
+            if remaining > 0:
+                self._per_user[ticket.user] = remaining
+            else:
+                self._per_user.pop(ticket.user, None)
+            self._grant_next()
+    
+    def stats(self):
+        with self._cond:
+            return {"running": self._running, "waiting": len(self._waiting), **self._counters}
+
+ADMISSION = AdmissionController(ADMISSION_MAX_RUNNING, ADMISSION_PER_USER, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT)
+
+def store_record(cache_key, question, record):
+    """写入研精缓存（含调用失败内容的记录不缓存）"""
+    if VERIFY_CACHE_ENABLED and not any(is_call_failure(record[k]) for k in CACHE_FIELDS):
+        return VERIFY_CACHE.put(cache_key, question, record)
+    return False
+
+def run_verification(question, refresh=False, on_event=None, user=None):
+    """无界面执行与 core_verify_logic 相同的研精流程，返回 (记录或None, 是否命中缓存)；
+    on_event(结果键, 内容) 在每个完整结果及流水线事件到达时回调（不含流式片段）；传入 user 时写审计日志"""
+    cache_key = verify_cache_key(question)
+    if VERIFY_CACHE_ENABLED and not refresh:
+        cached = VERIFY_CACHE.get(cache_key)
+        if cached:
+            if user is not None:
+                audit_request(user, question, cached, from_cache=True)
+            return cached, True
+    results = {}
+    for key, val in SINGLE_FLIGHT.events(question):
+        if key.endswith(":partial"):
+            continue
+        results[key] = val
+        if on_event is not None:
+            on_event(key, val)
+    record = build_record(question, results)
+    if record is not None:
+        store_record(cache_key, question, record)
+        record_cassette_result(question, record)
+    if user is not None:
+        audit_request(user, question, record or results, status="ok" if record else "failed")
+    return record, False
+
+# ===================== 11. 链路追踪与运行指标（Prometheus） =====================
+METRICS_PORT = int(config.get("METRICS_PORT", 9464))  # 指标端口，0 表示不启动
+# 指标服务无鉴权且 /traces 含用户问题文本，默认只监听本机；需对外暴露时显式配置（如 0.0.0.0）
+METRICS_HOST = config.get("METRICS_HOST", "127.0.0.1")
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+def _label_str(labelnames, key):
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, key):
+        value = value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+class Histogram:
+    """Prometheus直方图：按标签组合分别累计各桶计数、总和与次数"""
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    le_key = key + (str(bound),)
+                    lines.append(f"{self.name}_bucket{_label_str(self.labelnames + ('le',), le_key)} {count}")
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames + ('le',), key + ('+Inf',))} {series['count']}")
+                lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {series['count']}")
+        return lines
+
+class Counter:
+    """Prometheus计数器"""
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labelnames, key)} {value}")
+        return lines
+
+# 各类span对应的耗时直方图
+SPAN_HISTOGRAMS = {
+    "provider_call": Histogram("yjd_provider_call_seconds", "服务商调用耗时（流式含读完全部增量）", ("provider", "model", "outcome")),
+    "queue_wait": Histogram("yjd_queue_wait_seconds", "调用在执行引擎中的排队等待时间", ("provider", "outcome")),
+    "user_store": Histogram("yjd_user_store_seconds", "用户数据读写耗时", ("op", "outcome")),
+    "fuse": Histogram("yjd_fuse_seconds", "共识融合耗时", ("outcome",)),
+    "request": Histogram("yjd_request_seconds", "单次研精流程端到端耗时", ("route", "outcome")),
+}
+PROVIDER_TOKENS = Counter("yjd_provider_tokens_total", "服务商调用token数", ("model", "kind"))
+PROVIDER_ERRORS = Counter("yjd_provider_errors_total", "服务商调用错误数（按错误类别，circuit_open=熔断跳过）", ("provider", "kind"))
+PROVIDER_RETRIES = Counter("yjd_provider_retries_total", "服务商调用重试次数（按触发重试的错误类别）", ("provider", "kind"))
+PROMPT_TOKENS = Counter("yjd_prompt_tokens_estimated_total", "本地估算的prompt token数（sent=实际发送，saved=答案压缩节省）", ("kind",))
+RECENT_TRACES = deque(maxlen=int(config.get("TRACE_HISTORY", 200)))
+_trace_local = threading.local()
+
+class Trace:
+    """单次研精请求的链路：按时间记录每个span（名称、起始偏移、耗时、属性）"""
+    def __init__(self, question):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.question = question[:100]
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self.spans = []
+        self.prompt_tokens = {"sent": 0, "saved": 0}  # 本地估算的prompt规模与答案压缩节省量
+        self._lock = threading.Lock()
+    
+    def note_prompt(self, sent, saved):
+        with self._lock:
+            self.prompt_tokens["sent"] += sent
+            self.prompt_tokens["saved"] += saved
+    
+    def add(self, name, start, duration, attrs):
+        with self._lock:
+            self.spans.append({
+                "name": name, "offset": round(start - self._start, 4), "duration": round(duration, 4), **attrs
+            })
+    
+    def to_dict(self):
+        with self._lock:
+            return {
+                "trace_id": self.trace_id, "question": self.question,
+                "started_at": self.started_at, "prompt_tokens": dict(self.prompt_tokens), "spans": list(self.spans),
+            }
+
+def current_trace():
+    return getattr(_trace_local, "trace", None)
+
+def record_span(name, start, outcome, labels=None, attrs=None, trace=None):
+    """结束一个span：写入对应直方图，并追加到当前请求链路（如有）"""
+    duration = time.monotonic() - start
+    labels = labels or {}
+    SPAN_HISTOGRAMS[name].observe(duration, outcome=outcome, **labels)
+    trace = trace or current_trace()
+    if trace is not None:
+        trace.add(name, start, duration, {"outcome": outcome, **labels, **(attrs or {})})
+
+def note_prompt_tokens(sent, saved):
+    """记录一次请求消息的估算token数及答案压缩节省量"""
+    PROMPT_TOKENS.inc(sent, kind="sent")
+    PROMPT_TOKENS.inc(saved, kind="saved")
+    trace = current_trace()
+    if trace is not None:
+        trace.note_prompt(sent, saved)
+
+@contextmanager
+def span(name, trace=None, **labels):
+    """记录一段操作的耗时与结果；yield 的 dict 可补充属性（如 token 数）"""
+    start = time.monotonic()
+    attrs = {}
+    outcome = "ok"
+    try:
+        yield attrs
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        record_span(name, start, attrs.pop("outcome", outcome), labels, attrs, trace)
+
+def _usage_tokens(provider, obj):
+    usage = getattr(obj, "usage", None)
+    if usage is None:
+        return None
+    if provider == "dashscope":
+        return getattr(usage, "input_tokens", None), getattr(usage, "output_tokens", None)
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+def _finish_provider_span(provider, model, start, outcome, usage, trace):
+    attrs = {}
+    if usage and usage[0] is not None:
+        attrs = {"prompt_tokens": usage[0], "completion_tokens": usage[1] or 0}
+        PROVIDER_TOKENS.inc(usage[0], model=model, kind="prompt")
+        PROVIDER_TOKENS.inc(usage[1] or 0, model=model, kind="completion")
+    record_span("provider_call", start, outcome, {"provider": provider, "model": model}, attrs, trace)
+
+def _traced_stream(chunks, provider, model, start, trace):
+    """包装流式响应：读完（或中途放弃）时才结束span，记录最后一次出现的用量"""
+    usage = None
+    outcome = "error"
+    try:
+        for chunk in chunks:
+            usage = _usage_tokens(provider, chunk) or usage
+            yield chunk
+        outcome = "ok"
+    except GeneratorExit:
+        outcome = "cancelled"
+        raise
+    finally:
+        _finish_provider_span(provider, model, start, outcome, usage, trace)
+
+def traced_provider_call(provider, model, call, stream=False):
+    """执行一次服务商调用并记录 span：耗时、prompt/completion token 数、结果"""
+    start = time.monotonic()
+    trace = current_trace()
+    try:
+        response = call()
+    except Exception:
+        _finish_provider_span(provider, model, start, "error", None, trace)
+        raise
+    if stream:
+        return _traced_stream(response, provider, model, start, trace)
+    outcome = "ok" if getattr(response, "status_code", 200) == 200 else "error"
+    _finish_provider_span(provider, model, start, outcome, _usage_tokens(provider, response), trace)
+    return response
+
+def render_metrics():
+    """Prometheus文本格式的全部指标"""
+    lines = []
+    for histogram in SPAN_HISTOGRAMS.values():
+        lines += histogram.render()
+    lines += PROVIDER_TOKENS.render()
+    lines += PROMPT_TOKENS.render()
+    lines += PROVIDER_ERRORS.render()
+    lines += PROVIDER_RETRIES.render()
+    lines += ["# HELP yjd_breaker_open 服务商熔断状态（1=熔断中，0.5=探测中，0=正常）", "# TYPE yjd_breaker_open gauge"]
+    lines += [
+        f'yjd_breaker_open{{provider="{provider}"}} {BREAKER_STATE_VALUES[breaker.state]}'
+        for provider, breaker in BREAKERS.items()
+    ]
+    admission = ADMISSION.stats()
+    gauges = {
+        "yjd_engine_in_flight": ("执行引擎在途调用数", ENGINE.stats()["in_flight"]),
+        "yjd_engine_max_in_flight": ("执行引擎在途调用上限", ENGINE.max_in_flight),
+        "yjd_threads": ("进程线程数", threading.active_count()),
+        "yjd_active_questions": ("进行中的去重问题数", SINGLE_FLIGHT.active()),
+        "yjd_single_flight_coalesced_total": ("同题合并次数", SINGLE_FLIGHT.coalesced),
+        "yjd_verify_cache_hits_total": ("研精缓存命中次数", VERIFY_CACHE.hits),
+        "yjd_verify_cache_misses_total": ("研精缓存未命中次数", VERIFY_CACHE.misses),
+        "yjd_judge_cache_hits_total": ("裁判记忆命中次数", JUDGE_VERDICT_CACHE.hits),
+        "yjd_judge_cache_misses_total": ("裁判记忆未命中次数", JUDGE_VERDICT_CACHE.misses),
+        "yjd_startup_seconds": ("模块导入耗时（秒）", round(STARTUP_SECONDS, 4)),
+        "yjd_admission_running": ("获准运行中的研精请求数", admission["running"]),
+        "yjd_admission_waiting": ("排队等待准入的研精请求数", admission["waiting"]),
+        "yjd_admission_queued_total": ("进入排队的请求数", admission["queued"]),
+        "yjd_admission_rejected_busy_total": ("因排队已满被拒绝的请求数", admission["rejected_busy"]),
+        "yjd_admission_rejected_user_total": ("因单用户在途上限被拒绝的请求数", admission["rejected_user"]),
+        "yjd_admission_timed_out_total": ("排队超时的请求数", admission["timed_out"]),
+        "yjd_audit_written_total": ("审计日志已写入记录数", AUDIT_LOG.written),
+        "yjd_audit_dropped_total": ("审计日志因队列已满或写入失败丢弃的记录数", AUDIT_LOG.dropped),
+        "yjd_audit_queue_depth": ("审计日志待写入记录数", AUDIT_LOG.pending()),
+    }
+    for name, (help_text, value) in gauges.items():
+        metric_type = "counter" if name.endswith("_total") else "gauge"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """/metrics 输出 Prometheus 指标，/traces 输出最近的请求链路（JSON）"""
+    def do_GET(self):
+        if self.path.startswith("/metrics"):
+            body, content_type = render_metrics().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.startswith("/traces"):
+            traces = [trace.to_dict() for trace in list(RECENT_TRACES)]
+            body, content_type = json.dumps(traces, ensure_ascii=False).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port=None):
+    """在后台线程启动指标服务（与Gradio并行运行）"""
+    port = METRICS_PORT if port is None else port
+    if not port:
+        return None
+    server = ThreadingHTTPServer((METRICS_HOST, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="yjd-metrics").start()
+    print(f"📈 {PLATFORM_NAME_CN} 指标服务：http://{METRICS_HOST}:{port}/metrics | 请求链路：http://{METRICS_HOST}:{port}/traces")
+    return server
+
+# ===================== 12. 核心业务逻辑 =====================
+# 结果区拆分为独立组件：状态行、终审结论卡片、各作答面板与各裁判面板；每一步只更新发生变化的组件
+# 面板顺序：每份作答之后紧跟该答案的全部裁判结论
+RESULT_PANELS = tuple(key for ans_key, keys in ANSWER_VERDICT_KEYS.items() for key in (ans_key, *keys))
+RESULT_IDLE_TEXT = f"等待登录后提交问题，{PLATFORM_NAME_CN}为你提供双模型深度研精验证+直接答案回应！"
+
+def result_view(status=None, conclusion=None, panels=None, clear=False):
+    """结果区增量更新：返回 (状态行, 终审结论, *各面板) 的更新，未传入的组件返回空更新、不传输内容；
+    clear=True 时清空并隐藏未传入的结论与面板"""
+    panels = panels or {}
+    default = "" if clear else None
+    
+    def update(value):
+        return gr.update() if value is None else gr.update(value=value, visible=bool(value))
+    
+    return (
+        gr.update() if status is None else gr.update(value=status),
+        update(default if conclusion is None else conclusion),
+        *(update(panels.get(key, default)) for key in RESULT_PANELS),
+    )
+
+def submit_button(busy_text=None):
+    """提交按钮：处理中显示步骤文字并禁用，否则恢复可提交"""
+    if busy_text:
+        return gr.update(variant="secondary", interactive=False, value=busy_text)
+    return gr.update(variant="primary", interactive=True, value="提交研精验证")
+
+def panel_text(key, text):
+    """作答面板直接展示作答内容；裁判面板加上裁判标题"""
+    return text if key in ANSWERERS else f"**{JUDGE_LABELS[key]}**\n{text}"
+
+def guest_tip(user_state, remain_count):
+    """游客剩余次数提示（非游客返回空字符串）"""
+    if not user_state.get("is_guest"):
+        return ""
+    return f"\n<div class='guest-tip'>💡 游客提示：本次使用后剩余免费次数：{remain_count}次</div>"
+
+def result_status(question, tip_text="", from_cache=False):
+    """结果完成后的状态行：标题、待解问题、缓存与游客提示"""
+    cache_tip = "\n> ⚡ 本结果来自研精缓存（同一问题已验证过），未重复调用模型" if from_cache else ""
+    return f"### {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 多模型研精验证结果\n**待解问题：**{question}{cache_tip}{tip_text}"
+
+def record_panels(record):
+    """研精记录 -> 各面板内容；同一答案的裁判结论一致时只展示一份，其余裁判面板隐藏"""
+    consistency = record.get("consistency") or {}
+    panels = {}
+    for ans_key, keys in ANSWER_VERDICT_KEYS.items():
+        if ans_key not in record:
+            continue
+        panels[ans_key] = record[ans_key]
+        judgments = [record[k] for k in keys]
+        # 旧缓存记录没有一致性字段时现场计算
+        consistent = consistency[ans_key] if ans_key in consistency else judges_consistent(judgments)
+        if consistent and len(keys) > 1:
+            panels.update({k: "" for k in keys})
+            panels[keys[0]] = f"**研精裁判判定结果（{len(keys)}位裁判结论一致）**\n{judgments[0]}"
+        else:
+            panels.update({k: panel_text(k, record[k]) for k in keys})
+    return panels
 
-# ===================== 9. 核心业务逻辑 =====================
 def core_verify_logic(question, user_state, guest_id_state):
     # 1. 登录状态校验
     if not user_state or not user_state.get("is_login"):
-        yield gr.update(value="❌ 请先登录或使用游客模式！"), gr.update(
-            variant="primary",
-            interactive=True,
-            value="提交研精验证"
-        ), user_state, guest_id_state
+        yield *result_view(status="❌ 请先登录或使用游客模式！", clear=True), submit_button(), user_state, guest_id_state
         return
     
     # 2. 空问题校验
     if not question.strip():
-        yield gr.update(value="❌ 请输入有效的问题！"), gr.update(
-            variant="primary",
-            interactive=True,
-            value="提交研精验证"
-        ), user_state, guest_id_state
+        yield *result_view(status="❌ 请输入有效的问题！", clear=True), submit_button(), user_state, guest_id_state
         return
     
     # 3. 游客次数限制校验
+    guest_remain = None
     if user_state.get("is_guest"):
-        user_data = load_user_data()
         guest_id = user_state["username"].replace("游客", "")
-        
-        if guest_id not in user_data["guest_usage"]:
-            user_data["guest_usage"][guest_id] = {"usage_count": 0}
-        
-        used_count = user_data["guest_usage"][guest_id]["usage_count"]
-        if used_count >= FREE_USE_LIMIT:
-            yield gr.update(value=f"❌ 免费使用次数已用尽（共{FREE_USE_LIMIT}次），请注册账号后继续使用！"), gr.update(
-                variant="primary",
-                interactive=True,
-                value="提交研精验证"
-            ), user_state, guest_id_state
+        # 原子扣减次数，并发提交不会丢失更新
+        used_count = USER_STORE.consume_guest_quota(guest_id, FREE_USE_LIMIT)
+        if used_count is None:
+            yield *result_view(
+                status=f"❌ 免费使用次数已用尽（共{FREE_USE_LIMIT}次），请注册账号后继续使用！", clear=True
+            ), submit_button(), user_state, guest_id_state
             return
-        
-        # 扣减次数
-        user_data["guest_usage"][guest_id]["usage_count"] += 1
-        save_user_data(user_data)
-    
-    # 步骤1：模型初始化
-    yield gr.update(value=f"### {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 处理进度\n1. 正在初始化模型，准备研精研判..."), gr.update(
-        variant="secondary",
-        interactive=False,
-        value="正在处理中...（步骤1/4：模型初始化）"
-    ), user_state, guest_id_state
-    
-    # 步骤2：双模型同步答题
-    result_queue = queue.Queue()
-    threads = [
-        threading.Thread(target=call_tongyi_answer, args=(question, result_queue)),
-        threading.Thread(target=call_zhipu_answer, args=(question, result_queue))
-    ]
-    for t in threads:
-        t.start()
-    for t in threads:
-        t.join(timeout=THREAD_TIMEOUT)
-    
-    yield gr.update(value=f"### {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 处理进度\n2. 双模型正在同步答题，深度分析中..."), gr.update(
-        variant="secondary",
-        interactive=False,
-        value="正在处理中...（步骤2/4：双模型答题）"
-    ), user_state, guest_id_state
+        guest_remain = FREE_USE_LIMIT - used_count
     
-    # 获取答题结果
-    tongyi_ans = ""
-    zhipu_ans = ""
-    while not result_queue.empty():
-        key, val = result_queue.get()
-        if key == "tongyi_ans":
-            tongyi_ans = val
-        elif key == "zhipu_ans":
-            zhipu_ans = val
-    if not tongyi_ans or not zhipu_ans:
-        error_msg = f"答题模型调用失败：\n研精千问：{tongyi_ans}\n研精清言：{zhipu_ans}"
-        yield gr.update(value=error_msg), gr.update(
-            variant="primary",
-            interactive=True,
-            value="提交研精验证"
-        ), user_state, guest_id_state
+    # 缓存命中：直接返回，不调用任何模型
+    cache_key = verify_cache_key(question)
+    cached = VERIFY_CACHE.get(cache_key) if VERIFY_CACHE_ENABLED else None
+    if cached:
+        audit_request(user_state["username"], question, cached, from_cache=True)
+        yield *result_view(
+            status=result_status(question, guest_tip(user_state, guest_remain), from_cache=True),
+            conclusion=cached["final_judgment"], panels=record_panels(cached), clear=True
+        ), submit_button(), user_state, guest_id_state
         return
     
-    # 步骤3：双裁判交叉核验
-    pure_tongyi_ans = tongyi_ans.replace("研精千问作答：\n", "")
-    pure_zhipu_ans = zhipu_ans.replace("研精清言作答：\n", "")
-    
-    yield gr.update(value=f"### {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 处理进度\n3. 双裁判正在中立研判，交叉验证中..."), gr.update(
-        variant="secondary",
-        interactive=False,
-        value="正在处理中...（步骤3/4：裁判核验）"
-    ), user_state, guest_id_state
+    # 准入调度：注册用户优先于游客，排队时展示位置与预计等待；排队已满或超时快速提示繁忙（退还游客次数）
+    progress_title = f"### {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 处理进度"
+    ticket = None
+    try:
+        ticket = ADMISSION.enter(user_state["username"], user_state.get("is_guest"))
+        for position, eta in ADMISSION.queued(ticket):
+            yield *result_view(
+                status=f"{progress_title}\n⏳ 排队中：第 {position} 位，预计等待约 {eta:.0f} 秒（注册用户优先）", clear=True
+            ), submit_button(f"排队中...（第 {position} 位）"), user_state, guest_id_state
+        yield from verify_steps(question, cache_key, user_state, guest_id_state, guest_remain)
+    except AdmissionBusyError as e:
+        if user_state.get("is_guest"):
+            USER_STORE.refund_guest_quota(user_state["username"].replace("游客", ""))
+        yield *result_view(status=f"❌ {e}", clear=True), submit_button(), user_state, guest_id_state
+    finally:
+        if ticket is not None:
+            ADMISSION.release(ticket)
+
+def verify_steps(question, cache_key, user_state, guest_id_state, guest_remain):
+    """获准运行后的研精步骤：答题、裁判、融合，逐步推送结果区更新"""
+    # 步骤1：模型初始化（清空上一次的结果）
+    progress_title = f"### {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 处理进度"
+    status_text = f"{progress_title}\n1. 正在初始化模型，准备研精研判..."
+    btn_text = "正在处理中...（步骤1/4：模型初始化）"
+    yield *result_view(status=status_text, clear=True), submit_button(btn_text), user_state, guest_id_state
     
-    # 启动裁判线程
-    judge_threads = [
-        threading.Thread(target=neutral_judge_tongyi, args=(question, pure_tongyi_ans, result_queue, "jt_t")),
-        threading.Thread(target=neutral_judge_zhipu, args=(question, pure_tongyi_ans, result_queue, "jt_z")),
-        threading.Thread(target=neutral_judge_tongyi, args=(question, pure_zhipu_ans, result_queue, "jz_t")),
-        threading.Thread(target=neutral_judge_zhipu, args=(question, pure_zhipu_ans, result_queue, "jz_z"))
-    ]
-    for t in judge_threads:
-        t.start()
-    for t in judge_threads:
-        t.join(timeout=THREAD_TIMEOUT)
-    
-    # 获取裁判结果
-    jt_t = jt_z = jz_t = jz_z = "研精裁判调用失败"
-    while not result_queue.empty():
-        key, val = result_queue.get()
-        if key == "jt_t":
-            jt_t = val
-        elif key == "jt_z":
-            jt_z = val
-        elif key == "jz_t":
-            jz_t = val
-        elif key == "jz_z":
-            jz_z = val
+    # 步骤2/3：双模型答题，任一答案到达即展示并启动该答案的双裁判；流式片段实时刷新
+    # 同一问题正在被其他会话验证时直接挂到该次运行上，共享进度与结果
+    # 每个事件只更新对应的作答/裁判面板，状态行与按钮文字变化时才随之更新
+    results = {}  # 结果键 -> 完整结果
+    shown = {}  # 面板结果键 -> 当前已展示的文本
+    for key, val in SINGLE_FLIGHT.events(question):
+        if not key.endswith(":partial"):
+            results[key] = val
+        if key in PIPELINE_META_KEYS:
+            continue
+        panel_key = key.split(":")[0]
+        shown[panel_key] = panel_text(panel_key, val)
+        
+        if all(k in results for k in ANSWER_JUDGE_PLAN):
+            judge_done = sum(k in results for k in JUDGE_LABELS)
+            if results.get("route", "full") == "full":
+                step_text = f"3. 双裁判正在中立研判，交叉验证中...（已完成 {judge_done}/{len(JUDGE_LABELS)}）"
+            else:
+                step_text = f"3. 双模型结果一致，快速通道复核中...（已完成 {judge_done} 份裁判）"
+            step_btn = "正在处理中...（步骤3/4：裁判核验）"
+        else:
+            step_text = "2. 双模型正在同步答题，已到达的答案已进入裁判研判..."
+            step_btn = "正在处理中...（步骤2/4：双模型答题）"
+        step_status = f"{progress_title}\n{step_text}"
+        yield *result_view(
+            status=step_status if step_status != status_text else None,
+            panels={panel_key: shown[panel_key]}
+        ), submit_button(step_btn) if step_btn != btn_text else gr.update(), user_state, guest_id_state
+        status_text, btn_text = step_status, step_btn
     
     # 步骤4：融合结论生成结果
-    yield gr.update(value=f"### {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 处理进度\n4. 正在融合研判结论，生成研精结果..."), gr.update(
-        variant="secondary",
-        interactive=False,
-        value="正在处理中...（步骤4/4：结论融合）"
+    yield *result_view(status=f"{progress_title}\n4. 正在融合研判结论，生成研精结果..."), submit_button(
+        "正在处理中...（步骤4/4：结论融合）"
     ), user_state, guest_id_state
     
     # 融合终审结果（包含直接回答问题功能）
-    final_judgment = fuse_consensus(
-        question, tongyi_ans, zhipu_ans,
-        jt_t, jz_z, jz_t, jz_z
-    )
-    
-    # 组装最终输出
-    tongyi_judge_show = jt_t if is_judge_consistent(jt_t, jz_z) else f"{jt_t}\n{jt_z}"
-    zhipu_judge_show = jz_t if is_judge_consistent(jz_t, jz_z) else f"{jz_t}\n{jz_z}"
-    
-    # 游客剩余次数提示
-    tip_text = ""
-    if user_state.get("is_guest"):
-        remain_count = FREE_USE_LIMIT - (user_data["guest_usage"][guest_id]["usage_count"])
-        tip_text = f"\n<div style='color: #ff6600; font-size: 12px; margin: 10px 0;'>💡 游客提示：本次使用后剩余免费次数：{remain_count}次</div>"
+    record = build_record(question, results)
+    if record is None:
+        error_msg = "答题模型调用失败：\n" + "\n".join(
+            f"{ANSWERERS[k][3]}：{results.get(k, '')}" for k in ANSWER_JUDGE_PLAN
+        )
+        audit_request(user_state["username"], question, results, status="failed")
+        yield *result_view(status=error_msg), submit_button(), user_state, guest_id_state
+        return
+    store_record(cache_key, question, record)
+    record_cassette_result(question, record)
+    audit_request(user_state["username"], question, record)
     
-    final_result = f"""# {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 多模型研精验证结果
-## 待解问题：{question}
-{final_judgment}{tip_text}
+    # 最终状态：只下发与已展示内容不同的面板（通常仅终审结论卡片与合并后的裁判面板）+恢复按钮
+    panels = {k: v for k, v in record_panels(record).items() if shown.get(k, "") != v}
+    yield *result_view(
+        status=result_status(question, guest_tip(user_state, guest_remain)),
+        conclusion=record["final_judgment"], panels=panels
+    ), submit_button(), user_state, guest_id_state
 
-## 📄 原始作答与裁判详情
-<div style="font-size: 12px; color: #444; line-height: 1.6; word-wrap: break-word; word-break: break-all;">
-### 研精千问作答
-{tongyi_ans}
+# ===================== 13. 离线任务：缓存预热 / 批量验证 =====================
+# 输入框中的示例问题（高频问题，预热时可一并写入缓存）
+QUESTION_EXAMPLES = [
+    "某电商商品原价3200元，8.5折后减300，再缴3%增值税，最终支付多少？",
+    "请辨析不当得利和无因管理的核心区别（符合《民法典》）",
+    "甲/乙/丙仓库对应A/B/C货物，推理各仓库存放类型（甲≠A，乙≠B，丙≠C）",
+]
 
-### 研精裁判判定结果
-{tongyi_judge_show}
+def read_question_corpus(path):
+    """读取JSONL问题语料：每行取 question 字段，兼容 requests.jsonl 格式（body/title）"""
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"❌ 语料第{line_no}行不是合法JSON，已跳过：{e}")
+                continue
+            question = item.get("question") or item.get("body") or item.get("title") or ""
+            if question.strip():
+                questions.append(question)
+    return questions
 
----
+def warmup_cache(corpus_path=None, concurrency=4, refresh=False, include_examples=False):
+    """缓存预热：以有界并发把语料逐条跑完整研精流程并写入缓存；refresh=True 时强制重跑已缓存条目"""
+    if not VERIFY_CACHE_ENABLED:
+        print(f"❌ {PLATFORM_NAME_CN} 研精缓存未启用（VERIFY_CACHE_ENABLED=0），无需预热")
+        return {}
+    pruned = VERIFY_CACHE.prune_stale(pipeline_version())
+    questions = list(QUESTION_EXAMPLES) if include_examples else []
+    if corpus_path:
+        questions += read_question_corpus(corpus_path)
+    questions = list(dict.fromkeys(questions))
+    concurrency = clamp_question_concurrency(concurrency)
+    stats = {"total": len(questions), "cached": 0, "filled": 0, "failed": 0, "pruned": pruned}
+    print(f"🔥 {PLATFORM_NAME_CN} 缓存预热：{len(questions)} 个问题，并发 {concurrency}，已清理旧版本缓存 {pruned} 条")
+    
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="yjd-warmup") as pool:
+        futures = {pool.submit(run_verification, q, refresh): q for q in questions}
+        for done_count, future in enumerate(as_completed(futures), 1):
+            question = futures[future]
+            try:
+                record, from_cache = future.result()
+            except Exception as e:
+                record, from_cache = None, False
+                print(f"❌ 预热失败：{question[:30]}：{e}")
+            if from_cache:
+                stats["cached"] += 1
+            elif record is not None and not any(is_call_failure(record[k]) for k in CACHE_FIELDS):
+                stats["filled"] += 1
+            else:
+                stats["failed"] += 1
+            print(f"  [{done_count}/{len(questions)}] {'命中' if from_cache else ('完成' if record else '失败')}：{question[:30]}")
+    
+    print(f"✅ 预热完成，用时 {time.monotonic() - start:.1f}s：{stats}")
+    return stats
 
-### 研精清言作答
-{zhipu_ans}
+def _batch_item_id(item, question):
+    return str(item.get("request_id") or item.get("id") or hashlib.sha256(
+        normalize_question(question).encode("utf-8")
+    ).hexdigest()[:16])
 
-### 研精裁判判定结果
-{zhipu_judge_show}
-</div>"""
+def _load_batch_checkpoint(out_path):
+    """读取已有输出作为断点：返回已成功完成的条目ID；失败或写了一半的行会被剔除以便重跑"""
+    if not os.path.exists(out_path):
+        return set()
+    kept = []
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if row.get("status") == "ok":
+                kept.append(line if line.endswith("\n") else line + "\n")
+    # 先写临时文件再原子替换，重写过程中被中断也不会丢失已完成的结果
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(kept)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, out_path)
+    return {json.loads(line)["id"] for line in kept}
+
+def batch_verify(in_path, out_path, concurrency=4, refresh=False):
+    """无界面批量验证：读取JSONL问题，跑与界面相同的 答题→裁判→共识融合 流程，逐条写出JSONL结果，可断点续跑"""
+    items = []
+    with open(in_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"❌ 输入第{line_no}行不是合法JSON，已跳过：{e}")
+                continue
+            question = item.get("question") or item.get("body") or item.get("title") or ""
+            if question.strip():
+                items.append((_batch_item_id(item, question), question))
     
-    # 最终状态：返回结果+恢复按钮
-    yield gr.update(value=final_result), gr.update(
-        variant="primary",
-        interactive=True,
-        value="提交研精验证"
-    ), user_state, guest_id_state
+    done_ids = _load_batch_checkpoint(out_path)
+    todo = [(item_id, q) for item_id, q in dict(items).items() if item_id not in done_ids]
+    concurrency = clamp_question_concurrency(concurrency)
+    print(f"📦 {PLATFORM_NAME_CN} 批量验证：共 {len(items)} 条，已完成 {len(items) - len(todo)} 条，本次处理 {len(todo)} 条，并发 {concurrency}")
+    
+    def verify_one(item_id, question):
+        start = time.monotonic()
+        rejected = []
+        record, from_cache = run_verification(
+            question, refresh=refresh, on_event=lambda key, val: rejected.extend(val) if key == "rejected" else None
+        )
+        row = {"id": item_id, "question": question, "from_cache": from_cache}
+        if record is None:
+            row["status"] = "failed"
+        else:
+            failed = any(is_call_failure(record[k]) for k in CACHE_FIELDS)
+            row["status"] = "failed" if failed else "ok"
+        if rejected:
+            # 调用被执行引擎拒绝：属于本机资源不足而非模型问题，不写入断点，重跑时再处理
+            row["status"] = "busy"
+        if record is not None:
+            row.update({k: record.get(k) for k in (
+                *RESULT_KEYS, "credibility", "direct_answer", "consistency", "route", "degraded", "skipped", "unavailable", "timings",
+                "prompt_tokens_saved"
+            )})
+        row["elapsed"] = round(time.monotonic() - start, 4)
+        return row
+    
+    stats = {"ok": 0, "failed": 0, "busy": 0}
+    start = time.monotonic()
+    with open(out_path, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="yjd-batch") as pool:
+        futures = {pool.submit(verify_one, item_id, q): item_id for item_id, q in todo}
+        for done_count, future in enumerate(as_completed(futures), 1):
+            try:
+                row = future.result()
+            except Exception as e:
+                row = {"id": futures[future], "status": "failed", "error": str(e)}
+            stats[row["status"]] += 1
+            print(f"  [{done_count}/{len(todo)}] {row['status']}：{row['id']}")
+            if row["status"] == "busy":
+                continue
+            # 每条结果立即落盘，中断后重跑会跳过已成功的条目
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            out.flush()
+    
+    print(f"✅ 批量验证完成，用时 {time.monotonic() - start:.1f}s：{stats}")
+    if stats["busy"]:
+        print(f"❌ {stats['busy']} 条因执行引擎繁忙未处理，未写入结果，重跑同一命令即可补齐")
+    return stats
+
+def measure_startup(runs=5):
+    """冷启动测量：在全新解释器中导入本模块 runs 次，统计导入耗时与进程总耗时的中位数"""
+    code = "import app; print(app.STARTUP_SECONDS)"
+    imports, totals = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True
+        )
+        totals.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            print(f"❌ 导入失败：{proc.stderr.strip()[-500:]}")
+            return None
+        imports.append(float(proc.stdout.strip().splitlines()[-1]))
+    imports.sort()
+    totals.sort()
+    stats = {"runs": runs, "import_p50": round(imports[runs // 2], 4), "process_p50": round(totals[runs // 2], 4)}
+    print(f"✅ 冷启动（{runs}次中位数）：模块导入 {stats['import_p50']}s，进程总耗时 {stats['process_p50']}s")
+    return stats
 
-# ===================== 10. Web界面（v1.4增强版：新增直接回答功能） =====================
-with gr.Blocks(
-    title=f"{PLATFORM_NAME_CN} {PLATFORM_NAME_EN} - 多模型研精验证平台（v1.4）",
-    theme=gr.themes.Soft(),
-    css="""
+# ===================== 14. Web界面（v1.4增强版：新增直接回答功能） =====================
+UI_CSS = """
     /* 基础样式 */
     #platform-title { margin-bottom: 10px; text-align: center; }
     #logo-area { text-align: center; margin-bottom: 10px; }
@@ -615,183 +2931,812 @@ with gr.Blocks(
     #left-panel .gr-textbox { margin-bottom: 8px; padding: 6px 10px; }
     #left-panel .gr-button { margin-bottom: 8px; padding: 6px; }
     #left-panel .gr-markdown { font-size: 13px; margin-bottom: 8px; }
-    """
-) as demo:
-    # 状态变量
-    user_state = gr.State({"is_login": False, "username": "", "is_guest": False})
-    guest_id_state = gr.State("")
-    
-    # 顶部Logo+标题
-    gr.HTML("""
-    <div id="logo-area">
-        <div id="logo">🫘</div>
-    </div>
-    """)
-    gr.Markdown(f"""# {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN}""", elem_id="platform-title")
-    
-    # 研精豆技术特点描述
-    gr.HTML("""
-    <div id="tech-features">
-        <strong>🔧 技术特点</strong><br>
-        针对单模型易出现的计算偏差、知识点疏漏、逻辑自洽性不足等问题，研精豆独创<strong>多模型分布式研精引擎</strong>，通过端到端的智能研判算法与中立裁判交叉验证机制，实现对答题结果的多层级精准校验；依托动态共识融合技术，突破单模型"单一判断"的局限性，从根源上提升答案的可信度与准确性，为用户提供远超单模型的智能分析体验。
-    </div>
-    """)
-    
-    # 主布局Row：左（注册/打赏）+ 右（输入+结果上下布局）
-    with gr.Row(elem_id="main-row"):
-        # 左侧：注册/登录/打赏面板（保留原功能）
-        with gr.Column(elem_id="left-panel"):
-            gr.Markdown("#### 🔐 账号管理")
+"""
+
+# 结果区组件样式：状态行、终审结论卡片、作答/裁判面板（原先内联在每次结果的HTML中）
+RESULT_CSS = f"""
+    #result-status {{ font-size: 14px; line-height: 1.8; }}
+    .guest-tip {{ color: #ff6600; font-size: 12px; margin: 10px 0; }}
+    
+    /* 终审结论卡片 */
+    .conclusion-card {{
+        background-color: {CONCLUSION_BG_COLOR};
+        padding: 20px;
+        border-radius: 8px;
+        margin: 10px 0;
+        border: 1px solid #d0e8ff;
+        color: #333;
+        white-space: normal;
+        word-wrap: break-word;
+        word-break: break-all;
+    }}
+    .conclusion-title {{
+        margin: 0 0 15px 0;
+        color: #0056b3;
+        font-weight: 600;
+        font-size: 16px;
+        display: flex;
+        justify-content: space-between;
+        align-items: center;
+        flex-wrap: wrap;
+        gap: 8px;
+    }}
+    .conclusion-note {{ font-size: 12px; color: #666; font-weight: normal; }}
+    .conclusion-credibility {{ font-family: 'SimHei', '黑体', sans-serif; font-weight: bold; color: #d9534f; font-size: 15px; }}
+    .conclusion-answer {{ margin: 0 0 15px 0; padding: 15px; background-color: #ffffff; border-radius: 6px; border: 1px solid #e8f4f8; }}
+    .conclusion-answer h4 {{ margin: 0 0 8px 0; color: #007bff; font-size: 14px; }}
+    .conclusion-answer p {{ margin: 0; line-height: 1.8; font-size: 14px; color: #222; font-weight: 500; }}
+    .conclusion-analysis {{ margin: 0; line-height: 1.8; font-size: 14px; color: #333; }}
+    
+    /* 原始作答与裁判详情面板 */
+    .answer-group {{ border-top: 1px solid #eee; padding-top: 8px; gap: 4px !important; }}
+    .answer-panel, .verdict-panel {{ font-size: 12px; color: #444; line-height: 1.6; }}
+    .verdict-panel {{ border-left: 3px solid #d0e8ff; padding-left: 10px; }}
+"""
+
+def build_demo():
+    """构建Web界面（仅在启动Web服务时调用，批量任务/API/测试无需导入gradio与构建界面）"""
+    with gr.Blocks(
+        title=f"{PLATFORM_NAME_CN} {PLATFORM_NAME_EN} - 多模型研精验证平台（v1.4）",
+        theme=gr.themes.Soft(),
+        css=UI_CSS + RESULT_CSS
+    ) as demo:
+        # 状态变量
+        user_state = gr.State({"is_login": False, "username": "", "is_guest": False})
+        guest_id_state = gr.State("")
+    
+        # 顶部Logo+标题
+        gr.HTML("""
+        <div id="logo-area">
+            <div id="logo">🫘</div>
+        </div>
+        """)
+        gr.Markdown(f"""# {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN}""", elem_id="platform-title")
+    
+        # 研精豆技术特点描述
+        gr.HTML("""
+        <div id="tech-features">
+            <strong>🔧 技术特点</strong><br>
+            针对单模型易出现的计算偏差、知识点疏漏、逻辑自洽性不足等问题，研精豆独创<strong>多模型分布式研精引擎</strong>，通过端到端的智能研判算法与中立裁判交叉验证机制，实现对答题结果的多层级精准校验；依托动态共识融合技术，突破单模型"单一判断"的局限性，从根源上提升答案的可信度与准确性，为用户提供远超单模型的智能分析体验。
+        </div>
+        """)
+    
+        # 主布局Row：左（注册/打赏）+ 右（输入+结果上下布局）
+        with gr.Row(elem_id="main-row"):
+            # 左侧：注册/登录/打赏面板（保留原功能）
+            with gr.Column(elem_id="left-panel"):
+                gr.Markdown("#### 🔐 账号管理")
             
-            # 登录/注册区域
-            with gr.Column(elem_id="auth-area"):
-                auth_tabs = gr.Tabs()
+                # 登录/注册区域
+                with gr.Column(elem_id="auth-area"):
+                    auth_tabs = gr.Tabs()
                 
-                with auth_tabs:
-                    with gr.TabItem("登录", elem_classes="auth-tab"):
-                        login_msg = gr.Markdown("登录后无次数限制")
-                        login_username = gr.Textbox(label="用户名", placeholder="请输入用户名")
-                        login_password = gr.Textbox(label="密码", type="password", placeholder="请输入密码")
-                        login_btn = gr.Button("登录", variant="primary")
-                        guest_btn = gr.Button("游客模式（3次）", variant="secondary")
+                    with auth_tabs:
+                        with gr.TabItem("登录", elem_classes="auth-tab"):
+                            login_msg = gr.Markdown("登录后无次数限制")
+                            login_username = gr.Textbox(label="用户名", placeholder="请输入用户名")
+                            login_password = gr.Textbox(label="密码", type="password", placeholder="请输入密码")
+                            login_btn = gr.Button("登录", variant="primary")
+                            guest_btn = gr.Button("游客模式（3次）", variant="secondary")
                     
-                    with gr.TabItem("注册", elem_classes="auth-tab"):
-                        reg_msg = gr.Markdown("注册新账号")
-                        reg_username = gr.Textbox(label="用户名", placeholder="设置用户名")
-                        reg_password = gr.Textbox(label="密码", type="password", placeholder="≥6位")
-                        reg_confirm_pwd = gr.Textbox(label="确认密码", type="password", placeholder="再次输入")
-                        reg_btn = gr.Button("注册", variant="primary")
+                        with gr.TabItem("注册", elem_classes="auth-tab"):
+                            reg_msg = gr.Markdown("注册新账号")
+                            reg_username = gr.Textbox(label="用户名", placeholder="设置用户名")
+                            reg_password = gr.Textbox(label="密码", type="password", placeholder="≥6位")
+                            reg_confirm_pwd = gr.Textbox(label="确认密码", type="password", placeholder="再次输入")
+                            reg_btn = gr.Button("注册", variant="primary")
                 
-                # 登录状态显示
-                login_status = gr.Markdown("🔒 未登录")
-                logout_btn = gr.Button("退出登录", variant="stop", visible=False)
+                    # 登录状态显示
+                    login_status = gr.Markdown("🔒 未登录")
+                    logout_btn = gr.Button("退出登录", variant="stop", visible=False)
             
-            # 打赏二维码区域（强制显示）
-            with gr.Column(elem_id="reward-area"):
-                gr.Markdown("#### 🎁 请作者喝杯咖啡")
-                gr.HTML("""
-                <img id="reward-qrcode" 
-                     src="https://drive-h.quark.cn/1/clouddrive/file/thumbnail?fid=55f7300b727d49399662fbd89fa4443a&pr=ucpro&fr=pc" />
-                """)
-                gr.Markdown("""
-                <div id="reward-text">
-                token太贵，觉得好用请自由打赏～<br>
-                你的支持是持续更新的动力 💪
-                </div>
-                """)
+                # 打赏二维码区域（强制显示）
+                with gr.Column(elem_id="reward-area"):
+                    gr.Markdown("#### 🎁 请作者喝杯咖啡")
+                    gr.HTML("""
+                    <img id="reward-qrcode" 
+                         src="https://drive-h.quark.cn/1/clouddrive/file/thumbnail?fid=55f7300b727d49399662fbd89fa4443a&pr=ucpro&fr=pc" />
+                    """)
+                    gr.Markdown("""
+                    <div id="reward-text">
+                    token太贵，觉得好用请自由打赏～<br>
+                    你的支持是持续更新的动力 💪
+                    </div>
+                    """)
         
-        # 右侧：主功能区（上下布局：输入框 + 结果区）
-        with gr.Column(elem_id="right-main"):
-            # 输入区域（顶部）
-            with gr.Column(elem_id="input-area"):
-                question = gr.Textbox(
-                    label="请输入需要研精验证的问题",
-                    lines=4,
-                    placeholder="示例1：某电商商品原价3200元，8.5折后减300，再缴3%增值税，最终支付多少？\n示例2：请辨析不当得利和无因管理的核心区别（符合《民法典》）\n示例3：甲/乙/丙仓库对应A/B/C货物，推理各仓库存放类型（甲≠A，乙≠B，丙≠C）",
-                    elem_classes=["custom-textbox"]
-                )
-                submit_btn = gr.Button("提交研精验证", variant="primary", size="lg", interactive=False)
+            # 右侧：主功能区（上下布局：输入框 + 结果区）
+            with gr.Column(elem_id="right-main"):
+                # 输入区域（顶部）
+                with gr.Column(elem_id="input-area"):
+                    question = gr.Textbox(
+                        label="请输入需要研精验证的问题",
+                        lines=4,
+                        placeholder="\n".join(f"示例{i}：{q}" for i, q in enumerate(QUESTION_EXAMPLES, 1)),
+                        elem_classes=["custom-textbox"]
+                    )
+                    submit_btn = gr.Button("提交研精验证", variant="primary", size="lg", interactive=False)
             
-            # 结果区域（输入框正下方，滑动显示）
-            with gr.Column(elem_id="result-area"):
-                result = gr.Markdown(
-                    label=f"{PLATFORM_NAME_CN} 验证结果", 
-                    value=f"等待登录后提交问题，{PLATFORM_NAME_CN}为你提供双模型深度研精验证+直接答案回应！",
-                    elem_classes=["custom-result"]
-                )
+                # 结果区域（输入框正下方，滑动显示）
+                # 状态行 + 终审结论卡片 + 每份作答及其裁判结论各一个面板，按需单独刷新
+                with gr.Column(elem_id="result-area"):
+                    result_status_md = gr.Markdown(
+                        label=f"{PLATFORM_NAME_CN} 验证结果", 
+                        value=RESULT_IDLE_TEXT,
+                        elem_id="result-status",
+                        elem_classes=["custom-result"]
+                    )
+                    conclusion_card = gr.HTML(visible=False)
+                    result_panels = {}
+                    for ans_key, keys in ANSWER_VERDICT_KEYS.items():
+                        with gr.Column(elem_classes=["answer-group"]):
+                            result_panels[ans_key] = gr.Markdown(visible=False, elem_classes=["answer-panel"])
+                            for k in keys:
+                                result_panels[k] = gr.Markdown(visible=False, elem_classes=["verdict-panel"])
+                    result_outputs = [result_status_md, conclusion_card, *(result_panels[k] for k in RESULT_PANELS)]
     
-    # 免责声明
-    gr.HTML("""
-    <div id="disclaimer">
-        <strong>📢 免责声明</strong><br>
-        1. 本工具为AI辅助研精验证工具，所有结果仅供学习研究参考，不构成任何决策依据；<br>
-        2. 请遵守相关法律法规，严禁用于违法违规、商业牟利等非授权场景；<br>
-        3. 游客模式提供3次免费使用机会，注册账号后无次数限制；<br>
-        4. 平台仅提供技术服务，API调用费用由用户自行承担。
-    </div>
-    """)
-    
-    # 底部合并信息
-    gr.HTML(f"""
-    <div id="footer-info">
-        📞 联系方式：13916379825@139.com | 研精豆多模型研精验证平台 v{CURRENT_VERSION} | 通过 API 使用 | 使用 Gradio 构建 | 设置
-    </div>
-    """)
-    
-    # ===================== 交互逻辑 =====================
-    # 注册按钮逻辑
-    reg_btn.click(
-        fn=user_register,
-        inputs=[reg_username, reg_password, reg_confirm_pwd],
-        outputs=[reg_msg, reg_password, reg_confirm_pwd]
-    )
+        # 免责声明
+        gr.HTML("""
+        <div id="disclaimer">
+            <strong>📢 免责声明</strong><br>
+            1. 本工具为AI辅助研精验证工具，所有结果仅供学习研究参考，不构成任何决策依据；<br>
+            2. 请遵守相关法律法规，严禁用于违法违规、商业牟利等非授权场景；<br>
+            3. 游客模式提供3次免费使用机会，注册账号后无次数限制；<br>
+            4. 平台仅提供技术服务，API调用费用由用户自行承担。
+        </div>
+        """)
     
-    # 登录按钮逻辑
-    login_btn.click(
-        fn=user_login,
-        inputs=[login_username, login_password, user_state, guest_id_state],
-        outputs=[login_msg, user_state, guest_id_state]
-    ).then(
-        fn=lambda us: (
-            gr.update(interactive=True),
-            gr.update(value=f"✅ 已登录：{us['username']}"),
-            gr.update(visible=True)
-        ),
-        inputs=[user_state],
-        outputs=[submit_btn, login_status, logout_btn]
-    )
+        # 底部合并信息
+        gr.HTML(f"""
+        <div id="footer-info">
+            📞 联系方式：13916379825@139.com | 研精豆多模型研精验证平台 v{CURRENT_VERSION} | 通过 API 使用 | 使用 Gradio 构建 | 设置
+        </div>
+        """)
     
-    # 游客模式逻辑
-    guest_btn.click(
-        fn=guest_mode,
-        inputs=[user_state, guest_id_state],
-        outputs=[login_msg, user_state, guest_id_state]
-    ).then(
-        fn=lambda us: (
-            gr.update(interactive=True),
-            gr.update(value=f"✅ {us['username']} | 剩余{FREE_USE_LIMIT - load_user_data()['guest_usage'][us['username'].replace('游客','')]['usage_count']}次"),
-            gr.update(visible=True)
-        ),
-        inputs=[user_state],
-        outputs=[submit_btn, login_status, logout_btn]
-    )
+        # ===================== 交互逻辑 =====================
+        # 注册按钮逻辑
+        reg_btn.click(
+            fn=user_register,
+            inputs=[reg_username, reg_password, reg_confirm_pwd],
+            outputs=[reg_msg, reg_password, reg_confirm_pwd]
+        )
     
-    # 退出登录逻辑
-    logout_btn.click(
-        fn=logout,
-        inputs=[user_state, guest_id_state],
-        outputs=[login_status, user_state, guest_id_state]
-    ).then(
-        fn=lambda: (
-            gr.update(interactive=False),
-            gr.update(visible=False),
-            gr.update(value="🔒 未登录"),
-            gr.update(value="等待登录后提交问题，研精豆为你提供双模型深度研精验证+直接答案回应！")
-        ),
-        outputs=[submit_btn, logout_btn, login_msg, result]
+        # 登录按钮逻辑
+        login_btn.click(
+            fn=user_login,
+            inputs=[login_username, login_password, user_state, guest_id_state],
+            outputs=[login_msg, user_state, guest_id_state]
+        ).then(
+            fn=lambda us: (
+                gr.update(interactive=True),
+                gr.update(value=f"✅ 已登录：{us['username']}"),
+                gr.update(visible=True)
+            ),
+            inputs=[user_state],
+            outputs=[submit_btn, login_status, logout_btn]
+        )
+    
+        # 游客模式逻辑
+        guest_btn.click(
+            fn=guest_mode,
+            inputs=[user_state, guest_id_state],
+            outputs=[login_msg, user_state, guest_id_state]
+        ).then(
+            fn=lambda us: (
+                gr.update(interactive=True),
+                gr.update(value=f"✅ {us['username']} | 剩余{FREE_USE_LIMIT - USER_STORE.guest_used(us['username'].replace('游客',''))}次"),
+                gr.update(visible=True)
+            ),
+            inputs=[user_state],
+            outputs=[submit_btn, login_status, logout_btn]
+        )
+    
+        # 退出登录逻辑
+        logout_btn.click(
+            fn=logout,
+            inputs=[user_state, guest_id_state],
+            outputs=[login_status, user_state, guest_id_state]
+        ).then(
+            fn=lambda: (
+                gr.update(interactive=False),
+                gr.update(visible=False),
+                gr.update(value="🔒 未登录"),
+                *result_view(status=RESULT_IDLE_TEXT, clear=True)
+            ),
+            outputs=[submit_btn, logout_btn, login_msg, *result_outputs]
+        )
+    
+        # 提交验证逻辑
+        submit_btn.click(
+            fn=core_verify_logic,
+            inputs=[question, user_state, guest_id_state],
+            outputs=[*result_outputs, submit_btn, user_state, guest_id_state],
+            show_progress=False,
+            # 提交直接交给准入调度排队（区分注册用户/游客优先级），不在Gradio的先到先服务队列中等待
+            concurrency_limit=ADMISSION_MAX_RUNNING + ADMISSION_MAX_QUEUE
+        )
+    return demo
+
+# ===================== 15. 多进程部署（粘性前端 + 工作进程） =====================
+# Gradio事件队列：默认每个事件仅1个并发，放开到 UI_CONCURRENCY；排队超过 UI_QUEUE_SIZE 直接拒绝
+UI_CONCURRENCY = int(config.get("UI_CONCURRENCY", 32))
+UI_QUEUE_SIZE = int(config.get("UI_QUEUE_SIZE", 256))
+WORKERS = int(config.get("WORKERS", 1))
+WORKER_BASE_PORT = int(config.get("WORKER_BASE_PORT", 7870))  # 工作进程监听 127.0.0.1:WORKER_BASE_PORT+序号
+
+def launch_ui(port, host="0.0.0.0"):
+    build_demo().queue(default_concurrency_limit=UI_CONCURRENCY, max_size=UI_QUEUE_SIZE).launch(
+        server_port=port,
+        server_name=host,
+        show_error=True,
+        debug=False,
+        share=False,
+        auth=None,
+        # 同步生成器占用工作线程，线程数需覆盖准入调度的运行+排队请求
+        max_threads=max(40, UI_CONCURRENCY, ADMISSION_MAX_RUNNING + ADMISSION_MAX_QUEUE + 8)
     )
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+class StickyFrontend:
+    """TCP前端：按客户端IP固定转发到同一工作进程（Gradio会话状态保存在进程内），HTTP/SSE/WebSocket原样透传"""
+    def __init__(self, ports, host="127.0.0.1"):
+        self.ports = list(ports)
+        self.host = host
+    
+    def pick(self, client_ip):
+        return self.ports[zlib.crc32(client_ip.encode("utf-8")) % len(self.ports)]
     
-    # 提交验证逻辑
-    submit_btn.click(
-        fn=core_verify_logic,
-        inputs=[question, user_state, guest_id_state],
-        outputs=[result, submit_btn, user_state, guest_id_state],
-        show_progress=False
+    async def handle(self, reader, writer):
+        peer = writer.get_extra_info("peername") or ("",)
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection(self.host, self.pick(peer[0]))
+        except OSError as e:
+            print(f"❌ {PLATFORM_NAME_CN} 工作进程不可用：{e}")
+            writer.close()
+            return
+        await asyncio.gather(_pipe(reader, upstream_writer), _pipe(upstream_reader, writer))
+    
+    async def serve(self, port):
+        server = await asyncio.start_server(self.handle, "0.0.0.0", port)
+        async with server:
+            await server.serve_forever()
+
+def serve_workers(workers, port):
+    """多进程部署：启动 workers 个独立解释器的工作进程，前端按客户端粘性转发；工作进程异常退出时自动拉起。
+    用户、游客次数与缓存经状态后端（SQLite文件或Redis）在进程间共享"""
+    ports = [WORKER_BASE_PORT + i for i in range(workers)]
+    # 工作进程沿用主进程的 --config / --set（环境变量随子进程继承）
+    config_path, overrides = config_sources(sys.argv[1:])
+    config_args = (["--config", config_path] if config_path else []) + [arg for item in overrides for arg in ("--set", item)]
+    
+    def spawn(index):
+        cmd = [sys.executable, os.path.abspath(__file__), "serve", "--port", str(ports[index]), "--worker-index", str(index)]
+        return subprocess.Popen(cmd + config_args)
+    
+    procs = [spawn(i) for i in range(workers)]
+    
+    def supervise():
+        while True:
+            time.sleep(1)
+            for i, proc in enumerate(procs):
+                if proc.poll() is not None:
+                    print(f"❌ {PLATFORM_NAME_CN} 工作进程{i}已退出（code={proc.returncode}），正在重启")
+                    procs[i] = spawn(i)
+    
+    threading.Thread(target=supervise, daemon=True, name="yjd-supervisor").start()
+    print(f"🧩 {PLATFORM_NAME_CN} 多进程模式：{workers} 个工作进程（端口 {ports[0]}-{ports[-1]}），状态后端：{STATE_BACKEND}")
+    print(f"🌐 访问地址：http://localhost:{port}")
+    try:
+        asyncio.run(StickyFrontend(ports).serve(port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc in procs:
+            proc.terminate()
+
+# ===================== 16. 审计日志（后台写入的压缩JSONL分段 + 偏移索引） =====================
+AUDIT_LOG_ENABLED = config.get("AUDIT_LOG_ENABLED", "1") == "1"
+AUDIT_LOG_DIR = config.get("AUDIT_LOG_DIR", os.path.join(os.path.dirname(USER_DATA_PATH), "audit_log"))
+AUDIT_QUEUE_SIZE = int(config.get("AUDIT_QUEUE_SIZE", 1024))  # 内存队列上限，写满后丢弃新记录，不阻塞请求
+AUDIT_SEGMENT_MAX_BYTES = int(config.get("AUDIT_SEGMENT_MAX_BYTES", 32 * 1024 * 1024))  # 单个分段压缩后大小上限
+AUDIT_SEGMENT_MAX_SECONDS = int(config.get("AUDIT_SEGMENT_MAX_SECONDS", 3600))  # 单个分段最长写入时间
+AUDIT_BATCH_SIZE = 64  # 每个gzip成员最多容纳的记录数
+
+class AuditLog:
+    """只追加的审计日志：请求线程只把记录放入有界队列，后台线程批量写入 gzip 分段文件。
+    每批记录是一个独立的 gzip 成员，SQLite 索引登记每条记录所在的分段与成员偏移，按用户/时间读取时只解压命中的成员"""
+    def __init__(self, directory, queue_size, max_bytes, max_seconds):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._segment = None  # (文件名, 文件对象, 创建时间)
+        self._segment_seq = 0
+        self._index = None
+    
+    def submit(self, entry):
+        """非阻塞提交一条记录；队列已满时丢弃并计数，返回是否入队"""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+    
+    def pending(self):
+        return self._queue.qsize()
+    
+    def _ensure_writer(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="yjd-audit")
+                self._thread.start()
+                atexit.register(self.close)
+    
+    def close(self, timeout=5):
+        """写完队列中剩余记录后关闭当前分段（进程退出时自动调用）"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+    
+    def _run(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._index = sqlite3.connect(os.path.join(self.directory, "index.db"))
+        self._index.execute("PRAGMA journal_mode=WAL")
+        self._index.execute("PRAGMA busy_timeout=5000")
+        self._index.execute(
+            """CREATE TABLE IF NOT EXISTS audit_index (
+                ts REAL NOT NULL,
+                username TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL
+            )"""
+        )
+        self._index.execute("CREATE INDEX IF NOT EXISTS idx_audit_user_ts ON audit_index(username, ts)")
+        self._index.execute("CREATE INDEX IF NOT EXISTS idx_audit_ts ON audit_index(ts)")
+        self._index.commit()
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=1)]
+            except queue.Empty:
+                self._rotate_if_needed()
+                continue
+            while len(batch) < AUDIT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [entry for entry in batch if entry is not None]
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    self.dropped += len(batch)
+                    print(f"❌ {PLATFORM_NAME_CN} 审计日志写入失败：{str(e)}")
+        if self._segment:
+            self._segment[1].close()
+            self._segment = None
+        self._index.close()
+    
+    def _rotate_if_needed(self):
+        if self._segment is None:
+            return
+        name, f, created = self._segment
+        if f.tell() >= self.max_bytes or time.time() - created >= self.max_seconds:
+            f.close()
+            self._segment = None
+    
+    def _write(self, batch):
+        self._rotate_if_needed()
+        if self._segment is None:
+            # 文件名带进程号，多工作进程共用同一目录时互不干扰
+            self._segment_seq += 1
+            name = f"audit-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._segment_seq}.jsonl.gz"
+            self._segment = (name, open(os.path.join(self.directory, name), "ab"), time.time())
+        name, f, _ = self._segment
+        offset = f.tell()
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch).encode("utf-8")
+        f.write(gzip.compress(data))
+        f.flush()
+        self._index.executemany(
+            "INSERT INTO audit_index VALUES (?, ?, ?, ?)",
+            [(entry["ts"], entry["user"], name, offset) for entry in batch]
+        )
+        self._index.commit()
+        self.written += len(batch)
+    
+    def query(self, username=None, since=None, until=None, limit=100):
+        """按用户/时间范围读取审计记录（按时间先后），只解压索引命中的 gzip 成员"""
+        path = os.path.join(self.directory, "index.db")
+        if not os.path.exists(path):
+            return []
+        clauses, params = [], []
+        for clause, value in (("username = ?", username), ("ts >= ?", since), ("ts < ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn = sqlite3.connect(path)
+        try:
+            members = conn.execute(
+                f"SELECT segment, offset, MIN(ts) FROM audit_index {where} GROUP BY segment, offset ORDER BY MIN(ts)",
+                params
+            ).fetchall()
+        finally:
+            conn.close()
+        entries = []
+        for segment, offset, _ in members:
+            for entry in read_audit_member(os.path.join(self.directory, segment), offset):
+                if username is not None and entry["user"] != username:
+                    continue
+                if (since is not None and entry["ts"] < since) or (until is not None and entry["ts"] >= until):
+                    continue
+                entries.append(entry)
+                if len(entries) >= limit:
+                    return entries
+        return entries
+
+def read_audit_member(path, offset):
+    """从分段文件的 offset 处解压单个 gzip 成员，返回其中的全部记录"""
+    decompressor = zlib.decompressobj(wbits=31)
+    data = b""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while not decompressor.eof:
+            chunk = f.read(65536)
+            if not chunk:
+                break
+            data += decompressor.decompress(chunk)
+    return [json.loads(line) for line in data.decode("utf-8").splitlines() if line]
+
+AUDIT_LOG = AuditLog(AUDIT_LOG_DIR, AUDIT_QUEUE_SIZE, AUDIT_SEGMENT_MAX_BYTES, AUDIT_SEGMENT_MAX_SECONDS)
+
+def audit_entry(username, question, record, from_cache=False, status="ok"):
+    """审计记录：问题、原始作答、各路裁判结论、可信度与各阶段耗时"""
+    return {
+        "ts": round(time.time(), 3),
+        "user": username,
+        "status": status,
+        "from_cache": from_cache,
+        "question": question,
+        "answers": {k: record.get(k) for k in ANSWERERS},
+        "verdicts": {k: record.get(k) for k in JUDGE_LABELS},
+        "credibility": record.get("credibility"),
+        "route": record.get("route", "full"),
+        "degraded": record.get("degraded", []),
+        "skipped": record.get("skipped", []),
+        "unavailable": record.get("unavailable", []),
+        "timings": record.get("timings", {}),
+    }
+
+def audit_request(username, question, record, from_cache=False, status="ok"):
+    """记录一次研精请求（不阻塞，队列满时丢弃）"""
+    if AUDIT_LOG_ENABLED:
+        AUDIT_LOG.submit(audit_entry(username, question, record, from_cache, status))
+
+def parse_audit_time(value):
+    """审计查询时间参数：YYYY-MM-DD[ HH:MM[:SS]] 或 Unix 时间戳"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    raise SystemExit(f"❌ 无法识别的时间：{value}")
+
+# ===================== 17. 服务商录制/回放（磁带文件） =====================
+# live：直连服务商；record：直连并把每次调用的请求、响应与耗时追加到磁带；replay：只从磁带回放，不需要API Key与SDK
+PROVIDER_MODE = config.get("PROVIDER_MODE", "live")
+CASSETTE_PATH = config.get("CASSETTE_PATH", os.path.join(DATA_DIR, "cassettes", "providers.jsonl"))
+REPLAY_SPEED = float(config.get("REPLAY_SPEED", 0))  # 回放时按录制耗时等待：0=不等待，1=原速，N=加速N倍
+
+class CassetteMissError(LookupError):
+    """回放时磁带中没有与请求匹配的录制"""
+
+def cassette_key(provider, kwargs):
+    """请求指纹：服务商、模型、消息与影响输出的参数；回放按指纹匹配录制"""
+    request = {k: kwargs.get(k) for k in ("model", "messages", "prompt", "temperature", "stream", "incremental_output")}
+    payload = json.dumps([provider, request], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+class Cassette:
+    """JSONL磁带：call 行记录一次服务商调用（请求、文本或流式片段及各片段时间偏移、用量、错误、耗时），
+    result 行记录一次研精的融合结论，供回放后比对。录制只追加；回放时同一指纹的多次录制按顺序轮流返回"""
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0  # 已回放的调用数
+        self.misses = 0
+        self._calls = None  # 指纹 -> 录制列表（首次回放时加载）
+        self._cursor = {}
+        self._results = []
+        self._lock = threading.Lock()
+    
+    def append(self, entry):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+    
+    def _load(self):
+        # 调用方持有 self._lock
+        if self._calls is not None:
+            return
+        self._calls = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            print(f"❌ {PLATFORM_NAME_CN} 磁带文件不存在：{self.path}")
+            entries = []
+        for entry in entries:
+            if entry.get("type") == "result":
+                self._results.append(entry)
+            else:
+                self._calls.setdefault(entry["key"], []).append(entry)
+        print(f"✅ {PLATFORM_NAME_CN} 磁带加载成功：{self.path}（{len(entries)}条）")
+    
+    def next_call(self, key):
+        """取与指纹匹配的下一条录制"""
+        with self._lock:
+            self._load()
+            recorded = self._calls.get(key)
+            if not recorded:
+                self.misses += 1
+                raise CassetteMissError(f"磁带中没有匹配的录制（{key}）")
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            self.calls += 1
+            return recorded[index % len(recorded)]
+    
+    def results(self):
+        """录制时的融合结论（按录制顺序）"""
+        with self._lock:
+            self._load()
+            return list(self._results)
+
+PROVIDER_CASSETTE = Cassette(CASSETTE_PATH)
+
+def _response_text(provider, response, stream):
+    """从SDK响应/流式片段中取文本（DashScope 出错时 output 为空）"""
+    if provider == "dashscope":
+        return getattr(getattr(response, "output", None), "text", None)
+    choice = response.choices[0]
+    return choice.delta.content if stream else choice.message.content
+
+def _record_call(provider, kwargs, call):
+    """直连调用并录制；流式响应读完时写入，各片段附带相对调用开始的时间偏移"""
+    stream = kwargs.get("stream", False)
+    entry = {"type": "call", "provider": provider, "key": cassette_key(provider, kwargs), "model": kwargs.get("model"),
+             "question": getattr(current_trace(), "question", None)}
+    start = time.monotonic()
+    try:
+        response = call()
+    except Exception as e:
+        entry.update(latency=round(time.monotonic() - start, 4), error={
+            "type": type(e).__name__, "message": str(e), "status_code": getattr(e, "status_code", None)
+        })
+        PROVIDER_CASSETTE.append(entry)
+        raise
+    if not stream:
+        entry.update(
+            latency=round(time.monotonic() - start, 4), text=_response_text(provider, response, False),
+            usage=_usage_tokens(provider, response), status_code=getattr(response, "status_code", None),
+            code=getattr(response, "code", None), message=getattr(response, "message", None),
+        )
+        PROVIDER_CASSETTE.append(entry)
+        return response
+    
+    def chunks():
+        pieces = []
+        usage = None
+        complete = False
+        try:
+            for chunk in response:
+                status = getattr(chunk, "status_code", 200)
+                if status != 200:
+                    entry.update(status_code=status, code=getattr(chunk, "code", None), message=getattr(chunk, "message", None))
+                pieces.append([round(time.monotonic() - start, 4), _response_text(provider, chunk, True) or ""])
+                usage = _usage_tokens(provider, chunk) or usage
+                yield chunk
+            complete = True
+        except Exception as e:
+            entry["error"] = {"type": type(e).__name__, "message": str(e), "status_code": getattr(e, "status_code", None)}
+            raise
+        finally:
+            # 请求被放弃、未读完的响应不录制，以免回放时得到截断的文本；服务商返回的错误照常录制
+            if complete or "error" in entry or entry.get("status_code") is not None:
+                entry.update(latency=round(time.monotonic() - start, 4), chunks=pieces, usage=usage)
+                PROVIDER_CASSETTE.append(entry)
+    return chunks()
+
+class ReplayedProviderError(RuntimeError):
+    """回放录制到的服务商异常（保留原状态码，以便容错层按相同类别处理）"""
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+def _replay_wait(seconds):
+    if REPLAY_SPEED > 0 and seconds > 0:
+        time.sleep(seconds / REPLAY_SPEED)
+
+def _replay_response(provider, text, usage, status_code=200, code=None, message=None):
+    """按SDK响应的属性结构还原（只包含流水线读取的字段）"""
+    usage = usage or (None, None)
+    if provider == "dashscope":
+        return types.SimpleNamespace(
+            status_code=status_code or 200, code=code, message=message,
+            output=None if text is None else types.SimpleNamespace(text=text),
+            usage=types.SimpleNamespace(input_tokens=usage[0], output_tokens=usage[1]),
+        )
+    return types.SimpleNamespace(
+        choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=text), delta=types.SimpleNamespace(content=text))],
+        usage=types.SimpleNamespace(prompt_tokens=usage[0], completion_tokens=usage[1]),
     )
 
+def _replay_call(provider, kwargs):
+    """按指纹回放一次录制；REPLAY_SPEED>0 时按录制耗时（流式为各片段时间偏移）等待"""
+    entry = PROVIDER_CASSETTE.next_call(cassette_key(provider, kwargs))
+    if "error" in entry:
+        _replay_wait(entry["latency"])
+        raise ReplayedProviderError(entry["error"]["message"], entry["error"].get("status_code"))
+    if "chunks" not in entry:
+        _replay_wait(entry["latency"])
+        return _replay_response(provider, entry["text"], entry.get("usage"), entry.get("status_code"),
+                                entry.get("code"), entry.get("message"))
+    
+    def chunks():
+        elapsed = 0.0
+        last = len(entry["chunks"]) - 1
+        for i, (offset, text) in enumerate(entry["chunks"]):
+            _replay_wait(offset - elapsed)
+            elapsed = offset
+            # 用量与错误状态只出现在最后一个片段上
+            yield _replay_response(
+                provider, text, entry.get("usage") if i == last else None,
+                entry.get("status_code") if i == last else 200, entry.get("code"), entry.get("message"),
+            )
+    return chunks()
+
+class CassetteGeneration:
+    """替代 dashscope.Generation：record 模式包装真实SDK，replay 模式（real 为 None）只读磁带"""
+    def __init__(self, real=None):
+        self.real = real
+    
+    def call(self, **kwargs):
+        if self.real is None:
+            return _replay_call("dashscope", kwargs)
+        return _record_call("dashscope", kwargs, lambda: self.real.call(**kwargs))
+
+class CassetteZhipuClient:
+    """替代 zhipuai.ZhipuAI 客户端，只提供 chat.completions.create"""
+    def __init__(self, real=None):
+        self.real = real
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+    
+    def _create(self, **kwargs):
+        if self.real is None:
+            return _replay_call("zhipu", kwargs)
+        return _record_call("zhipu", kwargs, lambda: self.real.chat.completions.create(**kwargs))
+
+def record_cassette_result(question, record):
+    """录制模式下把本次研精的融合结论写入磁带，回放后据此比对共识输出"""
+    if PROVIDER_MODE == "record":
+        PROVIDER_CASSETTE.append({
+            "type": "result", "question": question, "route": record.get("route", "full"),
+            "credibility": record.get("credibility"), "direct_answer": record.get("direct_answer"),
+        })
+
 # ===================== 程序启动 =====================
+STARTUP_SECONDS = time.perf_counter() - _MODULE_START
+
+def parse_args(argv=None):
+    # --config / --set 在模块导入时已生效，这里登记以便出现在帮助信息中且任意位置都可书写
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--config", default=argparse.SUPPRESS, help="配置文件路径（也可用环境变量 YJD_CONFIG）")
+    common.add_argument("--set", action="append", default=argparse.SUPPRESS, metavar="KEY=VALUE",
+                        help="覆盖单个配置项，可重复；优先于环境变量 YJD_<KEY> 与配置文件")
+    parser = argparse.ArgumentParser(description=f"{PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} 多模型研精验证平台", parents=[common])
+    sub = parser.add_subparsers(dest="command")
+    parser.set_defaults(port=7860, workers=WORKERS, worker_index=None)
+    serve = sub.add_parser("serve", help="启动Web界面（默认）", parents=[common])
+    serve.add_argument("--port", type=int, default=7860, help="对外服务端口")
+    serve.add_argument("--workers", type=int, default=WORKERS, help="工作进程数，大于1时以多进程模式运行")
+    serve.add_argument("--worker-index", type=int, help=argparse.SUPPRESS)
+    warmup = sub.add_parser("warmup", help="从JSONL问题语料预热研精缓存", parents=[common])
+    warmup.add_argument("corpus", nargs="?", help="JSONL语料路径，每行含 question（或 body/title）字段")
+    warmup.add_argument("--examples", action="store_true", help="同时预热输入框中的示例问题")
+    warmup.add_argument("--concurrency", type=int, default=4, help="同时处理的问题数")
+    warmup.add_argument("--refresh", action="store_true", help="强制重跑已缓存的问题")
+    batch = sub.add_parser("batch", help="无界面批量验证JSONL问题，结果写入JSONL（可断点续跑）", parents=[common])
+    batch.add_argument("input", help="输入JSONL，每行含 question（或 body/title）字段，可带 request_id/id")
+    batch.add_argument("output", help="输出JSONL（同时作为断点文件）")
+    batch.add_argument("--concurrency", type=int, default=4, help="同时处理的问题数")
+    batch.add_argument("--dashscope-concurrency", type=int, help="通义千问最大并发调用数")
+    batch.add_argument("--zhipu-concurrency", type=int, help="智谱清言最大并发调用数")
+    batch.add_argument("--refresh", action="store_true", help="忽略已有缓存，重新验证")
+    audit = sub.add_parser("audit", help="按用户/时间范围读取审计日志，输出JSONL", parents=[common])
+    audit.add_argument("--user", help="用户名（游客为「游客<编号>」）")
+    audit.add_argument("--since", help="起始时间（含），YYYY-MM-DD[ HH:MM[:SS]] 或 Unix 时间戳")
+    audit.add_argument("--until", help="结束时间（不含）")
+    audit.add_argument("--limit", type=int, default=100, help="最多输出的记录数")
+    startup = sub.add_parser("startup", help="测量冷启动耗时（全新进程导入模块）", parents=[common])
+    startup.add_argument("--runs", type=int, default=5, help="测量次数，取中位数")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "audit":
+        # 只输出JSONL，便于管道处理
+        for entry in AUDIT_LOG.query(args.user, parse_audit_time(args.since), parse_audit_time(args.until), args.limit):
+            print(json.dumps(entry, ensure_ascii=False))
+        raise SystemExit(0)
+    print(f"⏱️  {PLATFORM_NAME_CN} 模块导入耗时 {STARTUP_SECONDS:.3f}s")
+    if args.command == "startup":
+        raise SystemExit(0 if measure_startup(args.runs) else 1)
+    if args.command == "warmup":
+        warmup_cache(args.corpus, concurrency=args.concurrency, refresh=args.refresh, include_examples=args.examples)
+        raise SystemExit(0)
+    if args.command == "batch":
+        if args.dashscope_concurrency or args.zhipu_concurrency:
+            ENGINE = ExecutionEngine(
+                {
+                    "dashscope": args.dashscope_concurrency or ENGINE.provider_limits["dashscope"],
+                    "zhipu": args.zhipu_concurrency or ENGINE.provider_limits["zhipu"],
+                },
+                max_in_flight=ENGINE.max_in_flight,
+            )
+        stats = batch_verify(args.input, args.output, concurrency=args.concurrency, refresh=args.refresh)
+        raise SystemExit(1 if stats["failed"] else 0)
+    
+    if args.workers > 1 and args.worker_index is None:
+        init_user_data()
+        serve_workers(args.workers, args.port)
+        raise SystemExit(0)
+    
+    if args.worker_index is not None:
+        # 工作进程：只监听本机，指标端口按序号错开
+        if METRICS_PORT:
+            start_metrics_server(METRICS_PORT + 1 + args.worker_index)
+        print(f"🧩 {PLATFORM_NAME_CN} 工作进程{args.worker_index}（pid {os.getpid()}）监听 127.0.0.1:{args.port}")
+        launch_ui(args.port, host="127.0.0.1")
+        raise SystemExit(0)
+    
     init_user_data()
+    start_metrics_server()
     print(f"\n🚀 {PLATFORM_NAME_CN} | {PLATFORM_NAME_EN} v{CURRENT_VERSION} 启动成功！")
-    print(f"🌐 访问地址：http://localhost:7860 | 外网访问：http://你的服务器IP:7860")
+    print(f"🌐 访问地址：http://localhost:{args.port} | 外网访问：http://你的服务器IP:{args.port}")
     print(f"⚙️  核心能力：多模型深度研精+双裁判中立研判+直接回应问题+用户注册+游客次数限制")
     print(f"📌 版本特性：新增问题直接回答+文案精简+底部信息合并+结论前缀简化+技术特点描述+答案显示在问题下方\n")
     
-    demo.launch(
-        server_port=7860,
-        server_name="0.0.0.0",
-        show_error=True,
-        debug=False,
-        share=False,
-        auth=None
-    )
+    launch_ui(args.port)
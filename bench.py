@@ -0,0 +1,328 @@
+"""研精豆 | Yanjingdou 压测工具：用本地模拟服务商替换 Generation.call 与 zhipu_client.chat.completions.create，
+在不消耗真实 API 额度的前提下，按递增并发驱动完整研精流程，输出延迟分位数、吞吐、线程数与内存占用。
+也可回放 PROVIDER_MODE=record 录制的磁带：按录制耗时加速回放真实流量，并比对共识结论是否与录制时一致。
+
+用法示例：
+    python bench.py --levels 1,4,8 --requests 200 --time-scale 0.05
+    python bench.py --latency qwen-plus=4:0.5 --error-rate 0.02 --agree-rate 0.6 --json bench.json
+    python bench.py --cassette cassettes/providers.jsonl --replay-speed 20 --levels 1,8
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+
+# 各模型默认延迟画像：(中位数秒, 对数正态sigma)
+DEFAULT_LATENCY = {
+    "qwen-turbo": (1.5, 0.4),
+    "glm-4-flash": (2.0, 0.4),
+    "qwen-plus": (3.0, 0.5),
+    "glm-4": (4.0, 0.5),
+}
+
+# ===================== 模拟服务商 =====================
+class SimulatedProvider:
+    """按延迟分布、错误率、回复长度模拟一个服务商；回复内容与真实模型格式一致，可被流水线正常解析"""
+    def __init__(self, latency, time_scale=1.0, error_rate=0.0, response_chars=300, agree_rate=1.0, seed=None):
+        self.latency = latency
+        self.time_scale = time_scale
+        self.error_rate = error_rate
+        self.response_chars = response_chars
+        self.agree_rate = agree_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sample(self, model):
+        with self._lock:
+            self.calls += 1
+            median, sigma = self.latency.get(model, (1.0, 0.3))
+            delay = median * self._rng.lognormvariate(0, sigma) * self.time_scale
+            failed = self._rng.random() < self.error_rate
+            agree = self._rng.random() < self.agree_rate
+        return delay, failed, agree
+
+    def _text(self, model, prompt, agree):
+        filler = "推理过程。" * max(self.response_chars // 5, 1)
+        if "答案A：" in prompt:
+            return (
+                f"【答案A】\n错误标注：无明显错误\n核心结论：{filler}最终结果：42\n"
+                f"【答案B】\n错误标注：无明显错误\n核心结论：{filler}最终结果：42"
+            )
+        if "答案：" in prompt:
+            return f"错误标注：无明显错误\n核心结论：{filler}最终结果：42"
+        result = 42 if agree or model.startswith("qwen") else 41
+        return f"{filler}\n最终结果：{result}"
+
+    def respond(self, model, prompt, stream):
+        delay, failed, agree = self._sample(model)
+        if failed:
+            time.sleep(delay / 2)
+            raise RuntimeError(f"模拟服务商错误（{model}）")
+        text = self._text(model, prompt, agree)
+        if not stream:
+            time.sleep(delay)
+            return text
+
+        def chunks():
+            # 首字延迟约占总延迟的20%，其余均匀分布在各增量片段上
+            pieces = [text[i:i + 20] for i in range(0, len(text), 20)]
+            time.sleep(delay * 0.2)
+            for piece in pieces:
+                time.sleep(delay * 0.8 / len(pieces))
+                yield piece
+        return chunks()
+
+class SimulatedGeneration:
+    """替代 dashscope.Generation"""
+    def __init__(self, provider):
+        self.provider = provider
+
+    def call(self, model, prompt=None, messages=None, stream=False, incremental_output=False, **kwargs):
+        text = prompt if prompt is not None else "\n".join(m["content"] for m in messages)
+        out = self.provider.respond(model, text, stream)
+
+        def wrap(content):
+            message = types.SimpleNamespace(content=content)
+            return types.SimpleNamespace(
+                status_code=200,
+                output=types.SimpleNamespace(text=content, choices=[types.SimpleNamespace(message=message)]),
+                usage=types.SimpleNamespace(input_tokens=len(text), output_tokens=len(content)),
+            )
+        if not stream:
+            return wrap(out)
+
+        def gen():
+            acc = ""
+            for piece in out:
+                acc += piece
+                yield wrap(piece if incremental_output else acc)
+        return gen()
+
+class SimulatedZhipuClient:
+    """替代 zhipuai.ZhipuAI 客户端"""
+    def __init__(self, provider):
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._create))
+        self.provider = provider
+
+    def _create(self, model, messages, stream=False, **kwargs):
+        text = "\n".join(m["content"] for m in messages)
+        out = self.provider.respond(model, text, stream)
+        if not stream:
+            message = types.SimpleNamespace(content=out)
+            return types.SimpleNamespace(
+                choices=[types.SimpleNamespace(message=message)],
+                usage=types.SimpleNamespace(prompt_tokens=len(text), completion_tokens=len(out)),
+            )
+        return (
+            types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=piece))], usage=None)
+            for piece in out
+        )
+
+def install_simulated_providers(provider):
+    """把 app 中的两个服务商入口替换为模拟实现"""
+    app.Generation = SimulatedGeneration(provider)
+    app.zhipu_client = SimulatedZhipuClient(provider)
+    app.TONGYI_INIT_OK = True
+    app.ZHIPU_INIT_OK = True
+
+def install_replay_providers(path, speed):
+    """把 app 中的两个服务商入口替换为磁带回放，返回磁带（其 calls 为已回放调用数）"""
+    app.PROVIDER_CASSETTE = app.Cassette(path)
+    app.REPLAY_SPEED = speed
+    app.Generation = app.CassetteGeneration()
+    app.zhipu_client = app.CassetteZhipuClient()
+    app.TONGYI_INIT_OK = True
+    app.ZHIPU_INIT_OK = True
+    return app.PROVIDER_CASSETTE
+
+def compare_results(recorded, records):
+    """回放结论与录制结论逐题比对（可信度与直接回答），返回不一致的问题列表"""
+    mismatches = []
+    for entry in recorded:
+        record = records.get(entry["question"])
+        replayed = {k: record.get(k) for k in ("credibility", "direct_answer")} if record else None
+        if replayed != {"credibility": entry["credibility"], "direct_answer": entry["direct_answer"]}:
+            mismatches.append({"question": entry["question"], "recorded": entry, "replayed": replayed})
+    return mismatches
+
+# ===================== 资源采样 =====================
+def current_rss_mb():
+    """当前常驻内存（MB）：优先读 /proc，其他平台退回历史峰值"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class ResourceSampler(threading.Thread):
+    """后台定时采样线程数与RSS，记录峰值"""
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss_mb = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.peak_rss_mb = max(self.peak_rss_mb, current_rss_mb())
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+# ===================== 压测驱动 =====================
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(pct / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def make_questions(count, duplicate_rate, rng):
+    """生成压测问题：duplicate_rate 比例的请求复用已出现过的问题（触发缓存/同题合并）"""
+    questions = []
+    for i in range(count):
+        if questions and rng.random() < duplicate_rate:
+            questions.append(rng.choice(questions))
+        else:
+            questions.append(f"压测问题{i}：某商品原价{100 + i}元，打八折后再减10元，最终支付多少？")
+    return questions
+
+def run_level(concurrency, questions, provider, records=None):
+    """以给定并发跑完一组问题，返回该并发档位的统计结果；传入 records 时按问题保存研精记录"""
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+    calls_before = provider.calls
+
+    def one(question):
+        nonlocal failures
+        start = time.monotonic()
+        record, _ = app.run_verification(question)
+        elapsed = time.monotonic() - start
+        with lock:
+            latencies.append(elapsed)
+            if records is not None:
+                records[question] = record
+            if record is None or any(app.is_call_failure(record[k]) for k in app.CACHE_FIELDS):
+                failures += 1
+
+    sampler = ResourceSampler()
+    sampler.start()
+    wall_start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        list(pool.map(one, questions))
+    wall = time.monotonic() - wall_start
+    sampler.stop()
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(questions),
+        "failures": failures,
+        "p50": round(percentile(latencies, 50), 4),
+        "p95": round(percentile(latencies, 95), 4),
+        "p99": round(percentile(latencies, 99), 4),
+        "throughput": round(len(questions) / wall, 2) if wall else 0.0,
+        "provider_calls": provider.calls - calls_before,
+        "peak_threads": sampler.peak_threads,
+        "peak_rss_mb": round(sampler.peak_rss_mb, 1),
+        "engine": app.ENGINE.stats(),
+    }
+
+def parse_latency(items):
+    latency = dict(DEFAULT_LATENCY)
+    for item in items or []:
+        model, _, spec = item.partition("=")
+        median, _, sigma = spec.partition(":")
+        latency[model] = (float(median), float(sigma or 0.3))
+    return latency
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"{app.PLATFORM_NAME_CN} 研精流程压测（模拟服务商，不消耗API额度）")
+    parser.add_argument(
+        "--levels", help="逐级压测的并发数，逗号分隔；默认 1,4 及执行引擎容量（超出容量的档位按容量压测）"
+    )
+    parser.add_argument("--requests", type=int, default=100, help="每个并发档位的请求数")
+    parser.add_argument("--latency", action="append", metavar="MODEL=MEDIAN[:SIGMA]", help="覆盖某模型的延迟画像（秒）")
+    parser.add_argument("--time-scale", type=float, default=0.1, help="延迟整体缩放系数，用于快速试跑")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="每次调用的模拟失败概率")
+    parser.add_argument("--response-chars", type=int, default=300, help="模拟回复的大致字数")
+    parser.add_argument("--agree-rate", type=float, default=1.0, help="双模型最终结果一致的概率（影响快速通道）")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="重复问题占比（影响缓存与同题合并）")
+    parser.add_argument("--with-cache", action="store_true", help="启用研精缓存与裁判记忆（默认关闭，只测流水线本身）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cassette", help="回放录制的磁带（忽略模拟服务商参数，问题取自磁带中的录制结论）")
+    parser.add_argument("--replay-speed", type=float, default=20, help="回放加速倍数，0 表示不等待录制耗时")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    if args.cassette:
+        provider = install_replay_providers(args.cassette, args.replay_speed)
+        recorded = provider.results()
+    else:
+        provider = SimulatedProvider(
+            parse_latency(args.latency), time_scale=args.time_scale, error_rate=args.error_rate,
+            response_chars=args.response_chars, agree_rate=args.agree_rate, seed=args.seed,
+        )
+        install_simulated_providers(provider)
+    if args.with_cache:
+        # 使用临时缓存库，避免污染线上缓存
+        cache_path = os.path.join(tempfile.mkdtemp(prefix="yjd-bench-"), "verify_cache.db")
+        app.VERIFY_CACHE = app.VerifyCache(cache_path, app.VERIFY_CACHE_MAX_ENTRIES, app.VERIFY_CACHE_TTL)
+        app.JUDGE_VERDICT_CACHE = app.VerifyCache(
+            cache_path, app.JUDGE_CACHE_MAX_ENTRIES, app.VERIFY_CACHE_TTL, table="judge_verdicts"
+        )
+    else:
+        app.VERIFY_CACHE_ENABLED = False
+        app.JUDGE_CACHE_ENABLED = False
+
+    rng = random.Random(args.seed)
+    results = []
+    print(f"{'并发':>6} {'请求':>6} {'失败':>6} {'p50(s)':>9} {'p95(s)':>9} {'p99(s)':>9} {'吞吐(req/s)':>12} {'调用数':>8} {'峰值线程':>8} {'峰值RSS(MB)':>12}")
+    levels = [int(x) for x in args.levels.split(",") if x.strip()] if args.levels else [1, 4, app.question_capacity()]
+    # 超出容量的档位只会测到执行引擎拒绝调用，按容量压测并去重
+    levels = list(dict.fromkeys(app.clamp_question_concurrency(level) for level in levels))
+    for level in levels:
+        records = {} if args.cassette else None
+        if args.cassette:
+            questions = [entry["question"] for entry in recorded]
+        else:
+            questions = make_questions(args.requests, args.duplicate_rate, rng)
+        row = run_level(level, questions, provider, records)
+        if args.cassette:
+            mismatches = compare_results(recorded, records)
+            row.update(cassette_misses=provider.misses, mismatches=mismatches)
+        results.append(row)
+        print(
+            f"{row['concurrency']:>6} {row['requests']:>6} {row['failures']:>6} {row['p50']:>9} {row['p95']:>9} "
+            f"{row['p99']:>9} {row['throughput']:>12} {row['provider_calls']:>8} {row['peak_threads']:>8} {row['peak_rss_mb']:>12}"
+        )
+        if args.cassette:
+            if row["mismatches"]:
+                print(f"       ❌ {len(row['mismatches'])}/{len(recorded)} 个问题的共识结论与录制不一致（磁带未命中累计 {provider.misses} 次）")
+            else:
+                print(f"       ✅ {len(recorded)} 个问题的共识结论与录制一致")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已写入 {args.json}")
+    return results
+
+if __name__ == "__main__":
+    main()
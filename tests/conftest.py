@@ -0,0 +1,41 @@
+"""测试环境：导入 app 之前把配置、数据库、审计日志指向临时目录，并关闭指标服务"""
+import os
+import sys
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix="yjd-test-")
+_CONFIG_PATH = os.path.join(_DATA_DIR, "config.txt")
+open(_CONFIG_PATH, "w", encoding="utf-8").close()
+os.environ.update({
+    "YJD_CONFIG": _CONFIG_PATH,
+    "YJD_USER_DATA_PATH": os.path.join(_DATA_DIR, "user_data.json"),
+    "YJD_USER_DB_PATH": os.path.join(_DATA_DIR, "user_data.db"),
+    "YJD_VERIFY_CACHE_PATH": os.path.join(_DATA_DIR, "verify_cache.db"),
+    "YJD_AUDIT_LOG_ENABLED": "0",
+    "YJD_METRICS_PORT": "0",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """与 bench.py 相同的方式用模拟服务商替换两个服务商入口；关闭缓存并重置熔断器，返回安装函数"""
+    import app
+    import bench
+
+    for name in ("Generation", "zhipu_client", "TONGYI_INIT_OK", "ZHIPU_INIT_OK"):
+        monkeypatch.setattr(app, name, getattr(app, name))
+    monkeypatch.setattr(app, "VERIFY_CACHE_ENABLED", False)
+    monkeypatch.setattr(app, "JUDGE_CACHE_ENABLED", False)
+    monkeypatch.setattr(app, "BREAKERS", {
+        provider: app.CircuitBreaker(provider, app.BREAKER_FAILURE_THRESHOLD, app.BREAKER_OPEN_SECONDS)
+        for provider in app.PROVIDERS
+    })
+
+    def install(provider_class=bench.SimulatedProvider, latency=None, **kwargs):
+        provider = provider_class({**bench.DEFAULT_LATENCY, **(latency or {})}, **{"time_scale": 0.001, "seed": 1, **kwargs})
+        bench.install_simulated_providers(provider)
+        return provider
+    return install
@@ -0,0 +1,106 @@
+"""最小的内存版Redis客户端：只实现 RedisUserStore / RedisCache 用到的命令（decode_responses=True 语义，值一律存为字符串）"""
+import threading
+import time
+
+
+class FakeRedis:
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    def _get(self, key):
+        # 访问时惰性过期，与 Redis 行为一致
+        expires = self._expires.get(key)
+        if expires is not None and time.time() >= expires:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    def exists(self, *keys):
+        with self._lock:
+            return sum(self._get(key) is not None for key in keys)
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = str(value)
+            self._expires.pop(key, None)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            deleted = 0
+            for key in keys:
+                deleted += self._get(key) is not None
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return deleted
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if self._get(key) is None:
+                return False
+            self._expires[key] = time.time() + seconds
+            return True
+
+    def hget(self, key, field):
+        with self._lock:
+            return (self._get(key) or {}).get(field)
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._get(key) or {})
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            hash_ = self._get(key)
+            if hash_ is None:
+                hash_ = self._data[key] = {}
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            added = sum(name not in hash_ for name in items)
+            hash_.update({name: str(val) for name, val in items.items()})
+            return added
+
+    def hsetnx(self, key, field, value):
+        with self._lock:
+            hash_ = self._get(key)
+            if hash_ is None:
+                hash_ = self._data[key] = {}
+            if field in hash_:
+                return 0
+            hash_[field] = str(value)
+            return 1
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            hash_ = self._get(key)
+            if hash_ is None:
+                hash_ = self._data[key] = {}
+            hash_[field] = str(int(hash_.get(field, 0)) + amount)
+            return int(hash_[field])
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            zset = self._get(key)
+            if zset is None:
+                zset = self._data[key] = {}
+            added = sum(member not in zset for member in mapping)
+            zset.update({member: float(score) for member, score in mapping.items()})
+            return added
+
+    def zrem(self, key, *members):
+        with self._lock:
+            zset = self._get(key) or {}
+            return sum(zset.pop(member, None) is not None for member in members)
+
+    def zcard(self, key):
+        with self._lock:
+            return len(self._get(key) or {})
+
+    def zrange(self, key, start, end):
+        with self._lock:
+            members = sorted((self._get(key) or {}).items(), key=lambda item: (item[1], item[0]))
+            end = len(members) if end == -1 else end + 1
+            return [member for member, _ in members[start:end]]
@@ -0,0 +1,52 @@
+"""请求准入：运行数上限内直接放行，超出排队；注册用户优先、单用户在途上限、排队已满与排队超时快速返回繁忙"""
+import pytest
+
+import app
+
+
+def test_registered_users_are_granted_before_guests():
+    admission = app.AdmissionController(max_running=1, per_user_limit=2, max_queue=4, max_wait=10)
+    running = admission.enter("alice")
+    guest = admission.enter("游客g1", is_guest=True)
+    registered = admission.enter("bob")
+    assert running.granted_at is not None
+    assert admission.position(registered)[0] == 1 and admission.position(guest)[0] == 2
+    admission.release(running)
+    assert registered.granted_at is not None and guest.granted_at is None
+    admission.release(registered)
+    assert guest.granted_at is not None
+    admission.release(guest)
+    assert admission.stats()["running"] == 0
+
+
+def test_per_user_limit_and_full_queue_are_rejected():
+    admission = app.AdmissionController(max_running=1, per_user_limit=1, max_queue=1, max_wait=10)
+    admission.enter("alice")
+    with pytest.raises(app.AdmissionBusyError) as e:
+        admission.enter("alice")
+    assert e.value.reason == "user_limit"
+    admission.enter("bob")
+    with pytest.raises(app.AdmissionBusyError) as e:
+        admission.enter("carol")
+    assert e.value.reason == "busy"
+    assert admission.stats()["rejected_user"] == 1 and admission.stats()["rejected_busy"] == 1
+
+
+def test_queue_wait_is_bounded():
+    admission = app.AdmissionController(max_running=1, per_user_limit=1, max_queue=4, max_wait=0.05)
+    admission.enter("alice")
+    waiting = admission.enter("bob")
+    with pytest.raises(app.AdmissionBusyError):
+        for _ in admission.queued(waiting, poll=0.01):
+            pass
+    admission.release(waiting)
+    stats = admission.stats()
+    assert stats["timed_out"] == 1 and stats["waiting"] == 0
+
+
+def test_released_ticket_frees_the_user_slot():
+    admission = app.AdmissionController(max_running=2, per_user_limit=1, max_queue=0, max_wait=10)
+    ticket = admission.enter("alice")
+    admission.release(ticket)
+    admission.release(admission.enter("alice"))
+    assert admission.stats()["admitted"] == 2
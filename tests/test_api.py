@@ -0,0 +1,81 @@
+"""无界面验证API：鉴权、游客编号校验与次数、JSON与SSE响应、不对外提供指标"""
+import asyncio
+import base64
+import json
+
+import pytest
+
+import api
+import app
+
+
+def call(method, path, headers=(), body=b""):
+    """直接驱动ASGI应用，返回 (状态码, 响应体文本)"""
+    sent = []
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+    scope = {
+        "type": "http", "method": method, "path": path,
+        "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+    }
+    asyncio.run(api.app(scope, receive, send))
+    return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:]).decode("utf-8")
+
+
+def basic(username, password):
+    return ("authorization", "Basic " + base64.b64encode(f"{username}:{password}".encode()).decode())
+
+
+def question(text):
+    return json.dumps({"question": text}).encode("utf-8")
+
+
+@pytest.fixture
+def store(providers, monkeypatch, tmp_path):
+    providers(time_scale=0.01)
+    user_store = app.UserStore(str(tmp_path / "users.db"))
+    user_store.create_user("alice", app.encrypt_password("secret1"))
+    monkeypatch.setattr(app, "USER_STORE", user_store)
+    return user_store
+
+
+def test_requests_without_valid_credentials_are_rejected(store):
+    assert call("POST", "/v1/verify", body=question("1+1=?"))[0] == 401
+    assert call("POST", "/v1/verify", [basic("alice", "wrong")], question("1+1=?"))[0] == 401
+    status, body = call("POST", "/v1/verify", [("x-guest-id", "forged")], question("1+1=?"))
+    assert status == 401 and "游客编号无效" in body
+
+
+def test_verify_returns_structured_json(store):
+    status, body = call("POST", "/v1/verify", [basic("alice", "secret1")], question("1+1=?"))
+    assert status == 200
+    payload = json.loads(body)
+    assert set(payload["answers"]) == set(app.ANSWERERS)
+    assert set(payload["verdicts"]) == set(app.JUDGE_LABELS)
+    assert payload["credibility"]
+    assert call("POST", "/v1/verify", [basic("alice", "secret1")], b"not json")[0] == 400
+
+
+def test_sse_streams_stages_then_result(store):
+    headers = [basic("alice", "secret1"), ("accept", "text/event-stream")]
+    status, body = call("POST", "/v1/verify", headers, question("2+2=?"))
+    assert status == 200
+    events = [line[len("event: "):] for line in body.splitlines() if line.startswith("event: ")]
+    assert events[-1] == "result"
+    assert events.count("stage") >= len(app.ANSWERERS) + len(app.JUDGE_LABELS)
+
+
+def test_issued_guest_ids_use_the_free_quota(store):
+    store.ensure_guest("g1")
+    statuses = [call("POST", "/v1/verify", [("x-guest-id", "g1")], question("1+1=?"))[0] for _ in range(app.FREE_USE_LIMIT + 1)]
+    assert statuses == [200] * app.FREE_USE_LIMIT + [429]
+
+
+def test_metrics_are_not_served_by_the_api(store):
+    assert call("GET", "/metrics")[0] == 404
+    assert call("GET", "/healthz")[0] == 200
@@ -0,0 +1,40 @@
+"""审计日志：后台批量写入gzip分段，按用户/时间范围经索引读回"""
+import os
+
+import app
+
+
+def entry(user, ts, question):
+    return {"ts": ts, "user": user, "question": question}
+
+
+def test_entries_round_trip_through_segments(tmp_path):
+    audit = app.AuditLog(str(tmp_path), queue_size=1024, max_bytes=256, max_seconds=3600)
+    for i in range(200):
+        assert audit.submit(entry("alice" if i % 2 else "bob", 1000.0 + i, f"问题{i}" * 20))
+    audit.close()
+    segments = [name for name in os.listdir(tmp_path) if name.endswith(".jsonl.gz")]
+    assert len(segments) > 1  # 超过分段大小上限后轮转
+    alice = audit.query(username="alice", limit=1000)
+    assert len(alice) == 100 and all(e["user"] == "alice" for e in alice)
+    assert [e["ts"] for e in alice] == sorted(e["ts"] for e in alice)
+    window = audit.query(since=1010.0, until=1020.0, limit=1000)
+    assert [e["ts"] for e in window] == [1010.0 + i for i in range(10)]
+    assert len(audit.query(limit=5)) == 5
+
+
+def test_empty_log_returns_nothing(tmp_path):
+    assert app.AuditLog(str(tmp_path), 16, 1024, 3600).query() == []
+
+
+def test_verification_is_audited_per_user(providers, monkeypatch, tmp_path):
+    providers()
+    audit = app.AuditLog(str(tmp_path), 1024, 1024 * 1024, 3600)
+    monkeypatch.setattr(app, "AUDIT_LOG_ENABLED", True)
+    monkeypatch.setattr(app, "AUDIT_LOG", audit)
+    record, _ = app.run_verification("审计问题", user="alice")
+    audit.close()
+    [logged] = audit.query(username="alice")
+    assert logged["question"] == "审计问题" and logged["status"] == "ok"
+    assert logged["credibility"] == record["credibility"]
+    assert set(logged["verdicts"]) == set(app.JUDGE_LABELS)
@@ -0,0 +1,51 @@
+"""无界面批量验证：断点续跑、并发按引擎容量收紧、引擎拒绝的条目不写入断点"""
+import json
+
+import app
+
+
+def write_jsonl(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write((row if isinstance(row, str) else json.dumps(row, ensure_ascii=False)) + "\n")
+
+
+def read_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_resume_skips_finished_items(providers, tmp_path):
+    provider = providers()
+    in_path, out_path = tmp_path / "questions.jsonl", tmp_path / "results.jsonl"
+    write_jsonl(in_path, [{"id": item_id, "question": f"断点续跑问题{item_id}"} for item_id in "abc"])
+    write_jsonl(out_path, [
+        {"id": "a", "status": "ok", "credibility": "已完成"},
+        {"id": "b", "status": "failed"},
+        '{"id": "c", "status": "o',  # 中断时写了一半的行
+    ])
+    stats = app.batch_verify(str(in_path), str(out_path), concurrency=2)
+    assert stats == {"ok": 2, "failed": 0, "busy": 0}
+    assert provider.calls == 2 * app.CALLS_PER_QUESTION
+    rows = {row["id"]: row for row in read_jsonl(out_path)}
+    assert sorted(rows) == ["a", "b", "c"]
+    assert rows["a"]["credibility"] == "已完成"
+    assert all(row["status"] == "ok" for row in rows.values())
+
+
+def test_concurrency_is_clamped_to_engine_capacity():
+    assert app.clamp_question_concurrency(10 ** 6) == app.question_capacity()
+    assert app.question_capacity() * app.CALLS_PER_QUESTION <= app.ENGINE.max_in_flight
+    assert app.clamp_question_concurrency(1) == 1
+
+
+def test_engine_rejections_are_not_checkpointed(providers, tmp_path, monkeypatch):
+    providers()
+    # 在途上限只有1：每题的第二个作答必然被引擎拒绝
+    monkeypatch.setattr(app, "ENGINE", app.ExecutionEngine({"dashscope": 1, "zhipu": 1}, max_in_flight=1))
+    in_path, out_path = tmp_path / "questions.jsonl", tmp_path / "results.jsonl"
+    write_jsonl(in_path, [{"id": "x", "question": "引擎繁忙问题"}])
+    stats = app.batch_verify(str(in_path), str(out_path), concurrency=4)
+    assert stats == {"ok": 0, "failed": 0, "busy": 1}
+    assert read_jsonl(out_path) == []
+    assert app._load_batch_checkpoint(str(out_path)) == set()
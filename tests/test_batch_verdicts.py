@@ -0,0 +1,42 @@
+"""批量裁判输出拆分"""
+import threading
+
+import app
+
+
+def test_batch_split_ignores_answer_mentions_inside_verdicts():
+    text = (
+        "【答案A】\n错误标注：无明显错误\n核心结论：由答案A可知 结果为5\n"
+        "【答案B】\n错误标注：计算错误\n核心结论：答案B应为6"
+    )
+    assert app.split_batch_verdicts(text) == [
+        "错误标注：无明显错误\n核心结论：由答案A可知 结果为5",
+        "错误标注：计算错误\n核心结论：答案B应为6",
+    ]
+
+
+def test_batch_split_accepts_markdown_headers():
+    text = "**答案A：**\n错误标注：无明显错误\n核心结论：5\n\n## 答案B\n错误标注：无明显错误\n核心结论：5"
+    assert app.split_batch_verdicts(text) == ["错误标注：无明显错误\n核心结论：5"] * 2
+
+
+def test_batch_split_json():
+    text = '{"A": {"error": "无明显错误", "conclusion": "5"}, "B": {"error": "计算错误", "conclusion": "6"}}'
+    assert app.split_batch_verdicts(text) == ["错误标注：无明显错误\n核心结论：5", "错误标注：计算错误\n核心结论：6"]
+
+
+def test_batch_split_unparsable_returns_none():
+    assert app.split_batch_verdicts("无法研判") is None
+
+
+def test_batch_judge_does_not_stream_into_a_single_panel(providers, monkeypatch):
+    providers()
+    monkeypatch.setattr(app, "STREAM_MODE", True)
+    monkeypatch.setattr(app, "STREAM_PUSH_INTERVAL", 0)
+    result_queue = app.ScopeQueue(threading.Event())
+    app.batch_judge("t", "1+1=?", ["最终结果：2", "最终结果：2"], result_queue, ["jt_t", "jt_z"])
+    items = []
+    while not result_queue.empty():
+        items.append(result_queue.get())
+    assert [key for key, _ in items] == ["jt_t", "jt_z"]
+    assert all("答案B" not in verdict for _, verdict in items)
@@ -0,0 +1,59 @@
+"""服务商录制/回放：录制的调用按指纹回放，回放后的共识结论与录制时一致"""
+import json
+
+import pytest
+
+import bench
+
+import app
+
+QUESTIONS = ["磁带问题：3+4=?", "磁带问题：某商品原价120元，打八折后再减10元，最终支付多少？"]
+
+
+@pytest.fixture
+def cassette(providers, monkeypatch, tmp_path):
+    """以模拟服务商为真实SDK录制到临时磁带，返回磁带路径"""
+    providers()
+    path = str(tmp_path / "providers.jsonl")
+    monkeypatch.setattr(app, "PROVIDER_CASSETTE", app.Cassette(path))
+    monkeypatch.setattr(app, "REPLAY_SPEED", 0)
+    monkeypatch.setattr(app, "PROVIDER_MODE", "record")
+    monkeypatch.setattr(app, "Generation", app.CassetteGeneration(app.Generation))
+    monkeypatch.setattr(app, "zhipu_client", app.CassetteZhipuClient(app.zhipu_client))
+    for question in QUESTIONS:
+        record, _ = app.run_verification(question)
+        assert record is not None
+    monkeypatch.setattr(app, "PROVIDER_MODE", "replay")
+    return path
+
+
+def test_replay_reproduces_recorded_consensus(cassette):
+    replay = bench.install_replay_providers(cassette, 0)
+    recorded = replay.results()
+    assert [entry["question"] for entry in recorded] == QUESTIONS
+    records = {question: app.run_verification(question)[0] for question in QUESTIONS}
+    assert bench.compare_results(recorded, records) == []
+    assert replay.misses == 0
+    with open(cassette, "r", encoding="utf-8") as f:
+        assert replay.calls == sum(json.loads(line)["type"] == "call" for line in f)
+
+
+def test_unrecorded_request_is_a_miss(cassette):
+    replay = bench.install_replay_providers(cassette, 0)
+    record, _ = app.run_verification("磁带中没有的问题")
+    assert record is None
+    assert replay.misses == len(app.ANSWERERS)
+
+
+def test_recorded_errors_keep_their_status(monkeypatch, tmp_path):
+    kwargs = {"model": app.ZHIPU_JUDGE_MODEL, "messages": [{"role": "user", "content": "x"}], "temperature": 0.0}
+    path = tmp_path / "errors.jsonl"
+    path.write_text(json.dumps({
+        "type": "call", "provider": "zhipu", "key": app.cassette_key("zhipu", kwargs), "latency": 0.1,
+        "error": {"type": "APIStatusError", "message": "Too Many Requests", "status_code": 429},
+    }) + "\n", encoding="utf-8")
+    monkeypatch.setattr(app, "PROVIDER_CASSETTE", app.Cassette(str(path)))
+    monkeypatch.setattr(app, "REPLAY_SPEED", 0)
+    with pytest.raises(app.ReplayedProviderError) as e:
+        app.CassetteZhipuClient().chat.completions.create(**kwargs)
+    assert app.classify_error(e.value) == "rate_limit"
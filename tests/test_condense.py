@@ -0,0 +1,20 @@
+"""裁判输入中的答案压缩：token预算始终有效"""
+import app
+
+
+def test_condense_enforces_budget_on_single_paragraph():
+    answer = "step " * 10000 + "final answer = 42"
+    text, saved = app.condense_answer(answer, 200)
+    assert app.estimate_tokens(text) <= 200
+    assert saved > 0
+    assert text.endswith("final answer = 42")
+
+
+def test_condense_keeps_decimals_and_final_line():
+    answer = "We compute 3.14 times 2. " * 500 + "So the result is 6.28."
+    text, _ = app.condense_answer(answer, 200)
+    assert "3.14" in text and text.endswith("So the result is 6.28.")
+
+
+def test_condense_leaves_short_answers_alone():
+    assert app.condense_answer("短答案。最终结果：1", 200) == ("短答案。最终结果：1", 0)
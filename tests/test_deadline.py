@@ -0,0 +1,64 @@
+"""端到端时限：答题阶段超时的答案立即撤销并让出引擎名额，带着已有结论降级输出"""
+import time
+
+import bench
+
+import app
+
+
+class TrackedProvider(bench.SimulatedProvider):
+    """记录各模型流式响应被读完或被关闭的时刻"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.closed_at = {}
+
+    def respond(self, model, prompt, stream):
+        out = super().respond(model, prompt, stream)
+        if not stream:
+            return out
+
+        def tracked():
+            try:
+                yield from out
+            finally:
+                self.closed_at.setdefault(model, time.monotonic())
+        return tracked()
+
+
+def test_timed_out_answer_is_cancelled_at_the_answer_deadline(providers, monkeypatch):
+    provider = providers(TrackedProvider, time_scale=1.0, latency={
+        app.TONGYI_ANSWER_MODEL: (0.1, 0), app.ZHIPU_ANSWER_MODEL: (3.0, 0),
+        app.TONGYI_JUDGE_MODEL: (1.0, 0), app.ZHIPU_JUDGE_MODEL: (1.0, 0),
+    })
+    monkeypatch.setattr(app, "STREAM_MODE", True)
+    monkeypatch.setattr(app, "JUDGE_BATCH_MODE", False)
+    monkeypatch.setattr(app, "REQUEST_DEADLINE", 4.0)
+    monkeypatch.setattr(app, "ANSWER_STAGE_SHARE", 0.125)
+    results, arrived = {}, {}
+    start = time.monotonic()
+    for key, val in app.verify_pipeline("答题阶段超时", fast_path_policy="off"):
+        if not key.endswith(":partial"):
+            results[key] = val
+            arrived[key] = time.monotonic()
+    assert results["degraded"] == ["zhipu_ans"]
+    assert app.is_call_failure(results["zhipu_ans"])
+    # 迟到的答案在首个流式片段到达时即停止读取，早于其余裁判结束
+    cancelled_at = provider.closed_at[app.ZHIPU_ANSWER_MODEL]
+    assert cancelled_at - start < 1.0
+    assert cancelled_at < max(arrived[k] for k in app.JUDGE_LABELS if k in arrived)
+    record = app.build_record("答题阶段超时", results)
+    assert record["credibility"].startswith("中可信度")
+
+
+def test_request_deadline_cancels_pending_judges(providers, monkeypatch):
+    providers(time_scale=1.0, latency={
+        app.TONGYI_ANSWER_MODEL: (0.05, 0), app.ZHIPU_ANSWER_MODEL: (0.05, 0),
+        app.TONGYI_JUDGE_MODEL: (0.05, 0), app.ZHIPU_JUDGE_MODEL: (5.0, 0),
+    })
+    monkeypatch.setattr(app, "STREAM_MODE", True)
+    monkeypatch.setattr(app, "JUDGE_BATCH_MODE", False)
+    monkeypatch.setattr(app, "REQUEST_DEADLINE", 0.5)
+    start = time.monotonic()
+    results = dict(app.verify_pipeline("裁判超时", fast_path_policy="off"))
+    assert time.monotonic() - start < 1.5
+    assert set(results["degraded"]) == {key for key in app.JUDGE_LABELS if key.endswith("_z")}
@@ -0,0 +1,45 @@
+"""快速通道的最终结果抽取：完整表达式归一后比较，无法识别时走完整研判"""
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize("first, second", [
+    ("最终结果：2x + 1", "最终结果：3x + 1"),
+    ("答案：3/4", "答案：1/4"),
+    ("因此 x = 2 或 x = 3", "因此 x = -1 或 x = 3"),
+    ("结果为1.5×10^3 米", "结果为2.5×10^3 米"),
+    ("最终结果：x = 2,3", "最终结果：x = 23"),
+])
+def test_different_results_do_not_agree(first, second):
+    assert not app.answers_agree(first, second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("最终结果：42", "最终结果：42。"),
+    ("最终结果：1,000 kg", "最终结果：1000公斤"),
+    ("因此 x = 3 或 x = 2", "因此 x = 2 或 x = 3"),
+    ("最终结果：70元", "最终结果：70.0 元"),
+    ("答案是B", "选B"),
+])
+def test_equivalent_results_agree(first, second):
+    assert app.answers_agree(first, second)
+
+
+@pytest.mark.parametrize("answer", ["答：3 min", "答：3 mol", "最终支付70元", "推理过程"])
+def test_unparsable_result_takes_full_path(answer):
+    assert app.extract_final_result(answer) is None
+
+
+@pytest.mark.parametrize("policy, agree_rate, route, calls", [
+    ("single", 1.0, "fast_single", len(app.ANSWERERS) + 1),
+    ("none", 1.0, "fast_none", len(app.ANSWERERS)),
+    ("single", 0.0, "full", len(app.ANSWERERS) + len(app.JUDGE_LABELS)),
+])
+def test_pipeline_route(providers, monkeypatch, policy, agree_rate, route, calls):
+    provider = providers(agree_rate=agree_rate)
+    monkeypatch.setattr(app, "JUDGE_BATCH_MODE", False)
+    results = dict(app.verify_pipeline(f"快速通道{policy}{agree_rate}", fast_path_policy=policy))
+    assert results["route"] == route
+    assert provider.calls == calls
+    assert app.build_record("快速通道", results) is not None
@@ -0,0 +1,62 @@
+"""裁判结论记忆：命中复用，请求被放弃时中途的裁判输出不写入记忆也不入队"""
+import threading
+
+import pytest
+
+import app
+
+QUESTION = "1+1等于几？"
+ANSWER = "研精千问作答：\n1+1=2\n最终结果：2"
+
+
+class CancellingQueue(app.ScopeQueue):
+    """收到第一个流式片段即撤销所属请求"""
+    def put(self, item, *args, **kwargs):
+        super().put(item, *args, **kwargs)
+        if item[0].endswith(":partial"):
+            self.cancelled.set()
+
+
+def drain(result_queue):
+    items = []
+    while not result_queue.empty():
+        items.append(result_queue.get())
+    return items
+
+
+@pytest.fixture
+def judge_cache(providers, monkeypatch, request):
+    providers()
+    monkeypatch.setattr(app, "JUDGE_CACHE_ENABLED", True)
+    monkeypatch.setattr(app, "JUDGE_VERDICT_CACHE", app.make_cache(100, f"judge_verdicts_{request.node.name}"))
+    return app.JUDGES["z"][1]
+
+
+def test_verdict_is_remembered_and_reused(judge_cache):
+    result_queue = app.ScopeQueue(threading.Event())
+    app.neutral_judge("z", QUESTION, ANSWER, result_queue, "jz_z")
+    verdict = [value for key, value in drain(result_queue) if key == "jz_z"]
+    assert len(verdict) == 1 and not app.is_call_failure(verdict[0])
+    assert app.lookup_judge_verdict(QUESTION, ANSWER, judge_cache) == verdict[0]
+
+
+def test_cancelled_stream_is_not_remembered(judge_cache, monkeypatch):
+    monkeypatch.setattr(app, "STREAM_MODE", True)
+    monkeypatch.setattr(app, "STREAM_PUSH_INTERVAL", 0)
+    result_queue = CancellingQueue(threading.Event())
+    app.neutral_judge("z", QUESTION, ANSWER, result_queue, "jz_z")
+    assert all(key.endswith(":partial") for key, _ in drain(result_queue))
+    assert app.lookup_judge_verdict(QUESTION, ANSWER, judge_cache) is None
+    breaker = app.BREAKERS["zhipu"]
+    assert breaker.state == "closed" and breaker.failures == 0 and not breaker._probing
+
+
+def test_result_arriving_after_cancel_is_dropped(judge_cache, monkeypatch):
+    monkeypatch.setattr(app, "STREAM_MODE", False)
+    cancelled = threading.Event()
+    cancelled.set()
+    result_queue = app.ScopeQueue(cancelled)
+    app.neutral_judge("z", QUESTION, ANSWER, result_queue, "jz_z")
+    app.batch_judge("z", QUESTION, [ANSWER, ANSWER + "。"], result_queue, ["jt_z", "jz_z"])
+    assert drain(result_queue) == []
+    assert app.lookup_judge_verdict(QUESTION, ANSWER, judge_cache) is None
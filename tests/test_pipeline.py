@@ -0,0 +1,26 @@
+"""依赖驱动调度：某个答案一到达就启动它的裁判，不等其余答案"""
+import app
+
+
+def test_judges_start_as_soon_as_their_answer_lands(providers, monkeypatch):
+    providers(time_scale=1.0, latency={
+        app.TONGYI_ANSWER_MODEL: (0.05, 0), app.ZHIPU_ANSWER_MODEL: (0.6, 0),
+        app.TONGYI_JUDGE_MODEL: (0.05, 0), app.ZHIPU_JUDGE_MODEL: (0.05, 0),
+    })
+    monkeypatch.setattr(app, "JUDGE_BATCH_MODE", False)
+    order = [
+        key for key, _ in app.verify_pipeline("依赖驱动调度", fast_path_policy="off")
+        if key in app.ANSWERERS or key in app.JUDGE_LABELS
+    ]
+    assert order.index("tongyi_ans") < order.index("zhipu_ans")
+    assert all(order.index(key) < order.index("zhipu_ans") for key in app.ANSWER_VERDICT_KEYS["tongyi_ans"])
+    assert len(order) == len(app.ANSWERERS) + len(app.JUDGE_LABELS)
+
+
+def test_record_is_built_from_pipeline_results(providers):
+    providers()
+    results = dict(app.verify_pipeline("融合终审", fast_path_policy="off"))
+    record = app.build_record("融合终审", results)
+    assert record["credibility"].startswith("高可信度")
+    assert record["unavailable"] == [] and record["degraded"] == []
+    assert all(record[key] == results[key] for key in app.JUDGE_LABELS)
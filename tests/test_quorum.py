@@ -0,0 +1,29 @@
+"""裁判法定数：每份答案的一致裁判数达标即提前结束，其余裁判被撤销并以多数结论代填"""
+import time
+
+import app
+
+
+def test_quorum_skips_the_slow_judge(providers, monkeypatch):
+    providers(time_scale=1.0, latency={
+        app.TONGYI_ANSWER_MODEL: (0.05, 0), app.ZHIPU_ANSWER_MODEL: (0.05, 0),
+        app.TONGYI_JUDGE_MODEL: (0.05, 0), app.ZHIPU_JUDGE_MODEL: (5.0, 0),
+    })
+    monkeypatch.setattr(app, "JUDGE_BATCH_MODE", False)
+    monkeypatch.setattr(app, "JUDGE_QUORUM", 1)
+    start = time.monotonic()
+    results = dict(app.verify_pipeline("法定数提前结束", fast_path_policy="off"))
+    assert time.monotonic() - start < 1.0
+    slow = {app.verdict_key(ans_key, "z") for ans_key in app.ANSWERERS}
+    assert set(results["skipped"]) == slow
+    record = app.build_record("法定数提前结束", results)
+    assert record["unavailable"] == [] and record["degraded"] == []
+    assert all(not app.is_call_failure(record[key]) for key in slow)
+    assert record["credibility"].startswith("高可信度")
+
+
+def test_quorum_defaults_to_all_judges(monkeypatch):
+    monkeypatch.setattr(app, "JUDGE_QUORUM", 0)
+    assert app.judge_quorum() == len(app.JUDGES)
+    monkeypatch.setattr(app, "JUDGE_QUORUM", 99)
+    assert app.judge_quorum() == len(app.JUDGES)
@@ -0,0 +1,115 @@
+"""服务商容错：错误分类、重试、熔断，以及调用失败的结构化标记"""
+import time
+
+import bench
+
+import app
+
+
+class FlakyCall:
+    """前 failures 次抛出指定异常，之后成功"""
+    def __init__(self, failures, exc):
+        self.failures = failures
+        self.exc = exc
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.exc
+        return "ok"
+
+
+class WordyProvider(bench.SimulatedProvider):
+    """作答正文中包含「初始化失败」「调用失败」等字样"""
+    def _text(self, model, prompt, agree):
+        if "答案：" in prompt or "答案A：" in prompt:
+            return super()._text(model, prompt, agree)
+        return "常见原因：数据库连接初始化失败、重试后仍调用失败\n最终结果：42"
+
+
+def test_classify_errors():
+    assert app.classify_error(TimeoutError()) == "timeout"
+    assert app.classify_error(RuntimeError("429 Too Many Requests")) == "rate_limit"
+    assert app.classify_error(RuntimeError("Invalid API-key provided.")) == "auth"
+    assert app.classify_error(RuntimeError("502 bad gateway")) == "server"
+    assert app.classify_error(RuntimeError("400 invalid parameter")) == "bad_request"
+    assert app.classify_error(RuntimeError("模拟服务商错误")) == "unknown"
+
+
+def test_transient_errors_are_retried(providers, monkeypatch):
+    providers()
+    monkeypatch.setattr(app, "RETRY_BASE_DELAY", 0.001)
+    call = FlakyCall(2, RuntimeError("503 service unavailable"))
+    assert app.resilient_call("zhipu", call) == "ok"
+    assert call.calls == 3
+
+
+def test_bad_request_is_not_retried(providers):
+    providers()
+    call = FlakyCall(1, RuntimeError("400 invalid parameter"))
+    try:
+        app.resilient_call("zhipu", call)
+    except app.ProviderError as e:
+        assert e.kind == "bad_request"
+    assert call.calls == 1
+
+
+def test_retries_stop_at_request_deadline(providers, monkeypatch):
+    providers()
+    monkeypatch.setattr(app, "RETRY_BASE_DELAY", 5)
+    monkeypatch.setattr(app._trace_local, "deadline", time.monotonic() + 0.01, raising=False)
+    call = FlakyCall(5, RuntimeError("503 service unavailable"))
+    start = time.monotonic()
+    try:
+        app.resilient_call("zhipu", call)
+    except app.ProviderError:
+        pass
+    assert time.monotonic() - start < 1
+    assert call.calls <= 2
+
+
+def test_breaker_opens_and_recovers_through_probe():
+    breaker = app.CircuitBreaker("zhipu", 2, 0.05)
+    breaker.record("server")
+    breaker.record("server")
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()  # 同时只放行一次探测
+    breaker.record("unknown")
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record()
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_degrades_result(providers, monkeypatch):
+    providers()
+    monkeypatch.setattr(app, "RETRY_BASE_DELAY", 0.001)
+
+    def down(**kwargs):
+        raise RuntimeError("502 bad gateway")
+    monkeypatch.setattr(app.zhipu_client.chat.completions, "create", down)
+    for i in range(3):
+        record, _ = app.run_verification(f"熔断问题{i}")
+    assert app.BREAKERS["zhipu"].state == "open"
+    assert record["credibility"].startswith("中可信度")
+    assert "zhipu_ans" in record["unavailable"]
+    assert app.is_call_failure(record["zhipu_ans"])
+
+
+def test_answers_mentioning_failure_words_are_judged(providers):
+    provider = providers(WordyProvider)
+    record, _ = app.run_verification("数据库连接初始化失败的常见原因？")
+    assert record is not None
+    assert record["unavailable"] == []
+    assert provider.calls == len(app.ANSWERERS) + len(app.JUDGE_LABELS)
+    assert not any(app.is_call_failure(record[k]) for k in app.CACHE_FIELDS)
+
+
+def test_failure_mark_in_model_output_is_stripped():
+    assert app.model_output("❌ 错误标注：无明显错误") == "错误标注：无明显错误"
+    assert app.is_call_failure(app.call_failure("研精裁判调用失败"))
+    assert not app.is_call_failure("研精千问作答：\n调用失败的原因有很多")
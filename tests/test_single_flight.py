@@ -0,0 +1,44 @@
+"""同题合并：并发的重复提交共享一次运行，全部订阅者离开后的同题提交另起运行"""
+import threading
+
+import app
+
+
+def final_record(events):
+    """消费事件流，返回各结果键的最终内容"""
+    results = {}
+    for key, val in events:
+        if key not in app.PIPELINE_META_KEYS and not key.endswith(":partial"):
+            results[key] = val
+    return results
+
+
+def test_concurrent_duplicates_share_one_run(providers):
+    provider = providers(time_scale=0.01)
+    flight = app.SingleFlight(4)
+    outcomes = []
+    threads = [
+        threading.Thread(target=lambda: outcomes.append(final_record(flight.events("同题合并测试"))))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert flight.coalesced == 2
+    assert provider.calls == len(app.ANSWERERS) + len(app.JUDGE_LABELS)
+    assert outcomes[0] == outcomes[1] == outcomes[2] and outcomes[0]
+    assert flight.active() == 0
+
+
+def test_abandoned_run_is_not_joined(providers):
+    providers(time_scale=0.05)
+    flight = app.SingleFlight(4)
+    first = flight.events("放弃后重新提交")
+    next(first)
+    first.close()
+    assert flight.active() == 0
+    results = final_record(flight.events("放弃后重新提交"))
+    assert flight.coalesced == 0
+    assert set(app.ANSWERERS) <= set(results)
+    assert not any(app.is_call_failure(results[key]) for key in app.ANSWERERS)
@@ -0,0 +1,87 @@
+"""SQLite 与 Redis（内存假客户端）两种状态后端：游客次数的扣减/退还与缓存的 LRU/TTL 行为一致"""
+import time
+
+import pytest
+
+import app
+from fake_redis import FakeRedis
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def user_store(request, tmp_path):
+    if request.param == "sqlite":
+        return app.UserStore(str(tmp_path / "user_data.db"))
+    return app.RedisUserStore(FakeRedis(), prefix="test")
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def make_cache(request, tmp_path):
+    def make(max_entries=3, ttl=60):
+        if request.param == "sqlite":
+            return app.VerifyCache(str(tmp_path / "cache.db"), max_entries, ttl)
+        return app.RedisCache(FakeRedis(), max_entries, ttl, prefix="test")
+    return make
+
+
+def test_guest_quota_consumed_up_to_limit(user_store):
+    user_store.ensure_guest("g1")
+    assert [user_store.consume_guest_quota("g1", 3) for _ in range(4)] == [1, 2, 3, None]
+    assert user_store.guest_used("g1") == 3
+
+
+def test_guest_quota_refund(user_store):
+    user_store.ensure_guest("g1")
+    user_store.consume_guest_quota("g1", 2)
+    user_store.consume_guest_quota("g1", 2)
+    assert user_store.consume_guest_quota("g1", 2) is None
+    user_store.refund_guest_quota("g1")
+    assert user_store.consume_guest_quota("g1", 2) == 2
+
+
+def test_guest_refund_never_goes_negative(user_store):
+    user_store.ensure_guest("g1")
+    user_store.refund_guest_quota("g1")
+    assert user_store.guest_used("g1") == 0
+
+
+def test_unissued_guest_id_is_not_created(user_store):
+    assert not user_store.guest_exists("forged")
+    assert user_store.consume_guest_quota("forged", 3) is None
+    assert not user_store.guest_exists("forged")
+    user_store.ensure_guest("issued")
+    assert user_store.guest_exists("issued")
+
+
+def test_cache_roundtrip(make_cache):
+    cache = make_cache()
+    assert cache.get("k") is None
+    cache.put("k", "问题", {"credibility": "高可信度"})
+    assert cache.get("k") == {"credibility": "高可信度"}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_evicts_least_recently_used(make_cache, monkeypatch):
+    cache = make_cache(max_entries=2)
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    for key in ("a", "b"):
+        clock[0] += 1
+        cache.put(key, key, {"key": key})
+    clock[0] += 1
+    assert cache.get("a") is not None  # a 变为最近访问
+    clock[0] += 1
+    cache.put("c", "c", {"key": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"key": "a"}
+    assert cache.get("c") == {"key": "c"}
+
+
+def test_cache_expires_after_ttl(make_cache, monkeypatch):
+    cache = make_cache(ttl=10)
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    cache.put("k", "问题", {"v": 1})
+    clock[0] += 5
+    assert cache.get("k") == {"v": 1}
+    clock[0] += 6
+    assert cache.get("k") is None
@@ -0,0 +1,25 @@
+"""裁判结论解析：文本/Markdown/JSON 三种格式与计票"""
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize("text", [
+    "错误标注：计算错误\n核心结论：应为6",
+    "**错误标注**: 计算错误\n- 核心结论：应为6",
+    '```json\n{"error": "计算错误", "conclusion": "应为6"}\n```',
+])
+def test_verdict_formats_parse_alike(text):
+    verdict = app.parse_verdict(text)
+    assert (verdict.error, verdict.conclusion, verdict.category) == ("计算错误", "应为6", "计算错误")
+
+
+def test_failed_verdict_is_not_counted():
+    assert app.settled_verdict([app.call_failure("研精裁判调用失败：超时"), "错误标注：无明显错误\n核心结论：5"]) == (
+        "错误标注：无明显错误\n核心结论：5", 1
+    )
+
+
+def test_missing_fields_fall_back_to_defaults():
+    verdict = app.parse_verdict("随便说点什么")
+    assert (verdict.error, verdict.conclusion, verdict.clean) == (app.NO_ERROR, app.NO_CONCLUSION, True)